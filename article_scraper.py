@@ -1,44 +1,248 @@
-from newspaper import Article
+import argparse
+import asyncio
 import json
 import time
+from collections import Counter
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from newspaper import Article
+
+from rag.config import ARTICLES_PATH
+from rag.corpus import append_jsonl, drop_torn_line, iter_jsonl
+from sitemap_scraper import discover
+
+USER_AGENT = "Mozilla/5.0 (compatible; PetHealthRAG/1.0)"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# ============================================
+# Rate Limiting
+# ============================================
+
+class TokenBucket:
+    """Allow `rate` requests/second on average with bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostLimiter:
+    """Per-host concurrency limit + token bucket"""
+
+    def __init__(self, per_host: int, rate: float, burst: int):
+        self.per_host = per_host
+        self.rate = rate
+        self.burst = burst
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def slot(self, host: str) -> asyncio.Semaphore:
+        if host not in self.semaphores:
+            self.semaphores[host] = asyncio.Semaphore(self.per_host)
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+        return self.semaphores[host]
+
+    async def wait(self, host: str):
+        await self.buckets[host].acquire()
+
+# ============================================
+# Resume Journal
+# ============================================
+
+class Journal:
+    """Append-only JSONL of per-URL crawl state (validators + last check); latest line wins"""
+
+    def __init__(self, path: str):
+        drop_torn_line(path)
+        self.entries = {e["url"]: e for e in iter_jsonl(path)}
+        self.f = open(path, "a", encoding="utf-8")
+
+    def get(self, url: str) -> Optional[Dict]:
+        return self.entries.get(url)
+
+    def record(self, url: str, **entry):
+        entry = {"url": url, "checked_at": time.time(), **entry}
+        self.entries[url] = entry
+        append_jsonl(self.f, entry)
+
+    def close(self):
+        self.f.close()
+
+# ============================================
+# Crawl
+# ============================================
+
+def load_link_map(path: str) -> Dict[str, Dict]:
+    """url -> merged animals/categories, so each page is fetched once"""
+    with open(path, "r", encoding="utf-8") as f:
+        animal_category_links = json.load(f)
+
+    targets: Dict[str, Dict] = {}
+    for animal, categories in animal_category_links.items():
+        for cat_name, links in categories.items():
+            for url in ([links] if isinstance(links, str) else links):
+                meta = targets.setdefault(url, {"animals": [], "categories": []})
+                if animal not in meta["animals"]:
+                    meta["animals"].append(animal)
+                if cat_name not in meta["categories"]:
+                    meta["categories"].append(cat_name)
+    return targets
+
+
+def parse_article(url: str, html: str):
+    """Extract title/text with newspaper (CPU-bound, runs in a thread)"""
+    article = Article(url)
+    article.download(input_html=html)
+    article.parse()
+    return article.title.strip(), article.text.strip()
+
+
+async def fetch_one(client: httpx.AsyncClient, limiter: HostLimiter, journal: Journal,
+                    out, url: str, meta: Dict, stats: Counter, retries: int = 2):
+    host = urlsplit(url).netloc
+    prev = journal.get(url) or {}
+
+    # Conditional request if we hold validators from a successful fetch
+    headers = {}
+    if prev.get("status") in ("ok", "unchanged"):
+        if prev.get("etag"):
+            headers["If-None-Match"] = prev["etag"]
+        if prev.get("last_modified"):
+            headers["If-Modified-Since"] = prev["last_modified"]
+
+    try:
+        async with limiter.slot(host):
+            for attempt in range(retries + 1):
+                await limiter.wait(host)
+                resp = await client.get(url, headers=headers)
+                if resp.status_code not in RETRY_STATUSES or attempt == retries:
+                    break
+                await asyncio.sleep(2 ** attempt)
+
+        if resp.status_code == 304:
+            stats["unchanged"] += 1
+            journal.record(url, status="unchanged", etag=prev.get("etag"),
+                           last_modified=prev.get("last_modified"))
+            return
+
+        if resp.status_code != 200:
+            stats["http_error"] += 1
+            journal.record(url, status=f"http_{resp.status_code}")
+            print(f"⚠️  {resp.status_code} {url}")
+            return
+
+        title, text = await asyncio.get_running_loop().run_in_executor(
+            None, parse_article, url, resp.text
+        )
+        validators = {
+            "etag": resp.headers.get("etag"),
+            "last_modified": resp.headers.get("last-modified"),   # never our own clock
+        }
+
+        if not title or not text:
+            stats["empty"] += 1
+            journal.record(url, status="empty", **validators)
+            return
+
+        append_jsonl(out, {"url": url, "title": title, "text": text, **meta})
+        stats["fetched"] += 1
+        journal.record(url, status="ok", title=title, **validators)
+
+    except Exception as e:
+        stats["error"] += 1
+        journal.record(url, status="error", error=f"{type(e).__name__}: {e}")
+        print(f"❌ {url}: {type(e).__name__}: {e}")
+
+
+async def crawl(targets: Dict[str, Dict], out_path: str, journal_path: str,
+                per_host: int = 4, rate: float = 2.0, burst: int = 4,
+                max_age_hours: float = 24.0, refresh: bool = False, timeout: float = 20.0) -> Counter:
+    """Fetch every target URL concurrently, appending articles to `out_path` as they arrive"""
+    journal = Journal(journal_path)
+    stats = Counter()
+
+    # Resume: skip pages already checked recently (unless --refresh)
+    cutoff = time.time() - max_age_hours * 3600
+    queue: asyncio.Queue = asyncio.Queue()
+    for url, meta in targets.items():
+        prev = journal.get(url)
+        if not refresh and prev and prev["checked_at"] >= cutoff and prev["status"] in ("ok", "unchanged", "empty"):
+            stats["skipped"] += 1
+            continue
+        queue.put_nowait((url, meta))
+
+    hosts = {urlsplit(u).netloc for u in targets} or {""}
+    workers = per_host * len(hosts)
+    print(f"🕸️  {queue.qsize()} to fetch, {stats['skipped']} already fresh "
+          f"({len(hosts)} host(s), {per_host}/host, {rate} req/s/host)")
+
+    limiter = HostLimiter(per_host, rate, burst)
+    limits = httpx.Limits(max_connections=workers, max_keepalive_connections=workers)
+    total = queue.qsize()
+
+    async with httpx.AsyncClient(limits=limits, timeout=timeout, follow_redirects=True,
+                                 headers={"User-Agent": USER_AGENT}) as client:
+        drop_torn_line(out_path)
+        with open(out_path, "a", encoding="utf-8") as out:
+            async def worker():
+                while True:
+                    try:
+                        url, meta = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    await fetch_one(client, limiter, journal, out, url, meta, stats)
+                    done = total - queue.qsize()
+                    if done % 50 == 0:
+                        print(f"   {done}/{total} ({dict(stats)})")
+
+            await asyncio.gather(*(worker() for _ in range(workers)))
+
+    journal.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent, resumable PetMD article crawler")
+    parser.add_argument("--links", default="./Data/article_links.json")
+    parser.add_argument("--sitemap", default=None, help="discover targets from this sitemap instead of --links")
+    parser.add_argument("--out", default=ARTICLES_PATH, help="append-only JSONL corpus")
+    parser.add_argument("--journal", default="./Data/scrape_journal.jsonl", help="resume/validator journal")
+    parser.add_argument("--per-host", type=int, default=4, help="concurrent requests per host")
+    parser.add_argument("--rate", type=float, default=2.0, help="requests per second per host")
+    parser.add_argument("--burst", type=int, default=4)
+    parser.add_argument("--max-age", type=float, default=24.0, help="hours before a page is re-validated")
+    parser.add_argument("--refresh", action="store_true", help="re-validate every page now")
+    parser.add_argument("--timeout", type=float, default=20.0)
+    args = parser.parse_args()
+
+    if args.sitemap:
+        targets = asyncio.run(discover(args.sitemap))
+        print(f"🗺️  Discovered {len(targets)} articles from {args.sitemap}")
+    else:
+        targets = load_link_map(args.links)
+    start = time.time()
+    stats = asyncio.run(crawl(targets, args.out, args.journal, args.per_host, args.rate,
+                              args.burst, args.max_age, args.refresh, args.timeout))
+    print(f"📊 {dict(stats)} in {time.time() - start:.1f}s")
+
+    print("Article scraping done.")
+
 
-with open("./Data/article_links.json", "r", encoding="utf-8") as f:
-    animal_category_links = json.load(f)
-
-articles_data = {}
-
-for animal, categories in animal_category_links.items():
-    for cat_name, links in categories.items():
-        for url in links:
-            try:
-                article = Article(url)
-                article.download()
-                article.parse()
-
-                title = article.title.strip()
-                text = article.text.strip()
-                if not title or not text:
-                    continue
-
-                if title in articles_data:
-                    if animal not in articles_data[title]["animals"]:
-                        articles_data[title]["animals"].append(animal)
-                    if cat_name not in articles_data[title]["categories"]:
-                        articles_data[title]["categories"].append(cat_name)
-                else:
-                    articles_data[title] = {
-                        "url": url,
-                        "text": text,
-                        "animals": [animal],
-                        "categories": [cat_name]
-                    }
-
-                time.sleep(0.5)
-
-            except Exception:
-                continue
-
-with open("./Data/articles_data.json", "w", encoding="utf-8") as f:
-    json.dump(articles_data, f, ensure_ascii=False, indent=2)
-
-print("Article scraping done.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from fastapi.responses import PlainTextResponse
+from backend.config import ADMIN_TOKEN, PROFILE_MAX_SECONDS
+from backend.models.models import ReloadRequest
+from backend.utils import profiling
+from rag import retriever, snapshots
+
+router = APIRouter()
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Check the X-Admin-Token header against ADMIN_TOKEN"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API disabled (set ADMIN_TOKEN)")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@router.get("/index", dependencies=[Depends(require_admin)])
+async def index_status():
+    """Live index version, reload state and available snapshots"""
+    return {**retriever.reload_status(), "snapshots": snapshots.list_snapshots()}
+
+
+@router.post("/reload", dependencies=[Depends(require_admin)])
+def reload_index(request: Optional[ReloadRequest] = None):
+    """
+    Load an index snapshot in the background and swap it in atomically.
+
+    - **version**: snapshot to load (default: the CURRENT pointer)
+    - **wait**: return only after the swap (or failure)
+    """
+    request = request or ReloadRequest()
+    result = retriever.reload_index(request.version, wait=request.wait)
+    if result["status"] == "busy":
+        raise HTTPException(status_code=409, detail="A reload is already running")
+    if result["status"] == "failed":
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
+
+@router.post("/profile/cpu", dependencies=[Depends(require_admin)])
+def profile_cpu(seconds: float = Query(10.0, gt=0, le=PROFILE_MAX_SECONDS),
+                interval: float = Query(profiling.DEFAULT_INTERVAL, ge=0.001, le=1.0),
+                idle: bool = Query(False, description="Also count threads blocked in waits"),
+                format: str = Query("collapsed", pattern="^(collapsed|top)$")):
+    """
+    Sample all thread stacks for `seconds` and return them.
+
+    - **format=collapsed**: one `thread;outer;...;leaf count` line per stack
+      (feed to flamegraph.pl or speedscope)
+    - **format=top**: JSON summary of the hottest functions
+    """
+    result = profiling.sample_stacks(seconds, interval, idle)
+    if result is None:
+        raise HTTPException(status_code=409, detail="A CPU profile is already running")
+    if format == "top":
+        stacks = result.pop("stacks")
+        return {**result, "functions": profiling.top_functions(stacks)}
+    return PlainTextResponse(profiling.collapsed(result["stacks"]),
+                             headers={"X-Profile-Samples": str(result["samples"])})
+
+
+@router.post("/profile/memory", dependencies=[Depends(require_admin)])
+def profile_memory(seconds: float = Query(30.0, gt=0, le=PROFILE_MAX_SECONDS),
+                   top: int = Query(25, ge=1, le=500),
+                   frames: int = Query(1, ge=1, le=50),
+                   group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$")):
+    """
+    Allocation growth over a window: tracemalloc snapshots `seconds` apart,
+    biggest size differences first (`frames` > 1 with group_by=traceback
+    shows who called the allocating line)
+    """
+    result = profiling.allocation_diff(seconds, top, frames, group_by)
+    if result is None:
+        raise HTTPException(status_code=409, detail="A memory profile is already running")
+    return result
@@ -1,24 +1,39 @@
-from fastapi import APIRouter, HTTPException
-from backend.models.models import ChatRequest, ChatResponse, ErrorResponse, Source
-from backend.utils.helpers import process_chat_request, get_chat_history
+import asyncio
+import re
+from contextlib import nullcontext
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Header, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from backend.config import HISTORY_PAGE_SIZE
+from backend.models.models import ChatRequest, ChatResponse, ErrorResponse, Source, HistoryResponse
+from backend.utils.helpers import process_chat_request, get_chat_history, chat_memory
+from rag.tracing import trace, span, render_prometheus
+from rag.retriever import current_version
 
 router = APIRouter()
 
 
 @router.post("/chat", response_model=ChatResponse, responses={400: {"model": ErrorResponse}, 500: {"model": ErrorResponse}})
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, x_debug_timings: Optional[str] = Header(None)):
     """
     Handle chat request and return RAG response
     
     - **message**: User's question (required)
     - **chat_id**: Session ID (optional, will be generated if not provided)
+    - **X-Debug-Timings** header: include per-stage timings (ms) in the response
     """
+    debug = x_debug_timings is not None and x_debug_timings.lower() not in ("0", "false", "")
     try:
-        # Process request
-        chat_id, response_message, sources = process_chat_request(
-            message=request.message,
-            chat_id=request.chat_id
-        )
+        # Process request (in a worker thread so concurrent requests can overlap);
+        # per-request timings are only collected when asked for
+        with trace() if debug else nullcontext({}) as timings, span("total"):
+            chat_id, response_message, sources, tier = await run_in_threadpool(
+                process_chat_request,
+                message=request.message,
+                chat_id=request.chat_id
+            )
         
         # Format sources
         formatted_sources = [
@@ -34,7 +49,9 @@ async def chat(request: ChatRequest):
         return ChatResponse(
             chat_id=chat_id,
             message=response_message,
-            sources=formatted_sources
+            sources=formatted_sources,
+            tier=tier,
+            timings={stage: round(s * 1000, 2) for stage, s in timings.items()} if debug else None
         )
     
     except Exception as e:
@@ -44,7 +61,117 @@ async def chat(request: ChatRequest):
         )
 
 
+@router.get("/history/{chat_id}", response_model=HistoryResponse, responses={404: {"model": ErrorResponse}})
+async def history(chat_id: str,
+                  limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=100),
+                  before: Optional[int] = Query(None, description="Only messages older than this ID")):
+    """
+    One page of a chat's server-side history, oldest first
+
+    - **limit**: page size (default: the newest HISTORY_PAGE_SIZE messages)
+    - **before**: ID of the oldest message already shown, to load the page before it
+    """
+    page = get_chat_history(chat_id, limit=limit, before=before)
+    if page is None:
+        raise HTTPException(status_code=404, detail=f"Unknown chat: {chat_id}")
+    messages, has_more = page
+    return HistoryResponse(chat_id=chat_id, messages=messages, has_more=has_more)
+
+
+@router.delete("/history/{chat_id}")
+async def delete_history(chat_id: str):
+    """Drop a chat's server-side history"""
+    return {"chat_id": chat_id, "deleted": chat_memory.delete_session(chat_id)}
+
+
+# Client-chosen chat IDs on the socket path (the server's own are chat_<hex>)
+CHAT_ID_RE = re.compile(r"[\w-]{1,64}")
+
+
+@router.websocket("/ws/{chat_id}")
+async def chat_socket(websocket: WebSocket, chat_id: str):
+    """
+    Persistent chat channel bound to one chat_id; JSON text frames.
+
+    Client -> server:
+      {"type": "message", "message": "..."}
+      {"type": "history", "limit": 20, "before": <message id>}   (both optional)
+    Server -> client:
+      {"type": "token", "text": "..."}                 (streamed answer pieces)
+      {"type": "done", "message", "sources", "tier"}   (final answer)
+      {"type": "history", "messages", "has_more"}
+      {"type": "error", "detail": "..."}
+    One message is answered at a time; send the next after "done".
+    """
+    if not CHAT_ID_RE.fullmatch(chat_id):
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    chat_memory.create_session(chat_id)
+    loop = asyncio.get_running_loop()
+
+    try:
+        while True:
+            try:
+                request = await websocket.receive_json()
+                kind = request.get("type")
+            except (ValueError, AttributeError):
+                await websocket.send_json({"type": "error", "detail": "Expected a JSON object"})
+                continue
+
+            if kind == "history":
+                try:
+                    limit = min(max(int(request.get("limit") or HISTORY_PAGE_SIZE), 1), 100)
+                    before = int(request["before"]) if request.get("before") is not None else None
+                except (TypeError, ValueError):
+                    await websocket.send_json({"type": "error", "detail": "limit / before must be integers"})
+                    continue
+                messages, has_more = get_chat_history(chat_id, limit=limit, before=before) or ([], False)
+                await websocket.send_json({"type": "history", "messages": messages, "has_more": has_more})
+
+            elif kind == "message":
+                try:
+                    message = ChatRequest(message=request.get("message") or "", chat_id=chat_id).message
+                except ValidationError as e:
+                    await websocket.send_json({"type": "error", "detail": str(e.errors()[0]["msg"])})
+                    continue
+
+                # Tokens cross from the worker thread to this loop; None ends the stream
+                tokens: asyncio.Queue = asyncio.Queue()
+
+                def work():
+                    try:
+                        return process_chat_request(
+                            message, chat_id,
+                            on_token=lambda text: loop.call_soon_threadsafe(tokens.put_nowait, text))
+                    finally:
+                        loop.call_soon_threadsafe(tokens.put_nowait, None)
+
+                with span("total"):
+                    task = asyncio.ensure_future(run_in_threadpool(work))
+                    while (text := await tokens.get()) is not None:
+                        await websocket.send_json({"type": "token", "text": text})
+                    try:
+                        _, response_message, sources, tier = await task
+                    except Exception as e:
+                        await websocket.send_json({"type": "error", "detail": f"Error processing request: {str(e)}"})
+                        continue
+                await websocket.send_json({"type": "done", "message": response_message,
+                                           "sources": sources, "tier": tier})
+
+            else:
+                await websocket.send_json({"type": "error", "detail": f"Unknown frame type: {kind}"})
+    except WebSocketDisconnect:
+        pass
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage timing histograms and counters in Prometheus text format"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "Pet Health RAG API"}
+    return {"status": "healthy", "service": "Pet Health RAG API", "index_version": current_version()}
@@ -15,5 +15,29 @@ CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
 RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
 MAX_CONTEXT_LENGTH = int(os.getenv("MAX_CONTEXT_LENGTH", "500"))
 
+# Inference Scheduling
+# General workers serve all requests (emergencies first); reserved workers only
+# take emergency-intent requests, so those never wait behind routine generation
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+EMERGENCY_RESERVED_WORKERS = int(os.getenv("EMERGENCY_RESERVED_WORKERS", "1"))
+# Workers of the small-model pool (only with RAG_SMALL_LLM=true)
+SMALL_INFERENCE_WORKERS = int(os.getenv("SMALL_INFERENCE_WORKERS", "1"))
+
+# Load Shedding
+# When a new request would wait longer than SHED_QUEUE_DELAY seconds for the
+# main model, it is answered by the small model or extractively instead
+SHED_ENABLED = os.getenv("SHED_ENABLED", "true").lower() == "true"
+SHED_QUEUE_DELAY = float(os.getenv("SHED_QUEUE_DELAY", "3.0"))
+
 # Chat Configuration
+# Turns (question + answer) kept per chat on the server; clients page through them
 MAX_CHAT_HISTORY = int(os.getenv("MAX_CHAT_HISTORY", "10"))
+# Chats kept in memory; the least recently used one is dropped beyond this
+MAX_CHAT_SESSIONS = int(os.getenv("MAX_CHAT_SESSIONS", "1000"))
+# Messages per history page (the most recent page is loaded when a chat opens)
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+
+# Admin Configuration (admin API is disabled unless a token is set)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+# Longest CPU / allocation profile one admin request may run
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
@@ -1,13 +1,27 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from backend.api.routes import router
+from backend.api.admin import router as admin_router
 from backend.config import CORS_ORIGINS
+from rag.config import INDEX_WATCH_INTERVAL
 import uvicorn
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background services"""
+    if INDEX_WATCH_INTERVAL > 0:
+        from rag.retriever import start_watcher
+        start_watcher(INDEX_WATCH_INTERVAL)
+    yield
+
+
 app = FastAPI(
     title="Pet Health RAG API",
     description="RAG-powered chatbot API for pet health questions",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS Configuration
@@ -21,6 +35,7 @@ app.add_middleware(
 
 # Include routes
 app.include_router(router, prefix="/api", tags=["Chat"])
+app.include_router(admin_router, prefix="/api/admin", tags=["Admin"])
 
 
 @app.get("/")
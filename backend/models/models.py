@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 
@@ -27,7 +27,9 @@ class ChatResponse(BaseModel):
     chat_id: str = Field(..., description="Chat session ID")
     message: str = Field(..., description="Assistant response")
     sources: List[Source] = Field(default_factory=list, description="Retrieved sources")
+    tier: str = Field("full", description="What answered: full | small | extractive | precomputed | instant")
     timestamp: datetime = Field(default_factory=datetime.now, description="Response timestamp")
+    timings: Optional[Dict[str, float]] = Field(None, description="Per-stage timings in ms (X-Debug-Timings header only)")
 
     class Config:
         json_schema_extra = {
@@ -42,11 +44,32 @@ class ChatResponse(BaseModel):
                         "title": "Dog Nutrition Guide"
                     }
                 ],
+                "tier": "full",
                 "timestamp": "2025-12-28T10:30:00"
             }
         }
 
 
+class HistoryMessage(BaseModel):
+    id: int = Field(..., description="Message ID (pass as `before` to page back)")
+    role: str = Field(..., description="user | assistant")
+    content: str = Field(..., description="Message text")
+    timestamp: datetime = Field(..., description="When the message was stored")
+    sources: List[Source] = Field(default_factory=list, description="Sources of an assistant answer")
+    tier: Optional[str] = Field(None, description="What answered (assistant messages)")
+
+
+class HistoryResponse(BaseModel):
+    chat_id: str = Field(..., description="Chat session ID")
+    messages: List[HistoryMessage] = Field(default_factory=list, description="One page, oldest first")
+    has_more: bool = Field(False, description="Older messages exist before this page")
+
+
+class ReloadRequest(BaseModel):
+    version: Optional[str] = Field(None, description="Snapshot version (default: CURRENT)")
+    wait: bool = Field(False, description="Block until the new index is live")
+
+
 class ErrorResponse(BaseModel):
     error: str = Field(..., description="Error message")
     detail: Optional[str] = Field(None, description="Error details")
@@ -1,90 +1,172 @@
+import itertools
+import threading
 import uuid
-from typing import Dict, List, Tuple
+from collections import OrderedDict
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime
-from rag.chatbot import rag_chatbot
-from rag.retriever import retrieve_chunks
-from backend.config import RAG_TOP_K, MAX_CHAT_HISTORY
+from rag.chatbot import answer_question
+from backend.config import RAG_TOP_K, MAX_CHAT_HISTORY, MAX_CHAT_SESSIONS, HISTORY_PAGE_SIZE
+from backend.utils.singleflight import coalescer, flight_key
+from backend.utils.scheduler import request_priority, INSTANT
+from backend.utils.shedding import choose_tier, pool_for, TIER_PRECOMPUTED
+from rag.answer_store import open_store, lookup
+from rag.config import ANSWER_STORE_ENABLED
+from rag.retriever import current_version
+from rag.tracing import inc
 
 
 class ChatMemory:
-    """In-memory chat session storage"""
+    """In-memory chat session storage (least recently used chats are dropped)"""
     
-    def __init__(self):
-        self.sessions: Dict[str, List[Dict]] = {}
+    def __init__(self, max_sessions: int = MAX_CHAT_SESSIONS):
+        self.sessions: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        # Message ids increase across all sessions; history pages are keyed on them
+        self._ids = itertools.count(1)
     
-    def create_session(self) -> str:
-        """Generate new chat session ID"""
-        chat_id = f"chat_{uuid.uuid4().hex[:12]}"
-        self.sessions[chat_id] = []
+    def _touch(self, chat_id: str) -> List[Dict]:
+        """Session for `chat_id` (created if needed) marked most recent; call with the lock held"""
+        session = self.sessions.setdefault(chat_id, [])
+        self.sessions.move_to_end(chat_id)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+        return session
+    
+    def create_session(self, chat_id: Optional[str] = None) -> str:
+        """Generate new chat session ID (or register a client-chosen one)"""
+        chat_id = chat_id or f"chat_{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self._touch(chat_id)
         return chat_id
     
-    def add_message(self, chat_id: str, role: str, content: str):
-        """Add message to chat history"""
-        if chat_id not in self.sessions:
-            self.sessions[chat_id] = []
-        
-        self.sessions[chat_id].append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        # Keep only recent messages
-        if len(self.sessions[chat_id]) > MAX_CHAT_HISTORY * 2:
-            self.sessions[chat_id] = self.sessions[chat_id][-MAX_CHAT_HISTORY * 2:]
+    def add_message(self, chat_id: str, role: str, content: str, **extra) -> Dict:
+        """Add message to chat history (extra fields, e.g. sources, are stored with it)"""
+        with self._lock:
+            session = self._touch(chat_id)
+            message = {
+                "id": next(self._ids),
+                "role": role,
+                "content": content,
+                "timestamp": datetime.now().isoformat(),
+                **extra
+            }
+            session.append(message)
+            
+            # Keep only recent messages
+            if len(session) > MAX_CHAT_HISTORY * 2:
+                del session[:-MAX_CHAT_HISTORY * 2]
+        return message
     
-    def get_history(self, chat_id: str) -> List[Dict]:
-        """Get chat history"""
-        return self.sessions.get(chat_id, [])
+    def get_history(self, chat_id: str, limit: Optional[int] = None,
+                    before: Optional[int] = None) -> Tuple[List[Dict], bool]:
+        """
+        Most recent `limit` messages (all if None) older than message id
+        `before`, oldest first, and whether even older ones exist
+        """
+        with self._lock:
+            session = self.sessions.get(chat_id, [])
+            end = len(session)
+            if before is not None:
+                end = next((i for i, m in enumerate(session) if m["id"] >= before), end)
+            start = 0 if limit is None else max(0, end - limit)
+            return list(session[start:end]), start > 0
     
-    def delete_session(self, chat_id: str):
+    def delete_session(self, chat_id: str) -> bool:
         """Delete chat session"""
-        if chat_id in self.sessions:
-            del self.sessions[chat_id]
+        with self._lock:
+            return self.sessions.pop(chat_id, None) is not None
 
 
 # Global chat memory instance
 chat_memory = ChatMemory()
 
+# Precomputed answers (rag.warmup); opened once the store file exists
+_answer_store = None
+
+
+def get_answer_store():
+    global _answer_store
+    if _answer_store is None and ANSWER_STORE_ENABLED:
+        _answer_store = open_store()
+    return _answer_store
+
+
+def format_sources(sources: List[Dict]) -> List[Dict]:
+    """Top retrieved chunks as API sources"""
+    formatted_sources = []
+    for source in sources[:3]:
+        metadata = source.get("metadata", {})
+        formatted_sources.append({
+            "text": source.get("text", "")[:200],
+            "score": source.get("score", 0.0),
+            "url": metadata.get("url"),
+            "title": metadata.get("title")
+        })
+    return formatted_sources
+
 
-def process_chat_request(message: str, chat_id: str = None) -> Tuple[str, str, List[Dict]]:
+def process_chat_request(message: str, chat_id: str = None,
+                         on_token: Optional[Callable[[str], None]] = None) -> Tuple[str, str, List[Dict], str]:
     """
     Process chat request and return response with sources
     
+    on_token: called with each generated text piece (WebSocket streaming);
+    answers that skip the model arrive as a single piece
+    
     Returns:
-        Tuple of (chat_id, response_message, sources)
+        Tuple of (chat_id, response_message, sources, tier that answered)
     """
     # Create or use existing session
-    if not chat_id:
-        chat_id = chat_memory.create_session()
-    elif chat_id not in chat_memory.sessions:
-        chat_memory.sessions[chat_id] = []
+    chat_id = chat_memory.create_session(chat_id)
     
     # Store user message
     chat_memory.add_message(chat_id, "user", message)
     
-    # Get RAG response
-    response = rag_chatbot(message, k=RAG_TOP_K)
-    
-    # Store assistant response
-    chat_memory.add_message(chat_id, "assistant", response)
-    
-    # Get sources
-    sources = retrieve_chunks(message, k=3)
+    # Get RAG response (sources are the chunks it already retrieved);
+    # identical questions in flight at the same time share one generation,
+    # emergencies are scheduled ahead of routine questions, and when the
+    # model queue is backed up the request is served by a faster tier
+    priority = request_priority(message)
+    hit = lookup(get_answer_store(), message, current_version()) if priority != INSTANT else None
+    if hit is not None:
+        (response, sources), tier = hit, TIER_PRECOMPUTED
+        if on_token is not None:
+            on_token(response)
+    else:
+        tier = choose_tier(priority)
+        pool = pool_for(tier)
+
+        def answer(publish):
+            job = partial(answer_question, message, k=RAG_TOP_K, on_token=publish, tier=tier)
+            return pool.run(job, priority) if pool is not None else job()
+
+        key = flight_key(message, RAG_TOP_K, tier)
+        if on_token is None:
+            (response, sources), _ = coalescer.do(key, answer)
+        else:
+            # Followers of a shared flight get its tokens replayed from the start
+            flight, _ = coalescer.subscribe(key, answer)
+            for text in flight.iter_tokens():
+                on_token(text)
+            response, sources = flight.wait()
+    inc("rag_answers_total", tier=tier)
     
-    # Format sources
-    formatted_sources = []
-    for source in sources:
-        formatted_sources.append({
-            "text": source.get("text", "")[:200],
-            "score": source.get("score", 0.0),
-            "url": source.get("url"),
-            "title": source.get("title")
-        })
+    # Store assistant response (with its sources, so history can re-render them)
+    formatted_sources = format_sources(sources)
+    chat_memory.add_message(chat_id, "assistant", response, sources=formatted_sources, tier=tier)
     
-    return chat_id, response, formatted_sources
+    return chat_id, response, formatted_sources, tier
 
 
-def get_chat_history(chat_id: str) -> List[Dict]:
-    """Get chat history for a session"""
-    return chat_memory.get_history(chat_id)
+def get_chat_history(chat_id: str, limit: Optional[int] = HISTORY_PAGE_SIZE,
+                     before: Optional[int] = None) -> Optional[Tuple[List[Dict], bool]]:
+    """
+    One page of a session's history: (messages oldest first, has_more).
+    The newest page by default; pass the first message id as `before` to
+    page back. None for an unknown session.
+    """
+    if chat_id not in chat_memory.sessions:
+        return None
+    return chat_memory.get_history(chat_id, limit=limit, before=before)
@@ -0,0 +1,129 @@
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Sampling rate of the CPU profiler (seconds between stack samples)
+DEFAULT_INTERVAL = 0.01
+
+# Leaf functions of the standard library that mean "blocked, not running"
+# (idle pool workers, the event loop's select, queue waits)
+IDLE_FUNCTIONS = {"wait", "wait_for", "select", "poll", "accept", "get", "sleep", "_wait_for_tstate_lock",
+                  "recv", "recv_into", "readline", "_worker"}
+_STDLIB = sysconfig.get_paths()["stdlib"]
+
+# One run of each kind at a time; nothing is hooked or traced between runs
+_cpu_lock = threading.Lock()
+_memory_lock = threading.Lock()
+
+
+def _label(frame) -> str:
+    """module:qualified.function for one frame (no ';', so it is safe in collapsed stacks)"""
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    return code.co_name in IDLE_FUNCTIONS and code.co_filename.startswith(_STDLIB)
+
+# ============================================
+# CPU
+# ============================================
+
+def sample_stacks(seconds: float, interval: float = DEFAULT_INTERVAL, idle: bool = False) -> Optional[Dict]:
+    """
+    Sample every thread's Python stack (sys._current_frames) each `interval`
+    for `seconds` from the calling thread. Stacks are rooted at the thread
+    name; blocked threads are skipped unless `idle`. None if a run is active.
+    """
+    if not _cpu_lock.acquire(blocking=False):
+        return None
+    try:
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        start = time.perf_counter()
+        while (now := time.perf_counter()) - start < seconds:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (not idle and _is_idle(frame)):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                stacks[";".join(reversed(stack))] += 1
+            samples += 1
+            time.sleep(max(0.0, interval - (time.perf_counter() - now)))
+        return {"seconds": round(time.perf_counter() - start, 3), "interval": interval,
+                "samples": samples, "stacks": stacks}
+    finally:
+        _cpu_lock.release()
+
+
+def collapsed(stacks: Counter) -> str:
+    """Brendan Gregg's collapsed format (flamegraph.pl, speedscope, inferno)"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def top_functions(stacks: Counter, n: int = 25) -> List[Dict]:
+    """Functions by self samples (leaf) with their inclusive share"""
+    total = sum(stacks.values()) or 1
+    self_counts, inclusive = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")[1:]             # drop the thread name
+        if not frames:
+            continue
+        self_counts[frames[-1]] += count
+        for name in set(frames):
+            inclusive[name] += count
+    return [{"function": name, "self_pct": round(100 * count / total, 2),
+             "total_pct": round(100 * inclusive[name] / total, 2)}
+            for name, count in self_counts.most_common(n)]
+
+# ============================================
+# Memory
+# ============================================
+
+def allocation_diff(seconds: float, top: int = 25, frames: int = 1, group_by: str = "lineno") -> Optional[Dict]:
+    """
+    tracemalloc snapshot, wait `seconds`, snapshot again: the biggest growth
+    by source line (or "filename" / "traceback"). Tracing runs only inside
+    the window unless it was already on. None if a run is active.
+    """
+    if not _memory_lock.acquire(blocking=False):
+        return None
+    try:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(frames)
+        try:
+            before = tracemalloc.take_snapshot()
+            time.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+            traced, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started:
+                tracemalloc.stop()
+
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__),
+                  tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                  tracemalloc.Filter(False, "<unknown>")]
+        diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), group_by)
+        return {
+            "seconds": seconds,
+            "size_diff_bytes": sum(stat.size_diff for stat in diff),
+            "traced_bytes": traced,
+            "peak_bytes": peak,
+            "top": [{"where": [f"{f.filename}:{f.lineno}" for f in stat.traceback],
+                     "size_diff_bytes": stat.size_diff, "count_diff": stat.count_diff,
+                     "size_bytes": stat.size, "count": stat.count}
+                    for stat in diff[:top]],
+        }
+    finally:
+        _memory_lock.release()
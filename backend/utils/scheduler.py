@@ -0,0 +1,136 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict
+from rag.guards import classify
+from rag.tracing import observe, set_gauge, describe, add_timing
+from backend.config import INFERENCE_WORKERS, EMERGENCY_RESERVED_WORKERS, SMALL_INFERENCE_WORKERS
+from rag.config import SMALL_LLM_ENABLED
+
+EMERGENCY = "emergency"
+ROUTINE = "routine"
+INSTANT = "instant"                     # canned guard replies, no model work
+PRIORITIES = (EMERGENCY, ROUTINE)       # highest first
+
+describe("rag_queue_delay_seconds", "Time a request waited for an inference worker, by pool and priority")
+describe("rag_queue_depth", "Requests waiting for an inference worker, by pool and priority")
+
+# Weight of the newest job in the running average of service time
+SERVICE_EWMA = 0.2
+
+
+def request_priority(message: str) -> str:
+    """Classify a request on arrival with the guards"""
+    flags = classify(message.strip())
+    if not flags["english"] or flags["greeting"] or flags["farewell"] or flags["invalid"]:
+        return INSTANT
+    return EMERGENCY if flags["emergency"] else ROUTINE
+
+
+class InferenceScheduler:
+    """
+    Priority scheduler for model work.
+
+    `workers` general threads always take the oldest emergency job before any
+    routine one; `reserved` extra threads only run emergency jobs, so an
+    emergency starts immediately even while every general worker is busy
+    with a long routine generation.
+    """
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, reserved: int = EMERGENCY_RESERVED_WORKERS,
+                 name: str = "main"):
+        self.name = name
+        self._queues: Dict[str, deque] = {p: deque() for p in PRIORITIES}
+        self._cond = threading.Condition()
+        self._threads = []
+        self._lanes = {ROUTINE: workers, EMERGENCY: workers + reserved}
+        self._service_time = 0.0
+        self._running: Dict[str, float] = {}        # worker -> start of its current job
+        for i in range(workers):
+            self._start(PRIORITIES, f"{name}-inference-{i}")
+        for i in range(reserved):
+            self._start((EMERGENCY,), f"{name}-inference-emergency-{i}")
+
+    def _start(self, serves, name: str):
+        thread = threading.Thread(target=self._work, args=(serves,), daemon=True, name=name)
+        thread.start()
+        self._threads.append(thread)
+
+    def submit(self, fn: Callable[[], Any], priority: str = ROUTINE) -> Future:
+        """Queue fn() at `priority`; it runs in the caller's context (request trace included)"""
+        future: Future = Future()
+        ctx = contextvars.copy_context()
+        with self._cond:
+            self._queues[priority].append((time.perf_counter(), ctx, fn, future))
+            set_gauge("rag_queue_depth", len(self._queues[priority]), pool=self.name, priority=priority)
+            self._cond.notify_all()
+        return future
+
+    def run(self, fn: Callable[[], Any], priority: str = ROUTINE) -> Any:
+        """Submit and wait for the result (INSTANT work runs inline)"""
+        if priority == INSTANT:
+            return fn()
+        return self.submit(fn, priority).result()
+
+    def _next(self, serves):
+        with self._cond:
+            while True:
+                for priority in serves:
+                    if self._queues[priority]:
+                        job = self._queues[priority].popleft()
+                        set_gauge("rag_queue_depth", len(self._queues[priority]), pool=self.name, priority=priority)
+                        return priority, job
+                self._cond.wait()
+
+    def _work(self, serves):
+        while True:
+            priority, (queued_at, ctx, fn, future) = self._next(serves)
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            started = time.perf_counter()
+            with self._cond:
+                self._running[threading.current_thread().name] = started
+            delay = started - queued_at
+            observe("rag_queue_delay_seconds", delay, pool=self.name, priority=priority)
+            ctx.run(add_timing, "queue", delay)
+            try:
+                future.set_result(ctx.run(fn))
+            except BaseException as e:
+                future.set_exception(e)
+            with self._cond:
+                del self._running[threading.current_thread().name]
+                took = time.perf_counter() - started
+                self._service_time = took if not self._service_time else \
+                    self._service_time + SERVICE_EWMA * (took - self._service_time)
+
+    def depth(self) -> Dict[str, int]:
+        with self._cond:
+            return {p: len(q) for p, q in self._queues.items()}
+
+    def expected_delay(self, priority: str = ROUTINE) -> float:
+        """
+        Rough wait for a job submitted now: the age of the oldest queued job of
+        its priority, or the queued work ahead of it spread over its workers,
+        whichever is larger. 0 while nothing of that priority is waiting.
+        """
+        if priority == INSTANT:
+            return 0.0
+        with self._cond:
+            queue = self._queues[priority]
+            if not queue:
+                return 0.0
+            now = time.perf_counter()
+            # A job still running has taken at least this long
+            service = max([self._service_time] + [now - t for t in self._running.values()])
+            ahead = sum(len(self._queues[p]) for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+            backlog = ahead * service / max(self._lanes[priority], 1)
+            return max(now - queue[0][0], backlog)
+
+
+# Global scheduler for LLM requests
+scheduler = InferenceScheduler()
+# Pool of the small model (degraded tier), if it is loaded
+small_scheduler = InferenceScheduler(SMALL_INFERENCE_WORKERS, reserved=0, name="small") if SMALL_LLM_ENABLED else None
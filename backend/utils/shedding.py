@@ -0,0 +1,42 @@
+from typing import Optional
+from rag.chatbot import TIER_FULL, TIER_SMALL, TIER_EXTRACTIVE
+from rag.tracing import inc, set_gauge, describe
+from backend.config import SHED_ENABLED, SHED_QUEUE_DELAY
+from backend.utils.scheduler import scheduler, small_scheduler, InferenceScheduler, INSTANT
+
+# Tiers that skip the model entirely
+TIER_PRECOMPUTED = "precomputed"        # answer store hit
+TIER_INSTANT = "instant"                # canned guard reply
+
+describe("rag_answers_total", "Answered chat requests by tier")
+describe("rag_expected_queue_delay_seconds", "Predicted main-model queue wait at the last arrival, by priority")
+describe("rag_shed_total", "Requests moved off the main model because of queue delay, by tier")
+
+
+def choose_tier(priority: str, threshold: float = SHED_QUEUE_DELAY) -> str:
+    """
+    Adaptive load shedding, decided on arrival: keep the main model while its
+    predicted queue wait is under `threshold` seconds, else the small model
+    if its own pool is under the threshold, else an extractive answer.
+    """
+    if priority == INSTANT:
+        return TIER_INSTANT
+    delay = scheduler.expected_delay(priority)
+    set_gauge("rag_expected_queue_delay_seconds", delay, priority=priority)
+    if not SHED_ENABLED or delay <= threshold:
+        return TIER_FULL
+
+    tier = TIER_EXTRACTIVE
+    if small_scheduler is not None and small_scheduler.expected_delay(priority) <= threshold:
+        tier = TIER_SMALL
+    inc("rag_shed_total", tier=tier)
+    return tier
+
+
+def pool_for(tier: str) -> Optional[InferenceScheduler]:
+    """Worker pool a tier runs on (None: run inline, it is fast)"""
+    if tier == TIER_FULL:
+        return scheduler
+    if tier == TIER_SMALL:
+        return small_scheduler
+    return None
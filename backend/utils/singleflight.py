@@ -0,0 +1,134 @@
+import contextvars
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from rag.answer_store import normalize_question
+from rag.tracing import inc, set_gauge, describe, span
+
+describe("rag_singleflight_saved_total", "Requests served by joining an in-flight generation")
+describe("rag_singleflight_leaders_total", "Requests that ran their own generation")
+describe("rag_singleflight_inflight", "Distinct questions currently being generated")
+
+
+def flight_key(question: str, k: int, tier: str = "full") -> Tuple:
+    """Normalized question + retrieval fingerprint (index version, top-k) + answer tier"""
+    from rag.retriever import current_version
+    return normalize_question(question), current_version(), k, tier
+
+
+class Flight:
+    """One in-flight computation: its final result plus a replayable token stream"""
+
+    def __init__(self):
+        self.tokens = []
+        self.done = False
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+        self._cond = threading.Condition()
+
+    def publish(self, text: str):
+        with self._cond:
+            self.tokens.append(text)
+            self._cond.notify_all()
+
+    def finish(self, result: Any = None, error: Optional[BaseException] = None):
+        with self._cond:
+            self.result, self.error, self.done = result, error, True
+            self._cond.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """Block until the leader finishes; re-raises its error"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.done, timeout):
+                raise TimeoutError("In-flight request did not finish in time")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def iter_tokens(self, timeout: Optional[float] = None) -> Iterator[str]:
+        """All tokens from the start of the stream, then live ones until it ends"""
+        sent = 0
+        while True:
+            with self._cond:
+                if not self._cond.wait_for(lambda: len(self.tokens) > sent or self.done, timeout):
+                    raise TimeoutError("Token stream stalled")
+                pending = self.tokens[sent:]
+                finished = self.done and sent + len(pending) == len(self.tokens)
+            sent += len(pending)
+            yield from pending
+            if finished:
+                return
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key: the first caller (leader) runs
+    the work, everyone arriving while it runs waits and shares the result.
+    Finished flights are dropped immediately - this is not a cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Any, Flight] = {}
+
+    def _join(self, key) -> Tuple[Flight, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                inc("rag_singleflight_saved_total")
+                return flight, False
+            flight = self._flights[key] = Flight()
+            set_gauge("rag_singleflight_inflight", len(self._flights))
+        inc("rag_singleflight_leaders_total")
+        return flight, True
+
+    def _run(self, key, flight: Flight, fn: Callable[[Callable[[str], None]], Any]):
+        try:
+            result = fn(flight.publish)
+        except BaseException as e:
+            self._forget(key, flight)
+            flight.finish(error=e)
+            raise
+        self._forget(key, flight)
+        flight.finish(result)
+        return result
+
+    def _forget(self, key, flight: Flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            set_gauge("rag_singleflight_inflight", len(self._flights))
+
+    def do(self, key, fn: Callable[[Callable[[str], None]], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn(publish) once per concurrent key; returns (result, shared).
+        `publish` forwards generated text to streaming subscribers.
+        """
+        flight, leader = self._join(key)
+        if leader:
+            return self._run(key, flight, fn), False
+        with span("coalesce_wait"):
+            return flight.wait(), True
+
+    def subscribe(self, key, fn: Callable[[Callable[[str], None]], Any]) -> Tuple[Flight, bool]:
+        """
+        Streaming variant: returns (flight, shared) immediately. A new flight
+        runs fn in a background thread; iterate flight.iter_tokens(), then
+        flight.wait() for the final result.
+        """
+        flight, leader = self._join(key)
+        if leader:
+            def run():
+                try:
+                    self._run(key, flight, fn)
+                except BaseException:
+                    pass                 # delivered to subscribers via flight.wait()
+            # Carry the caller's context (trace() timings) into the worker thread
+            threading.Thread(target=contextvars.copy_context().run, args=(run,),
+                             daemon=True, name="singleflight").start()
+        return flight, not leader
+
+
+# Global coalescer for chat generations
+coalescer = SingleFlight()
@@ -0,0 +1,145 @@
+# benchmarks/bench_compressed.py
+#
+# Memory vs recall trade-off of the compact vector index (rag/compressed.py).
+#
+#   python -m benchmarks.bench_compressed --index Data/petmd.index --out compressed.json
+#   python -m benchmarks.bench_compressed --chunks 100000        # synthetic corpus
+#
+# For every PCA dimension x quantization: resident index bytes per vector,
+# memory ratio vs the flat float32 index, latency and recall@k against exact
+# flat search - first pass alone (fetch=0) and with exact rescoring of the top
+# `fetch` candidates against memmapped float32 vectors. Configs whose recall
+# is within --tolerance of flat are marked.
+#
+# With --index the real chunk vectors are used and the queries are stored
+# sentence vectors (real MiniLM embeddings of short text, like questions),
+# or noisy chunk vectors if those were not built. The synthetic corpus has a
+# power-law spectrum like sentence embeddings, so PCA behaves similarly.
+
+import argparse
+import json
+import os
+import tempfile
+
+import faiss
+import numpy as np
+
+from benchmarks.common import summarize, time_calls, run_metadata, compare
+from rag.compressed import compact_paths, train_compact, search_compact, factory_string, index_bytes
+from rag.extractive import load_sentence_store
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    return (x / np.linalg.norm(x, axis=-1, keepdims=True)).astype("float32")
+
+
+def synthetic_corpus(n: int, dim: int, nq: int, rng: np.random.Generator, decay: float = 0.6):
+    """(chunk vectors, queries): topic clusters in a random basis, variance ~ rank^-decay"""
+    basis, _ = np.linalg.qr(rng.standard_normal((dim, dim)))
+    scales = (1 + np.arange(dim)) ** -decay
+    centers = rng.standard_normal((max(n // 20, 1), dim)) * scales
+    owner = rng.integers(0, len(centers), size=n)
+    chunks = _unit((centers[owner] + 0.5 * rng.standard_normal((n, dim)) * scales) @ basis.T)
+    sources = rng.integers(0, n, size=nq)
+    queries = _unit(chunks[sources] + 0.3 * (rng.standard_normal((nq, dim)) * scales) @ basis.T)
+    return chunks, queries
+
+
+def real_corpus(index_path: str, nq: int, rng: np.random.Generator):
+    """(chunk vectors, queries) of a built index"""
+    vectors_path = compact_paths(index_path)[0]
+    if os.path.exists(vectors_path):
+        chunks = np.asarray(np.load(vectors_path, mmap_mode="r"), dtype="float32")
+    else:
+        index = faiss.read_index(index_path)
+        chunks = index.reconstruct_n(0, index.ntotal)
+    stored = load_sentence_store(index_path)
+    if stored is not None and len(stored[0]):
+        pick = rng.choice(len(stored[0]), size=min(nq, len(stored[0])), replace=False)
+        return chunks, np.asarray(stored[0][np.sort(pick)], dtype="float32")
+    sources = rng.integers(0, len(chunks), size=nq)
+    return chunks, _unit(chunks[sources] + 0.05 * rng.standard_normal((nq, chunks.shape[1])))
+
+
+def bench(chunks: np.ndarray, queries: np.ndarray, dims: list, quants: list, fetches: list,
+          k: int, tolerance: float) -> dict:
+    n, dim = chunks.shape
+    flat = faiss.IndexFlatL2(dim)
+    flat.add(chunks)
+    flat_ids = []
+    samples = time_calls(lambda q: flat_ids.append(flat.search(q.reshape(1, -1), k)[1][0]), queries)
+    flat_bytes = index_bytes(flat)
+    results = {f"flat[n={n}]": summarize(samples, bytes_per_vector=round(flat_bytes / n, 1),
+                                         memory_ratio=1.0, recall_at_k=1.0)}
+
+    # Rescoring reads the full vectors through a memmap, as in production
+    with tempfile.TemporaryDirectory() as tmp:
+        vectors_path = os.path.join(tmp, "vectors.npy")
+        np.save(vectors_path, chunks)
+        full = np.load(vectors_path, mmap_mode="r")
+
+        for reduced in dims:
+            for quant in quants:
+                compact = train_compact(chunks, reduced, quant)
+                size = index_bytes(compact)
+                label = factory_string(dim, min(reduced, dim), quant).replace(",", "+")
+                for fetch in fetches:
+                    ids = []
+                    if fetch:
+                        run = lambda q: ids.append(search_compact(compact, full, q.reshape(1, -1), k, fetch)[0][1])
+                    else:
+                        run = lambda q: ids.append(compact.search(q.reshape(1, -1), k)[1][0])
+                    samples = time_calls(run, queries)
+                    recall = float(np.mean([len(set(a) & set(b)) / k for a, b in zip(ids, flat_ids)]))
+                    results[f"compact[{label},fetch={fetch}]"] = summarize(
+                        samples, bytes_per_vector=round(size / n, 1), memory_ratio=round(flat_bytes / size, 2),
+                        recall_at_k=round(recall, 4), within_tolerance=recall >= 1 - tolerance)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact vector index: memory vs recall")
+    parser.add_argument("--index", default=None, help="built chunk index to use instead of a synthetic corpus")
+    parser.add_argument("--chunks", type=int, default=50000, help="synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384, help="synthetic vector dimension")
+    parser.add_argument("--dims", default="64,96,128,192,384", help="PCA output dimensions")
+    parser.add_argument("--quants", default="int8,fp16")
+    parser.add_argument("--fetch", default="0,20,40,100", help="candidates rescored exactly (0 = first pass only)")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--tolerance", type=float, default=0.01, help="max recall@k loss vs flat")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_compressed.json")
+    parser.add_argument("--compare", default=None, help="previous result file to diff against")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.index:
+        chunks, queries = real_corpus(args.index, args.queries, rng)
+    else:
+        chunks, queries = synthetic_corpus(args.chunks, args.dim, args.queries, rng)
+    print(f"⏱️  {len(chunks)} chunks x {chunks.shape[1]} dims, {len(queries)} queries")
+
+    stages = bench(chunks, queries, [int(d) for d in args.dims.split(",")], args.quants.split(","),
+                   [int(f) for f in args.fetch.split(",")], args.k, args.tolerance)
+
+    result = {"meta": run_metadata(k=args.k, tolerance=args.tolerance, source=args.index or "synthetic",
+                                   chunks=len(chunks), dim=int(chunks.shape[1])),
+              "stages": stages}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    # Trade-off curve: smallest index first
+    print(f"\n{'stage':<40} {'B/vec':>7} {'smaller':>8} {'recall':>7} {'p50':>8} {'p95':>8}")
+    for name, s in sorted(stages.items(), key=lambda kv: -kv[1]["memory_ratio"]):
+        mark = "✅" if s.get("within_tolerance", True) else "  "
+        print(f"{mark}{name:<38} {s['bytes_per_vector']:>7.1f} {s['memory_ratio']:>7.2f}x "
+              f"{s['recall_at_k']:>7.3f} {s['p50_ms']:>8.3f} {s['p95_ms']:>8.3f}")
+    print(f"\n💾 Saved: {args.out}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# benchmarks/bench_encoder.py
+#
+# Query encoder backends: per-query embed latency and resident memory.
+#
+#   python -m rag.encoders export                       # once
+#   python -m benchmarks.bench_encoder --out encoder.json
+#
+# Every backend is measured in a fresh subprocess so the RSS numbers are not
+# polluted by the other backends (or by torch being imported for ONNX).
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import summarize, time_calls, run_metadata, compare
+from benchmarks.bench_rag import QUERIES
+from rag.config import EMBEDDER_NAME, ENCODER_ONNX_PATH
+
+VARIANTS = ["torch", "onnx-fp32", "onnx-int8"]
+
+
+def rss_mb() -> float:
+    """Current resident set size in MB"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def unique_queries(n: int) -> list:
+    """n distinct short queries (no caching effects)"""
+    return [f"{QUERIES[i % len(QUERIES)].lower()} #{i}" for i in range(n)]
+
+# ============================================
+# Worker (one backend per process)
+# ============================================
+
+def run_variant(variant: str, path: str, n: int, batch: int) -> dict:
+    from rag.encoders import OnnxEncoder, TorchEncoder
+
+    before = rss_mb()
+    start = time.perf_counter()
+    if variant == "torch":
+        encoder = TorchEncoder(EMBEDDER_NAME)
+    else:
+        encoder = OnnxEncoder(path, int8=variant == "onnx-int8")
+    load_s = time.perf_counter() - start
+    loaded = rss_mb()
+
+    queries = unique_queries(n)
+    for q in queries[:10]:                      # warm-up
+        encoder.encode([q])
+    samples = time_calls(lambda q: encoder.encode([q]), queries)
+
+    start = time.perf_counter()
+    encoder.encode(queries, batch_size=batch)
+    batch_wall = time.perf_counter() - start
+
+    return {
+        f"embed.single[{variant}]": summarize(samples, load_s=round(load_s, 3),
+                                              rss_mb=round(rss_mb(), 1),
+                                              encoder_rss_mb=round(loaded - before, 1)),
+        f"embed.batch{batch}[{variant}]": summarize([batch_wall / n] * n, wall=batch_wall),
+    }
+
+# ============================================
+# Main
+# ============================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Query encoder latency/memory benchmark")
+    parser.add_argument("--variants", default=",".join(VARIANTS))
+    parser.add_argument("--path", default=ENCODER_ONNX_PATH, help="ONNX export directory")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--out", default="bench_encoder.json")
+    parser.add_argument("--compare", default=None, help="previous result file to diff against")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_variant(args.worker, args.path, args.queries, args.batch)))
+        return
+
+    stages = {}
+    for variant in args.variants.split(","):
+        print(f"⏱️  {variant}")
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_encoder", "--worker", variant, "--path", args.path,
+             "--queries", str(args.queries), "--batch", str(args.batch)],
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(f"⚠️  {variant} failed:\n{proc.stderr.strip().splitlines()[-1] if proc.stderr else ''}")
+            continue
+        stages.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    parity = {}
+    manifest_path = os.path.join(args.path, "encoder.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            parity = json.load(f).get("parity", {})
+
+    result = {"meta": run_metadata(embedder=EMBEDDER_NAME, parity=parity), "stages": stages}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"\n{'stage':<28} {'p50':>9} {'p95':>9} {'p99':>9} {'ops/s':>9} {'enc MB':>8} {'RSS MB':>8}")
+    for name, s in stages.items():
+        print(f"{name:<28} {s['p50_ms']:>9.3f} {s['p95_ms']:>9.3f} {s['p99_ms']:>9.3f} "
+              f"{s['throughput_per_s']:>9.1f} {s.get('encoder_rss_mb', ''):>8} {s.get('rss_mb', ''):>8}")
+    for model_file, p in parity.items():
+        print(f"   parity {model_file}: min cosine {p['min_cosine']} ({'pass' if p['passed'] else 'FAIL'})")
+    print(f"\n💾 Saved: {args.out}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
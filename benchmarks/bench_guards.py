@@ -0,0 +1,67 @@
+# benchmarks/bench_guards.py
+#
+# Micro-benchmark: legacy linear keyword scans vs the compiled guard engine.
+#   python -m benchmarks.bench_guards [iterations]
+
+import re
+import sys
+import timeit
+
+from rag.guards import (
+    EMERGENCY_KEYWORDS, GREETINGS, FAREWELLS, INVALID_QUERIES, classify
+)
+
+QUERIES = [
+    "hi",
+    "Hello there!",
+    "thanks!",
+    "What should I feed my Labrador Retriever?",
+    "hip dysplasia in german shepherds",
+    "my dog swallowed a sock and is not breathing well",
+    "Are Maine Coon cats prone to any health problems?",
+    "tell me more",
+    "How much exercise does a Border Collie need every day?",
+    "my cat ate chocolate, is it toxic?",
+]
+
+# ============================================
+# Legacy implementation (pre-engine)
+# ============================================
+
+def legacy_classify(query: str) -> dict:
+    text = query.strip()
+    english_chars = len(re.findall(r'[a-zA-Z]', text))
+    total_alpha = len(re.findall(r'[^\s\d\W]', text)) or 1
+    q = query.lower()
+    qs = q.strip().rstrip('!.,?')
+    return {
+        "english": english_chars / max(total_alpha, 1) > 0.7,
+        "emergency": any(kw in q for kw in EMERGENCY_KEYWORDS),
+        "greeting": qs in GREETINGS or any(qs.startswith(g) for g in GREETINGS),
+        "farewell": qs in FAREWELLS,
+        "invalid": len(q.strip()) < 3 or q.strip() in INVALID_QUERIES,
+    }
+
+
+def bench(fn, iterations: int) -> float:
+    """Best-of-5 microseconds per query"""
+    timer = timeit.Timer(lambda: [fn(q) for q in QUERIES])
+    best = min(timer.repeat(repeat=5, number=iterations))
+    return best / (iterations * len(QUERIES)) * 1e6
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    legacy = bench(legacy_classify, n)
+    compiled = bench(classify, n)
+
+    print(f"legacy   : {legacy:7.2f} µs/query")
+    print(f"compiled : {compiled:7.2f} µs/query ({legacy / compiled:.2f}x)")
+
+    print("\nIntent differences (legacy -> compiled):")
+    for q in QUERIES:
+        old, new = legacy_classify(q), classify(q)
+        diff = {k: f"{old[k]}->{new[k]}" for k in new if old[k] != new[k]}
+        if diff:
+            print(f"  {q!r}: {diff}")
@@ -0,0 +1,105 @@
+# benchmarks/bench_hierarchical.py
+#
+# Flat chunk search vs two-stage (article -> chunk) search as the corpus grows.
+#
+#   python -m benchmarks.bench_hierarchical --articles 1000,10000,50000 --out hier.json
+#
+# The corpus is synthetic: every article has a topic direction, its chunks and
+# title are noisy copies of it, and each query is drawn around one article's
+# topic. Reported per size: latency, recall@k against exact flat search, and
+# source hit rate (a chunk of the query's article in the top k - the
+# `source_found` metric of evaluation.py).
+
+import argparse
+import json
+
+import faiss
+import numpy as np
+
+from benchmarks.common import summarize, time_calls, run_metadata, compare
+from rag.hierarchy import article_vector, search_hierarchical
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    return (x / np.linalg.norm(x, axis=-1, keepdims=True)).astype("float32")
+
+
+def synthetic_corpus(n_articles: int, dim: int, rng: np.random.Generator, noise: float = 0.08):
+    """(chunk vectors, (n, 2) chunk ranges, article vectors, topic directions)"""
+    topics = _unit(rng.standard_normal((n_articles, dim)))
+    sizes = rng.integers(3, 16, size=n_articles)
+    ends = np.cumsum(sizes)
+    ranges = np.stack([ends - sizes, ends], axis=1)
+
+    owner = np.repeat(np.arange(n_articles), sizes)
+    chunks = _unit(topics[owner] + noise * rng.standard_normal((len(owner), dim)))
+    titles = _unit(topics + noise * rng.standard_normal(topics.shape))
+    articles = np.vstack([article_vector(titles[a], chunks[s:e]) for a, (s, e) in enumerate(ranges)])
+    return chunks, ranges, articles, topics
+
+
+def bench_size(n_articles: int, dim: int, k: int, top_articles: list, nq: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    chunks, ranges, articles, topics = synthetic_corpus(n_articles, dim, rng)
+
+    chunk_index = faiss.IndexFlatL2(dim)
+    chunk_index.add(chunks)
+    article_index = faiss.IndexFlatL2(dim)
+    article_index.add(articles)
+
+    sources = rng.integers(0, n_articles, size=nq)
+    queries = _unit(topics[sources] + 0.12 * rng.standard_normal((nq, dim)))
+
+    def source_rate(ids_per_query):
+        return float(np.mean([any(ranges[a][0] <= i < ranges[a][1] for i in ids)
+                              for a, ids in zip(sources, ids_per_query)]))
+
+    flat_ids = []
+    samples = time_calls(lambda q: flat_ids.append(chunk_index.search(q.reshape(1, -1), k)[1][0]), queries)
+    tag = f"[articles={n_articles},chunks={chunk_index.ntotal}]"
+    results = {f"flat{tag}": summarize(samples, source_hit_rate=round(source_rate(flat_ids), 4))}
+
+    for m in top_articles:
+        ids = []
+        samples = time_calls(lambda q: ids.append(search_hierarchical(
+            q, article_index, ranges, chunk_index.reconstruct_n, k, m)[1]), queries)
+        recall = np.mean([len(set(h) & set(f)) / k for h, f in zip(ids, flat_ids)])
+        results[f"hierarchical[M={m}]{tag}"] = summarize(samples, recall_at_k=round(float(recall), 4),
+                                                         source_hit_rate=round(source_rate(ids), 4))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flat vs hierarchical retrieval benchmark")
+    parser.add_argument("--articles", default="1000,10000,50000", help="corpus sizes (articles)")
+    parser.add_argument("--top-articles", default="4,8,16", help="M values for stage one")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_hierarchical.json")
+    parser.add_argument("--compare", default=None, help="previous result file to diff against")
+    args = parser.parse_args()
+
+    stages = {}
+    for n in [int(x) for x in args.articles.split(",")]:
+        print(f"⏱️  {n} articles")
+        stages.update(bench_size(n, args.dim, args.k, [int(m) for m in args.top_articles.split(",")],
+                                 args.queries, args.seed))
+
+    result = {"meta": run_metadata(dim=args.dim, k=args.k), "stages": stages}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"\n{'stage':<52} {'p50':>9} {'p95':>9} {'recall':>7} {'source':>7}")
+    for name, s in stages.items():
+        print(f"{name:<52} {s['p50_ms']:>9.3f} {s['p95_ms']:>9.3f} "
+              f"{s.get('recall_at_k', 1.0):>7.3f} {s['source_hit_rate']:>7.3f}")
+    print(f"\n💾 Saved: {args.out}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
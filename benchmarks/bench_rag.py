@@ -0,0 +1,325 @@
+# benchmarks/bench_rag.py
+#
+# Stage-by-stage and end-to-end latency/throughput benchmark for the RAG stack.
+#
+#   python -m benchmarks.bench_rag --stand-in --out bench.json
+#   python -m benchmarks.bench_rag --out new.json --compare bench.json
+#
+# --stand-in builds a tiny local LLM + embedder and a synthetic corpus, so the
+# suite runs on any CI box without downloading models or the PetMD index.
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import summarize, time_calls, run_metadata, compare
+
+QUERIES = [
+    "What should I feed my dog?",
+    "How often should I take my cat to the vet?",
+    "My dog ate chocolate, what should I do?",
+    "Why is my cat sneezing so much?",
+    "How much exercise does a Border Collie need?",
+    "Are Maine Coon cats prone to any health problems?",
+    "How do I brush my dog's teeth?",
+    "What are the signs of kidney disease in cats?",
+    "Is it normal for a puppy to sleep all day?",
+    "How can I help my dog with separation anxiety?",
+    "What vaccines does a kitten need?",
+    "My cat is not breathing normally",
+    "How do I get rid of fleas on my dog?",
+    "What is the temperament of a Beagle?",
+    "Can cats eat tuna?",
+    "How big do Labrador Retrievers get?",
+]
+
+# ============================================
+# Setup
+# ============================================
+
+def prepare_environment(args) -> dict:
+    """Point rag.config at stand-in models / a synthetic index (must run before rag imports)"""
+    from benchmarks.stand_in import build_stand_in_llm, build_stand_in_embedder, synthetic_corpus
+
+    info = {"llm": os.getenv("RAG_LLM_NAME", "default"), "corpus": "data"}
+    if not (args.stand_in or args.synthetic_corpus):
+        return info
+
+    os.makedirs(args.workdir, exist_ok=True)
+    articles = synthetic_corpus(args.articles)
+    texts = QUERIES + [a["text"] for a in articles.values()]
+
+    if args.stand_in:
+        print("🧪 Building stand-in models...")
+        os.environ["RAG_LLM_NAME"] = build_stand_in_llm(os.path.join(args.workdir, "llm"), texts)
+        os.environ["RAG_EMBEDDER_NAME"] = build_stand_in_embedder(os.path.join(args.workdir, "embedder"), texts)
+        info["llm"] = "stand-in"
+
+    print(f"🧪 Building synthetic index ({len(articles)} articles)...")
+    articles_path = os.path.join(args.workdir, "articles_data.jsonl")
+    with open(articles_path, "w", encoding="utf-8") as f:
+        for title, data in articles.items():
+            f.write(json.dumps({"title": title, **data}) + "\n")
+    os.environ["RAG_ARTICLES_PATH"] = articles_path
+    os.environ["RAG_INDEX_PATH"] = os.path.join(args.workdir, "petmd.index")
+    os.environ["RAG_DOCS_PATH"] = os.path.join(args.workdir, "documents_semantic.jsonl")
+    # The synthetic articles are templated, so dedup would collapse them to a handful of chunks
+    os.environ.setdefault("RAG_DEDUP", "false")
+    subprocess.run([sys.executable, "-m", "rag.build_index"], check=True, stdout=subprocess.DEVNULL)
+
+    info["corpus"] = f"synthetic-{len(articles)}"
+    return info
+
+# ============================================
+# Stages
+# ============================================
+
+def bench_guards(repeat: int) -> dict:
+    from rag.guards import classify
+    samples = time_calls(classify, QUERIES * repeat)
+    return {"guards.classify": summarize(samples)}
+
+
+def bench_embedding() -> dict:
+    from rag import retriever
+
+    # Cold: bypass the lru_cache entirely
+    cold = time_calls(lambda q: retriever.embedder.encode([q.lower()]), QUERIES * 3)
+
+    # Cached: every query already seen once
+    retriever.get_embedding.cache_clear()
+    for q in QUERIES:
+        retriever.get_embedding(q)
+    cached = time_calls(retriever.get_embedding, QUERIES * 20)
+
+    return {"embed.cold": summarize(cold), "embed.cached": summarize(cached)}
+
+
+def bench_faiss(sizes, types, dim: int, nq: int, k: int = 5) -> dict:
+    import faiss
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((nq, dim)).astype("float32")
+    results = {}
+
+    for n in sizes:
+        vectors = rng.standard_normal((n, dim)).astype("float32")
+        for spec in types:
+            factory = spec.replace("{nlist}", str(max(1, int(np.sqrt(n)))))
+            index = faiss.index_factory(dim, factory)
+            start = time.perf_counter()
+            if not index.is_trained:
+                index.train(vectors)
+            index.add(vectors)
+            build_s = time.perf_counter() - start
+
+            samples = time_calls(lambda q: index.search(q.reshape(1, -1), k), queries)
+            results[f"faiss.search[{spec},n={n}]"] = summarize(samples, build_s=round(build_s, 3))
+    return results
+
+
+def bench_retrieval() -> dict:
+    from rag import retriever
+
+    rng = np.random.default_rng(0)
+    ids = rng.integers(0, len(retriever.documents), size=(500, 5))
+
+    def lookup(row):
+        return [retriever.documents[i].copy() for i in row]
+
+    return {
+        "retrieval.doc_lookup": summarize(time_calls(lookup, ids)),
+        "retrieval.retrieve_chunks": summarize(time_calls(retriever.retrieve_chunks, QUERIES * 3)),
+    }
+
+
+def bench_llm(decode_tokens: int) -> dict:
+    import torch
+    from rag import chatbot
+    from rag.generation import build_prompt, generate_answer
+    from rag.guards import classify
+    from rag.retriever import retrieve_chunks
+
+    prompts = [build_prompt(chatbot.tokenizer, q, retrieve_chunks(q, k=5)) for q in QUERIES]
+    results = {"prompt.build": summarize(time_calls(
+        lambda q: build_prompt(chatbot.tokenizer, q, retrieve_chunks(q, k=5)), QUERIES))}
+
+    tokenize = lambda p: chatbot.tokenizer(p, return_tensors="pt", truncation=True, max_length=1024)
+    results["llm.tokenize"] = summarize(time_calls(tokenize, prompts))
+
+    prefill, decode, tps, prompt_tokens = [], [], [], []
+    for p in prompts[:8]:
+        inputs = tokenize(p).to(chatbot.device)
+        prompt_tokens.append(inputs["input_ids"].shape[1])
+
+        with torch.no_grad():
+            start = time.perf_counter()
+            chatbot.model(**inputs)
+            prefill_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            out = chatbot.model.generate(
+                **inputs, max_new_tokens=decode_tokens, min_new_tokens=decode_tokens,
+                do_sample=False, pad_token_id=chatbot.tokenizer.eos_token_id
+            )
+            total_s = time.perf_counter() - start
+
+        new_tokens = out.shape[1] - inputs["input_ids"].shape[1]
+        decode_s = max(total_s - prefill_s, 1e-9)
+        prefill.append(prefill_s)
+        decode.append(decode_s)
+        tps.append(new_tokens / decode_s)
+
+    results["llm.prefill"] = summarize(prefill, prompt_tokens_mean=float(np.mean(prompt_tokens)))
+    results["llm.decode"] = summarize(decode, tokens_per_s=round(float(np.mean(tps)), 2),
+                                      new_tokens=decode_tokens)
+
+    # Full generation controller: budgets + early stopping (tokens actually decoded)
+    answer_tokens = []
+    def answer(q):
+        _, n = generate_answer(chatbot.model, chatbot.tokenizer, q, retrieve_chunks(q, k=5),
+                               classify(q), device=chatbot.device)
+        answer_tokens.append(n)
+    samples = time_calls(answer, QUERIES[:8])
+    results["llm.generate_answer"] = summarize(samples, new_tokens_mean=float(np.mean(answer_tokens)))
+
+    results["pipeline.answer_question"] = summarize(time_calls(chatbot.answer_question, QUERIES[:8]))
+    # Degraded tier: cited sentences from the retrieved chunks, no LLM
+    results["pipeline.answer_extractive"] = summarize(time_calls(
+        lambda q: chatbot.answer_question(q, tier=chatbot.TIER_EXTRACTIVE), QUERIES * 3))
+    return results
+
+
+def bench_api(n_requests: int, concurrency: int) -> dict:
+    import httpx
+    from backend.main import app
+
+    async def load():
+        transport = httpx.ASGITransport(app=app)
+        sem = asyncio.Semaphore(concurrency)
+        samples = []
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            async def one(i):
+                async with sem:
+                    start = time.perf_counter()
+                    r = await client.post("/api/chat", json={"message": QUERIES[i % len(QUERIES)]})
+                    r.raise_for_status()
+                    samples.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(n_requests)))
+            return samples, time.perf_counter() - start
+
+    samples, wall = asyncio.run(load())
+    return {f"api.chat[c={concurrency}]": summarize(samples, wall=wall)}
+
+def bench_priority(n_requests: int, concurrency: int, emergency_share: float = 0.2) -> dict:
+    """Per-priority API latency while routine questions saturate the inference workers"""
+    import httpx
+    from backend.main import app
+    from backend.utils.scheduler import request_priority, EMERGENCY
+
+    emergencies = [q for q in QUERIES if request_priority(q) == EMERGENCY]
+    routine = [q for q in QUERIES if q not in emergencies]
+    every = max(int(round(1 / emergency_share)), 1)
+    plan = []
+    for i in range(n_requests):
+        pool = emergencies if i % every == 0 else routine
+        plan.append(f"{pool[i % len(pool)]} ({i})")   # unique, so single-flight can't coalesce them
+
+    async def load():
+        transport = httpx.ASGITransport(app=app)
+        sem = asyncio.Semaphore(concurrency)
+        samples = {}
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            async def one(message):
+                async with sem:
+                    start = time.perf_counter()
+                    r = await client.post("/api/chat", json={"message": message})
+                    r.raise_for_status()
+                    samples.setdefault(request_priority(message), []).append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(one(m) for m in plan))
+            return samples, time.perf_counter() - start
+
+    samples, wall = asyncio.run(load())
+    return {f"api.chat.{priority}[c={concurrency}]": summarize(s, wall=wall) for priority, s in samples.items()}
+
+# ============================================
+# Main
+# ============================================
+
+def _split_factories(spec: str) -> list:
+    """Split "Flat,IVF{nlist},Flat,HNSW32" into factory strings (IVF specs contain a comma)"""
+    parts, out = spec.split(","), []
+    for part in parts:
+        if out and out[-1].startswith("IVF") and "," not in out[-1]:
+            out[-1] += "," + part
+        else:
+            out.append(part)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG stack latency/throughput benchmark")
+    parser.add_argument("--stand-in", action="store_true", help="tiny local LLM/embedder + synthetic corpus")
+    parser.add_argument("--synthetic-corpus", action="store_true", help="synthetic corpus with the configured models")
+    parser.add_argument("--articles", type=int, default=200, help="synthetic corpus size")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "rag-bench"))
+    parser.add_argument("--faiss-sizes", default="1000,10000,100000")
+    parser.add_argument("--faiss-types", default="Flat,IVF{nlist},Flat,HNSW32")
+    parser.add_argument("--decode-tokens", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--skip", default="", help="comma-separated stages to skip: guards,embed,faiss,retrieval,llm,api,priority")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", default=None, help="previous result file to diff against")
+    args = parser.parse_args()
+
+    skip = set(filter(None, args.skip.split(",")))
+    meta = run_metadata(**prepare_environment(args))
+    stages = {}
+
+    if "guards" not in skip:
+        print("⏱️  guards"); stages.update(bench_guards(repeat=50))
+    if "embed" not in skip:
+        print("⏱️  embedding"); stages.update(bench_embedding())
+    if "faiss" not in skip:
+        from rag.retriever import index
+        print("⏱️  faiss")
+        types = _split_factories(args.faiss_types)
+        stages.update(bench_faiss([int(s) for s in args.faiss_sizes.split(",")], types, index.d, nq=200))
+    if "retrieval" not in skip:
+        print("⏱️  retrieval"); stages.update(bench_retrieval())
+    if "llm" not in skip:
+        print("⏱️  llm"); stages.update(bench_llm(args.decode_tokens))
+    if "api" not in skip:
+        print("⏱️  api"); stages.update(bench_api(args.requests, args.concurrency))
+    if "priority" not in skip:
+        print("⏱️  priority"); stages.update(bench_priority(args.requests, args.concurrency))
+
+    result = {"meta": meta, "stages": stages}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"\n{'stage':<40} {'p50':>9} {'p95':>9} {'p99':>9} {'ops/s':>9}")
+    for name, s in stages.items():
+        print(f"{name:<40} {s['p50_ms']:>9.3f} {s['p95_ms']:>9.3f} {s['p99_ms']:>9.3f} {s['throughput_per_s']:>9.1f}")
+    print(f"\n💾 Saved: {args.out}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
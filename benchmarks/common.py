@@ -0,0 +1,68 @@
+# benchmarks/common.py
+
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+
+def summarize(samples: List[float], wall: Optional[float] = None, **extra) -> Dict:
+    """Latency percentiles (ms) and throughput for a list of durations in seconds"""
+    arr = np.asarray(samples, dtype=float) * 1000
+    wall = wall if wall is not None else float(np.sum(samples))
+    stats = {
+        "n": int(arr.size),
+        "mean_ms": round(float(arr.mean()), 4) if arr.size else None,
+        "p50_ms": round(float(np.percentile(arr, 50)), 4) if arr.size else None,
+        "p95_ms": round(float(np.percentile(arr, 95)), 4) if arr.size else None,
+        "p99_ms": round(float(np.percentile(arr, 99)), 4) if arr.size else None,
+        "throughput_per_s": round(arr.size / wall, 3) if wall > 0 else None,
+    }
+    stats.update(extra)
+    return stats
+
+
+def time_calls(fn: Callable, inputs: Iterable) -> List[float]:
+    """Duration in seconds of fn(x) for every x"""
+    samples = []
+    for x in inputs:
+        start = time.perf_counter()
+        fn(x)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run_metadata(**extra) -> Dict:
+    """Commit, time and host info stored with every result file"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    meta = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+    meta.update(extra)
+    return meta
+
+
+def compare(current: Dict, baseline_path: str, metric: str = "p95_ms"):
+    """Print per-stage change of `metric` against a previous result file"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    print(f"\n📊 {metric} vs {baseline_path} ({baseline['meta'].get('commit') or '?'})")
+    for stage, stats in current["stages"].items():
+        old = baseline["stages"].get(stage, {}).get(metric)
+        new = stats.get(metric)
+        if old and new:
+            change = (new - old) / old * 100
+            flag = "⚠️ " if change > 10 else "  "
+            print(f"{flag}{stage:<40} {old:>10.3f} -> {new:>10.3f}  ({change:+.1f}%)")
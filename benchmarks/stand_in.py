@@ -0,0 +1,125 @@
+# benchmarks/stand_in.py
+#
+# Tiny, randomly initialised stand-ins for the LLM and the sentence embedder.
+# They are built locally in a few seconds (no model download), use the same
+# architectures and loading code as the real models, and are only meant for
+# measuring the pipeline around them - their answers are gibberish.
+
+import os
+from typing import List
+
+SPECIAL_TOKENS = ["<unk>", "<pad>", "<|im_start|>", "<|im_end|>", "<|endoftext|>"]
+
+# Minimal Qwen-style chat template so apply_chat_template works offline
+CHAT_TEMPLATE = (
+    "{% for message in messages %}"
+    "<|im_start|>{{ message['role'] }}\n{{ message['content'] }}<|im_end|>\n"
+    "{% endfor %}"
+    "{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}"
+)
+
+
+def _train_tokenizer(texts: List[str], vocab_size: int, word_piece: bool = False):
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+
+    if word_piece:
+        tok = Tokenizer(models.WordPiece(unk_token="[UNK]"))
+        tok.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+        tok.decoder = decoders.WordPiece()
+        trainer = trainers.WordPieceTrainer(
+            vocab_size=vocab_size, special_tokens=["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+        )
+    else:
+        tok = Tokenizer(models.BPE(unk_token="<unk>"))
+        tok.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+        tok.decoder = decoders.ByteLevel()
+        trainer = trainers.BpeTrainer(
+            vocab_size=vocab_size, special_tokens=SPECIAL_TOKENS,
+            initial_alphabet=pre_tokenizers.ByteLevel.alphabet()
+        )
+
+    tok.train_from_iterator(texts, trainer)
+    return tok
+
+
+def build_stand_in_llm(path: str, texts: List[str], vocab_size: int = 2000) -> str:
+    """Save a ~1M parameter Qwen2 causal LM + BPE tokenizer to `path`"""
+    import torch
+    from transformers import PreTrainedTokenizerFast, Qwen2Config, Qwen2ForCausalLM
+
+    if os.path.exists(os.path.join(path, "config.json")):
+        return path
+
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=_train_tokenizer(texts, vocab_size),
+        unk_token="<unk>", pad_token="<pad>", eos_token="<|im_end|>",
+        additional_special_tokens=["<|im_start|>", "<|endoftext|>"]
+    )
+    tokenizer.chat_template = CHAT_TEMPLATE
+    tokenizer.save_pretrained(path)
+
+    config = Qwen2Config(
+        vocab_size=len(tokenizer), hidden_size=64, intermediate_size=128,
+        num_hidden_layers=2, num_attention_heads=4, num_key_value_heads=2,
+        max_position_embeddings=4096, tie_word_embeddings=True,
+        eos_token_id=tokenizer.eos_token_id, pad_token_id=tokenizer.pad_token_id
+    )
+    torch.manual_seed(0)
+    Qwen2ForCausalLM(config).save_pretrained(path)
+    return path
+
+
+def build_stand_in_embedder(path: str, texts: List[str], dim: int = 384, vocab_size: int = 4000) -> str:
+    """Save a 2-layer BERT sentence-transformer with MiniLM's output dimension to `path`"""
+    import torch
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    if os.path.exists(os.path.join(path, "modules.json")):
+        return path
+
+    base = os.path.join(path, "transformer")
+    tokenizer = BertTokenizerFast(tokenizer_object=_train_tokenizer(texts, vocab_size, word_piece=True),
+                                  unk_token="[UNK]", pad_token="[PAD]", cls_token="[CLS]",
+                                  sep_token="[SEP]", mask_token="[MASK]")
+    tokenizer.save_pretrained(base)
+
+    torch.manual_seed(0)
+    config = BertConfig(vocab_size=len(tokenizer), hidden_size=dim, intermediate_size=dim * 2,
+                        num_hidden_layers=2, num_attention_heads=4, max_position_embeddings=512)
+    BertModel(config).save_pretrained(base)
+
+    transformer = models.Transformer(base, max_seq_length=256)
+    pooling = models.Pooling(dim, pooling_mode="mean")
+    SentenceTransformer(modules=[transformer, pooling, models.Normalize()]).save(path)
+    return path
+
+
+def synthetic_corpus(n_articles: int = 200, paragraphs: int = 4) -> dict:
+    """{title: article} dict with PetMD-like wording"""
+    animals = ["dog", "cat"]
+    topics = ["nutrition", "grooming", "exercise", "allergies", "dental care", "vaccines",
+              "anxiety", "arthritis", "kidney disease", "fleas and ticks"]
+    breeds = ["Beagle", "Labrador Retriever", "Maine Coon", "Siamese", "Border Collie",
+              "Persian", "Poodle", "Bengal", "Boxer", "Ragdoll"]
+
+    articles = {}
+    for i in range(n_articles):
+        animal = animals[i % 2]
+        topic = topics[i % len(topics)]
+        breed = breeds[i % len(breeds)]
+        title = f"{breed} {topic.title()} Guide {i}"
+        text = "\n\n".join(
+            f"Paragraph {p} about {topic} for the {breed}. Owners of a {animal} should watch "
+            f"for changes in appetite, energy and behavior, and talk to a veterinarian about "
+            f"{topic} at every checkup. Most {breed} {animal}s do well with routine care and a "
+            f"balanced diet appropriate for their age and size."
+            for p in range(paragraphs)
+        )
+        articles[title] = {
+            "url": f"https://www.petmd.com/{animal}/synthetic/{i}",
+            "text": text,
+            "animals": [animal.title() + "s"],
+            "categories": [topic.title()]
+        }
+    return articles
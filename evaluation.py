@@ -2,16 +2,20 @@ import json
 import time
 import random
 import re
-from typing import List, Dict
+import os
+from typing import List, Dict, Tuple, Iterable, Iterator, Optional
 from collections import Counter
 
 # RAG imports
-from rag.chatbot import rag_chatbot
-from rag.retriever import retrieve_chunks
+# (the LLM is only loaded inside rag.eval_runner, once per worker process)
+from rag.eval_runner import run_tests, DEFAULT_SEED
+from rag.retriever import get_chunk_vectors
+from rag.config import EMBEDDER_NAME, ARTICLES_PATH
+from rag.corpus import existing_path, iter_articles
+from rag.questions import QUESTION_TEMPLATES
 
 # ML imports
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.feature_extraction.text import TfidfVectorizer
 import numpy as np
 
@@ -20,53 +24,22 @@ import numpy as np
 # 1️⃣ Load Articles Data
 # ============================================
 
-def load_articles(path: str = "./Data/articles_data.json") -> Dict:
-    """Load articles from JSON file"""
+def load_articles(path: str = ARTICLES_PATH) -> Optional[Iterator[Tuple[str, Dict]]]:
+    """Stream (title, article) pairs from the corpus; None if it is missing"""
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        print(f"📚 Loaded {len(data)} articles")
-        return data
+        path = existing_path(path, ".json")
     except FileNotFoundError:
         print(f"❌ Error: {path} not found!")
-        return {}
+        return None
+    print(f"📚 Streaming articles from {path}")
+    return iter_articles(path)
 
 
 # ============================================
 # 2️⃣ Question Templates
 # ============================================
 
-QUESTION_TEMPLATES = [
-    # Health
-    ("What health issues do {title} have?", "health"),
-    ("What diseases are common in {title}?", "health"),
-    ("Are {title} prone to any health problems?", "health"),
-
-    # Grooming
-    ("How do I groom a {title}?", "grooming"),
-    ("What grooming does a {title} need?", "grooming"),
-
-    # Feeding
-    ("What should I feed my {title}?", "feeding"),
-    ("How often should I feed a {title}?", "feeding"),
-
-    # Size
-    ("How big do {title} get?", "size"),
-    ("What is the size of a {title}?", "size"),
-
-    # Temperament
-    ("What is the temperament of a {title}?", "temperament"),
-    ("Are {title} good family pets?", "temperament"),
-    ("Are {title} friendly?", "temperament"),
-
-    # Exercise
-    ("How much exercise does a {title} need?", "exercise"),
-    ("Are {title} active dogs?", "exercise"),
-
-    # General
-    ("Tell me about {title}", "general"),
-    ("What should I know about {title}?", "general"),
-]
+# QUESTION_TEMPLATES live in rag/questions.py, shared with the answer warm-up
 
 
 # ============================================
@@ -121,12 +94,14 @@ def extract_keywords(text: str, category: str = None, top_n: int = 8) -> List[st
 # 4️⃣ Generate Test Cases Automatically
 # ============================================
 
-def generate_test_cases(articles: Dict, num_per_article: int = 2) -> List[Dict]:
-    """Auto-generate test cases from articles"""
+def generate_test_cases(articles: Iterable[Tuple[str, Dict]], num_per_article: int = 2,
+                        seed: int = DEFAULT_SEED) -> List[Dict]:
+    """Auto-generate test cases from articles (deterministic for a given seed)"""
 
+    rng = random.Random(seed)
     test_cases = []
 
-    for title, data in articles.items():
+    for title, data in articles:
         text = data.get("text", "")
 
         # Skip short articles
@@ -134,7 +109,7 @@ def generate_test_cases(articles: Dict, num_per_article: int = 2) -> List[Dict]:
             continue
 
         # Select random templates
-        templates = random.sample(
+        templates = rng.sample(
             QUESTION_TEMPLATES,
             min(num_per_article, len(QUESTION_TEMPLATES))
         )
@@ -158,18 +133,58 @@ def generate_test_cases(articles: Dict, num_per_article: int = 2) -> List[Dict]:
 # ============================================
 
 class Evaluator:
-    """Simple RAG Evaluator"""
+    """Simple RAG Evaluator (batched scoring)"""
 
-    def __init__(self):
+    def __init__(self, batch_size: int = 64):
         print("🔄 Loading evaluator...")
-        self.embedder = SentenceTransformer("all-MiniLM-L6-v2")
+        self.embedder = SentenceTransformer(EMBEDDER_NAME)
+        self.batch_size = batch_size
         print("✅ Evaluator ready!")
 
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Unit-normalized embeddings for a batch of texts"""
+        return self.embedder.encode(
+            texts, batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=True
+        )
+
+    def semantic_scores(self, q_embs: np.ndarray, r_embs: np.ndarray) -> np.ndarray:
+        """Row-wise similarity between question and response embeddings"""
+        return np.maximum(0.0, np.einsum("ij,ij->i", q_embs, r_embs))
+
+    def retrieval_qualities(self, q_embs: np.ndarray, chunk_ids: List[List[int]]) -> np.ndarray:
+        """Average relevance of each test's retrieved chunks, from stored index vectors"""
+        k = max((len(ids) for ids in chunk_ids), default=0)
+        if k == 0:
+            return np.zeros(len(chunk_ids))
+
+        # Look up every distinct chunk vector once
+        unique_ids = sorted({i for ids in chunk_ids for i in ids})
+        vectors = get_chunk_vectors(unique_ids)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+        position = {cid: p for p, cid in enumerate(unique_ids)}
+
+        # (tests, k) gather matrix with a padding mask
+        gather = np.zeros((len(chunk_ids), k), dtype=np.int64)
+        mask = np.zeros((len(chunk_ids), k), dtype=bool)
+        for t, ids in enumerate(chunk_ids):
+            gather[t, :len(ids)] = [position[i] for i in ids]
+            mask[t, :len(ids)] = True
+
+        sims = np.einsum("td,tkd->tk", q_embs, vectors[gather])
+        counts = mask.sum(axis=1)
+        return np.where(counts > 0, (sims * mask).sum(axis=1) / np.maximum(counts, 1), 0.0)
+
+    def score_batch(self, questions: List[str], responses: List[str],
+                    chunk_ids: List[List[int]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Semantic and retrieval scores for a whole test suite"""
+        embs = self.encode(list(questions) + list(responses))
+        q_embs, r_embs = embs[:len(questions)], embs[len(questions):]
+        return self.semantic_scores(q_embs, r_embs), self.retrieval_qualities(q_embs, chunk_ids)
+
     def semantic_score(self, question: str, response: str) -> float:
         """Semantic similarity between question and response"""
-        emb = self.embedder.encode([question, response])
-        sim = cosine_similarity([emb[0]], [emb[1]])[0][0]
-        return max(0, float(sim))
+        emb = self.encode([question, response])
+        return float(self.semantic_scores(emb[:1], emb[1:])[0])
 
     def keyword_score(self, response: str, keywords: List[str]) -> float:
         """Percentage of keywords found in response"""
@@ -193,51 +208,18 @@ class Evaluator:
         """Average relevance of retrieved chunks"""
         if not chunks:
             return 0.0
-
-        q_emb = self.embedder.encode([question])[0]
-        scores = []
-
-        for chunk in chunks:
-            c_emb = self.embedder.encode([chunk["text"]])[0]
-            sim = cosine_similarity([q_emb], [c_emb])[0][0]
-            scores.append(float(sim))
-
-        return np.mean(scores)
+        q_emb = self.encode([question])
+        return float(self.retrieval_qualities(q_emb, [[c["id"] for c in chunks]])[0])
 
 
 # ============================================
 # 6️⃣ Main Evaluation Function
 # ============================================
 
-def run_evaluation(num_tests: int = 30, questions_per_article: int = 2, verbose: bool = True):
-    """Run full evaluation"""
-
-    print("\n" + "=" * 60)
-    print("🐾 PET HEALTH RAG - EVALUATION")
-    print("=" * 60)
-
-    # Load articles
-    articles = load_articles()
-    if not articles:
-        return None
-
-    # Generate test cases
-    print("🔧 Generating test cases...")
-    all_tests = generate_test_cases(articles, questions_per_article)
-    print(f"   Generated {len(all_tests)} possible tests")
-
-    # Sample tests
-    if len(all_tests) > num_tests:
-        test_cases = random.sample(all_tests, num_tests)
-    else:
-        test_cases = all_tests
-
-    print(f"🧪 Running {len(test_cases)} tests...\n")
-
-    # Initialize
-    evaluator = Evaluator()
+def score_responses(test_cases: List[Dict], records: List[Dict], evaluator: "Evaluator",
+                    verbose: bool = True) -> Dict:
+    """Score all generated responses in a few batched matrix operations"""
 
-    # Results storage
     results = {
         "total": len(test_cases),
         "passed": 0,
@@ -252,29 +234,23 @@ def run_evaluation(num_tests: int = 30, questions_per_article: int = 2, verbose:
         "details": []
     }
 
-    # Run tests
-    for i, test in enumerate(test_cases, 1):
+    sem_scores, ret_scores = evaluator.score_batch(
+        [r["question"] for r in records],
+        [r["response"] for r in records],
+        [[c["id"] for c in r["chunks"]] for r in records]
+    )
+
+    for test, record, sem_score, ret_score in zip(test_cases, records, sem_scores, ret_scores):
         question = test["question"]
-        keywords = test["keywords"]
         expected = test["expected_source"]
         category = test["category"]
+        response = record["response"]
+        elapsed = record["time"]
 
-        if verbose:
-            print(f"[{i:02d}/{len(test_cases)}] {category}: {question[:45]}...")
-
-        # Time the response
-        start = time.time()
-        response = rag_chatbot(question)
-        elapsed = time.time() - start
-
-        # Get chunks
-        chunks = retrieve_chunks(question, k=5)
-
-        # Calculate scores
-        sem_score = evaluator.semantic_score(question, response)
-        kw_score = evaluator.keyword_score(response, keywords)
-        ret_score = evaluator.retrieval_quality(question, chunks)
-        src_found = evaluator.source_found(chunks, expected)
+        sem_score = float(sem_score)
+        ret_score = float(ret_score)
+        kw_score = evaluator.keyword_score(response, test["keywords"])
+        src_found = evaluator.source_found(record["chunks"], expected)
 
         # Store scores
         results["scores"]["semantic"].append(sem_score)
@@ -321,7 +297,53 @@ def run_evaluation(num_tests: int = 30, questions_per_article: int = 2, verbose:
 
         if verbose:
             src_icon = "✓" if src_found else "✗"
-            print(f"     {status} sem:{sem_score:.2f} | kw:{kw_score:.2f} | ret:{ret_score:.2f} | src:{src_icon} | {elapsed:.1f}s")
+            print(f"  {status} {question[:45]:<45} sem:{sem_score:.2f} | kw:{kw_score:.2f} | ret:{ret_score:.2f} | src:{src_icon} | {elapsed:.1f}s")
+
+    return results
+
+
+def run_evaluation(num_tests: int = 30, questions_per_article: int = 2, verbose: bool = True,
+                   workers: int = 1, checkpoint: str = None, seed: int = DEFAULT_SEED):
+    """
+    Run full evaluation
+
+    - **workers**: processes answering tests in parallel (each loads the model once)
+    - **checkpoint**: JSONL file of finished tests; an interrupted run resumes from it
+    - **seed**: fixes test generation and sampling so runs are comparable
+    """
+
+    print("\n" + "=" * 60)
+    print("🐾 PET HEALTH RAG - EVALUATION")
+    print("=" * 60)
+
+    # Load articles
+    articles = load_articles()
+    if articles is None:
+        return None
+
+    # Generate test cases
+    print("🔧 Generating test cases...")
+    all_tests = generate_test_cases(articles, questions_per_article, seed=seed)
+    print(f"   Generated {len(all_tests)} possible tests (seed={seed})")
+
+    # Sample tests
+    if len(all_tests) > num_tests:
+        test_cases = random.Random(seed).sample(all_tests, num_tests)
+    else:
+        test_cases = all_tests
+
+    print(f"🧪 Running {len(test_cases)} tests...\n")
+
+    # Generate every answer first (parallel, checkpointed), then score them all at once
+    records = run_tests(test_cases, k=5, workers=workers, checkpoint=checkpoint, verbose=verbose)
+
+    # Initialize
+    evaluator = Evaluator()
+
+    print("\n📐 Scoring...")
+    start = time.time()
+    results = score_responses(test_cases, records, evaluator, verbose=verbose)
+    print(f"   Scored {len(records)} tests in {time.time() - start:.2f}s")
 
     # Print summary
     print_summary(results)
@@ -461,10 +483,10 @@ def generate_markdown_report(results: Dict) -> str:
 # 9️⃣ Quick Test
 # ============================================
 
-def quick_test(n: int = 5):
+def quick_test(n: int = 5, **kwargs):
     """Quick test for debugging"""
     print("⚡ Quick Test Mode")
-    return run_evaluation(num_tests=n, questions_per_article=1, verbose=True)
+    return run_evaluation(num_tests=n, questions_per_article=1, verbose=True, **kwargs)
 
 
 # ============================================
@@ -472,7 +494,7 @@ def quick_test(n: int = 5):
 # ============================================
 
 if __name__ == "__main__":
-    import sys
+    import argparse
 
     print("""
 ╔════════════════════════════════════════════════════════════╗
@@ -480,18 +502,23 @@ if __name__ == "__main__":
 ╚════════════════════════════════════════════════════════════╝
     """)
 
-    # Check for command line args
-    if len(sys.argv) > 1:
-        if sys.argv[1] == "--quick":
-            quick_test(5)
-        elif sys.argv[1] == "--full":
-            run_evaluation(num_tests=50, questions_per_article=3)
-        elif sys.argv[1].isdigit():
-            run_evaluation(num_tests=int(sys.argv[1]))
-        else:
-            print("Usage: python evaluation.py [--quick | --full | <num_tests>]")
+    parser = argparse.ArgumentParser(usage="python evaluation.py [--quick | --full | <num_tests>] [options]")
+    parser.add_argument("num_tests", nargs="?", type=int, default=30)
+    parser.add_argument("--quick", action="store_true", help="5 tests, 1 question per article")
+    parser.add_argument("--full", action="store_true", help="50 tests, 3 questions per article")
+    parser.add_argument("--workers", type=int, default=1, help="parallel worker processes")
+    parser.add_argument("--checkpoint", default=None, help="JSONL checkpoint to stream results to / resume from")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args()
+
+    run_opts = {"workers": args.workers, "checkpoint": args.checkpoint, "seed": args.seed}
+
+    if args.quick:
+        quick_test(5, **run_opts)
+    elif args.full:
+        run_evaluation(num_tests=50, questions_per_article=3, **run_opts)
     else:
         # Default: 30 tests
-        run_evaluation(num_tests=30, questions_per_article=2)
+        run_evaluation(num_tests=args.num_tests, questions_per_article=2, **run_opts)
 
     print("\n✅ Evaluation complete!")
@@ -1,11 +1,25 @@
 // API Configuration
 const API_BASE_URL = 'http://localhost:8000/api';
+const WS_BASE_URL = API_BASE_URL.replace(/^http/, 'ws');
+// Messages fetched per history page (the server keeps the full history)
+const HISTORY_PAGE_SIZE = 20;
 
 // State Management
 let currentChatId = null;
-let chats = JSON.parse(localStorage.getItem('chats')) || [];
+// Only chat metadata is kept locally; messages live on the server
+// (entries saved by older versions still carry theirs - drop them)
+let chats = (JSON.parse(localStorage.getItem('chats')) || [])
+    .map(({ id, title, created }) => ({ id, title, created }));
+localStorage.setItem('chats', JSON.stringify(chats));
 let isWaitingForResponse = false;
 
+// One WebSocket for the open chat; `pending` is the answer being streamed
+let socket = null;
+let socketReady = null;
+let pending = null;
+// ID of the oldest rendered message (for "load earlier")
+let oldestMessageId = null;
+
 // DOM Elements
 const messagesContainer = document.getElementById('messages-container');
 const messageInput = document.getElementById('message-input');
@@ -84,7 +98,9 @@ function handleInputKeydown(e) {
 // ============================================
 
 function createNewChat() {
+    closeSocket();
     currentChatId = null;
+    oldestMessageId = null;
     messagesContainer.innerHTML = '';
     welcomeScreen.style.display = 'block';
     chatTitle.textContent = 'Pet Health Assistant';
@@ -101,52 +117,34 @@ function loadChat(chatId) {
     const chat = chats.find(c => c.id === chatId);
     if (!chat) return;
 
+    if (chatId !== currentChatId) {
+        closeSocket();
+    }
     currentChatId = chatId;
+    oldestMessageId = null;
     welcomeScreen.style.display = 'none';
     chatTitle.textContent = chat.title;
 
     // Clear messages
     messagesContainer.innerHTML = '';
 
-    // Render messages
-    chat.messages.forEach(msg => {
-        renderMessage(msg.role, msg.content, msg.sources);
-    });
-
     // Update active state
     document.querySelectorAll('.chat-item').forEach(item => {
         item.classList.toggle('active', item.dataset.chatId === chatId);
     });
 
-    scrollToBottom();
+    // Render the most recent page of the server-side history
+    loadHistory(chatId);
+    openSocket(chatId).catch(() => {});
 }
 
-function saveChat(chatId, userMessage, assistantMessage, sources) {
-    let chat = chats.find(c => c.id === chatId);
-
-    if (!chat) {
-        // Create new chat
-        chat = {
-            id: chatId,
-            title: userMessage.substring(0, 30) + (userMessage.length > 30 ? '...' : ''),
-            created: new Date().toISOString(),
-            messages: []
-        };
-        chats.push(chat);
-    }
-
-    // Add messages
-    chat.messages.push({
-        role: 'user',
-        content: userMessage,
-        timestamp: new Date().toISOString()
-    });
+function saveChat(chatId, userMessage) {
+    if (chats.some(c => c.id === chatId)) return;
 
-    chat.messages.push({
-        role: 'assistant',
-        content: assistantMessage,
-        sources: sources,
-        timestamp: new Date().toISOString()
+    chats.push({
+        id: chatId,
+        title: userMessage.substring(0, 30) + (userMessage.length > 30 ? '...' : ''),
+        created: new Date().toISOString()
     });
 
     // Save to localStorage
@@ -159,6 +157,9 @@ function deleteChat(chatId) {
     chats = chats.filter(c => c.id !== chatId);
     localStorage.setItem('chats', JSON.stringify(chats));
 
+    fetch(`${API_BASE_URL}/history/${encodeURIComponent(chatId)}`, { method: 'DELETE' })
+        .catch(error => console.error('Error:', error));
+
     if (currentChatId === chatId) {
         createNewChat();
     }
@@ -213,7 +214,7 @@ function renderChatList() {
     });
 }
 
-function renderMessage(role, content, sources = null) {
+function renderMessage(role, content, sources = null, before = null) {
     const messageDiv = document.createElement('div');
     messageDiv.className = `message ${role}`;
 
@@ -241,8 +242,44 @@ function renderMessage(role, content, sources = null) {
         </div>
     `;
 
-    messagesContainer.appendChild(messageDiv);
-    scrollToBottom();
+    // History pages are inserted above what is already shown
+    if (before) {
+        messagesContainer.insertBefore(messageDiv, before);
+    } else {
+        messagesContainer.appendChild(messageDiv);
+        scrollToBottom();
+    }
+    return messageDiv;
+}
+
+function renderHistoryPage(page, prepend) {
+    const earlierBtn = document.getElementById('load-earlier-btn');
+    if (earlierBtn) earlierBtn.remove();
+
+    const anchor = prepend ? messagesContainer.firstChild : null;
+    const previousHeight = messagesContainer.scrollHeight;
+    page.messages.forEach(msg => {
+        renderMessage(msg.role, msg.content, msg.sources, anchor);
+    });
+    if (page.messages.length > 0) {
+        oldestMessageId = page.messages[0].id;
+    }
+
+    if (page.has_more) {
+        const btn = document.createElement('button');
+        btn.id = 'load-earlier-btn';
+        btn.className = 'load-earlier-btn';
+        btn.textContent = 'Load earlier messages';
+        btn.addEventListener('click', () => loadHistory(currentChatId, oldestMessageId));
+        messagesContainer.insertBefore(btn, messagesContainer.firstChild);
+    }
+
+    if (prepend) {
+        // Keep the view on the message that was on top
+        messagesContainer.scrollTop += messagesContainer.scrollHeight - previousHeight;
+    } else {
+        scrollToBottom();
+    }
 }
 
 function showLoadingIndicator() {
@@ -276,6 +313,116 @@ function hideLoadingIndicator() {
 // API Communication
 // ============================================
 
+async function loadHistory(chatId, before = null) {
+    const params = new URLSearchParams({ limit: HISTORY_PAGE_SIZE });
+    if (before !== null) params.set('before', before);
+
+    try {
+        const response = await fetch(`${API_BASE_URL}/history/${encodeURIComponent(chatId)}?${params}`);
+        if (response.status === 404) {
+            // Server-side history is in memory and does not survive a restart
+            if (chatId === currentChatId && before === null) {
+                renderMessage('assistant', 'ℹ️ Earlier messages of this chat are no longer available.');
+            }
+            return;
+        }
+        if (!response.ok) {
+            throw new Error(`API error: ${response.status}`);
+        }
+        const page = await response.json();
+        if (chatId === currentChatId) {
+            renderHistoryPage(page, before !== null);
+        }
+    } catch (error) {
+        console.error('Error:', error);
+    }
+}
+
+function openSocket(chatId) {
+    if (socket && socket.chatId === chatId && socket.readyState <= WebSocket.OPEN) {
+        return socketReady;
+    }
+    closeSocket();
+
+    const ws = new WebSocket(`${WS_BASE_URL}/ws/${encodeURIComponent(chatId)}`);
+    ws.chatId = chatId;
+    socket = ws;
+    socketReady = new Promise((resolve, reject) => {
+        ws.addEventListener('open', () => resolve(ws), { once: true });
+        ws.addEventListener('error', () => reject(new Error('WebSocket unavailable')), { once: true });
+    });
+    ws.addEventListener('message', handleSocketFrame);
+    ws.addEventListener('close', () => {
+        if (socket === ws) socket = null;
+        failPending(new Error('Connection closed'));
+    });
+    return socketReady;
+}
+
+function closeSocket() {
+    if (socket) {
+        const ws = socket;
+        socket = null;
+        ws.close();
+    }
+    failPending(new Error('Chat closed'));
+}
+
+function failPending(error) {
+    if (pending) {
+        pending.reject(error);
+        pending = null;
+    }
+}
+
+function handleSocketFrame(event) {
+    if (event.target !== socket) return;
+    const frame = JSON.parse(event.data);
+
+    if (frame.type === 'token') {
+        if (pending) pending.onToken(frame.text);
+    } else if (frame.type === 'done') {
+        if (pending) pending.resolve(frame);
+        pending = null;
+    } else if (frame.type === 'error') {
+        failPending(new Error(frame.detail));
+    }
+}
+
+async function sendOverSocket(chatId, message, onToken) {
+    let ws;
+    try {
+        ws = await openSocket(chatId);
+    } catch (error) {
+        // No WebSocket (proxy, old server): one POST per message instead
+        return sendOverHttp(chatId, message);
+    }
+
+    return new Promise((resolve, reject) => {
+        pending = { resolve, reject, onToken };
+        ws.send(JSON.stringify({ type: 'message', message: message }));
+    });
+}
+
+async function sendOverHttp(chatId, message) {
+    const response = await fetch(`${API_BASE_URL}/chat`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            message: message,
+            chat_id: chatId
+        })
+    });
+
+    if (!response.ok) {
+        throw new Error(`API error: ${response.status}`);
+    }
+
+    return response.json();
+}
+
 async function handleSendMessage() {
     const message = messageInput.value.trim();
     if (!message || isWaitingForResponse) return;
@@ -300,39 +447,41 @@ async function handleSendMessage() {
     // Show loading
     showLoadingIndicator();
 
-    try {
-        const response = await fetch(`${API_BASE_URL}/chat`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                message: message,
-                chat_id: currentChatId
-            })
-        });
-
-        if (!response.ok) {
-            throw new Error(`API error: ${response.status}`);
+    // New chats get their ID here so the socket can bind to it
+    if (!currentChatId) {
+        currentChatId = newChatId();
+        saveChat(currentChatId, message);
+    }
+    const chatId = currentChatId;
+
+    // Streamed tokens fill a draft bubble that the final answer replaces
+    let draft = null;
+    const onToken = text => {
+        if (!draft) {
+            hideLoadingIndicator();
+            draft = renderMessage('assistant', '');
         }
+        draft.querySelector('.message-text').textContent += text;
+        scrollToBottom();
+    };
 
-        const data = await response.json();
+    try {
+        const data = await sendOverSocket(chatId, message, onToken);
 
         // Hide loading
         hideLoadingIndicator();
+        if (draft) draft.remove();
 
-        // Update chat ID
-        currentChatId = data.chat_id;
-
-        // Render assistant message
-        renderMessage('assistant', data.message, data.sources);
-
-        // Save chat
-        saveChat(currentChatId, message, data.message, data.sources);
+        // Render assistant message (unless another chat was opened meanwhile)
+        if (chatId === currentChatId) {
+            renderMessage('assistant', data.message, data.sources);
+        }
 
     } catch (error) {
         console.error('Error:', error);
         hideLoadingIndicator();
+        if (draft) draft.remove();
+        if (chatId !== currentChatId) return;
 
         renderMessage('assistant',
             '❌ Sorry, I encountered an error. Please make sure the backend server is running and try again.'
@@ -354,6 +503,11 @@ function scrollToBottom() {
     }, 100);
 }
 
+function newChatId() {
+    const bytes = crypto.getRandomValues(new Uint8Array(6));
+    return 'chat_' + Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+}
+
 function escapeHtml(text) {
     const div = document.createElement('div');
     div.textContent = text;
@@ -0,0 +1,120 @@
+# rag/answer_store.py
+#
+# Compact key-value store of precomputed answers (SQLite, one file).
+# Keys are (index version, normalized question), so a hot-reloaded index
+# never serves answers that were generated against another snapshot.
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from rag.config import ANSWER_STORE_PATH, TRAFFIC_LOG_PATH
+from rag.corpus import append_jsonl
+from rag.tracing import inc, describe, span
+
+describe("rag_answer_store_lookups_total", "Precomputed answer lookups by result (hit/miss)")
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Case, whitespace and punctuation-insensitive form of a question"""
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub(" ", question.lower())).strip()
+
+
+def compact_sources(chunks: List[Dict], n: int = 3) -> List[Dict]:
+    """The part of retrieved chunks the API returns as sources"""
+    return [{
+        "text": c.get("text", "")[:200],
+        "score": c.get("score", 0.0),
+        "metadata": {k: c.get("metadata", {}).get(k) for k in ("title", "url")}
+    } for c in chunks[:n]]
+
+
+class AnswerStore:
+    """SQLite-backed (version, normalized question) -> answer + sources"""
+
+    def __init__(self, path: str = ANSWER_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                version  TEXT NOT NULL,
+                question TEXT NOT NULL,
+                answer   TEXT NOT NULL,
+                sources  TEXT NOT NULL,
+                created  REAL NOT NULL,
+                PRIMARY KEY (version, question)
+            ) WITHOUT ROWID
+        """)
+        self._db.commit()
+
+    def get(self, question: str, version: str) -> Optional[Tuple[str, List[Dict]]]:
+        with self._lock:
+            row = self._db.execute("SELECT answer, sources FROM answers WHERE version = ? AND question = ?",
+                                   (version, normalize_question(question))).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def put_many(self, version: str, items: Iterable[Tuple[str, str, List[Dict]]]):
+        """Store (question, answer, chunks) triples for `version`"""
+        rows = [(version, normalize_question(q), a, json.dumps(compact_sources(c), ensure_ascii=False), time.time())
+                for q, a, c in items]
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.commit()
+
+    def questions(self, version: str) -> set:
+        with self._lock:
+            return {r[0] for r in self._db.execute("SELECT question FROM answers WHERE version = ?", (version,))}
+
+    def stats(self) -> Dict[str, int]:
+        """Stored answers per index version"""
+        with self._lock:
+            return dict(self._db.execute("SELECT version, COUNT(*) FROM answers GROUP BY version").fetchall())
+
+    def drop_versions(self, keep: str) -> int:
+        """Delete answers of every index version except `keep`"""
+        with self._lock:
+            n = self._db.execute("DELETE FROM answers WHERE version != ?", (keep,)).rowcount
+            self._db.commit()
+            self._db.execute("VACUUM")
+        return n
+
+    def size_bytes(self) -> int:
+        return sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def open_store(path: str = ANSWER_STORE_PATH) -> Optional[AnswerStore]:
+    """The answer store if it has been built, else None"""
+    return AnswerStore(path) if os.path.exists(path) else None
+
+# ============================================
+# Serving
+# ============================================
+
+_traffic_lock = threading.Lock()
+
+
+def lookup(store: Optional[AnswerStore], question: str, version: str) -> Optional[Tuple[str, List[Dict]]]:
+    """Store lookup with hit/miss metrics and the optional traffic log"""
+    with span("answer_store"):
+        hit = store.get(question, version) if store is not None else None
+    inc("rag_answer_store_lookups_total", result="hit" if hit else "miss")
+    if TRAFFIC_LOG_PATH:
+        with _traffic_lock, open(TRAFFIC_LOG_PATH, "a", encoding="utf-8") as f:
+            append_jsonl(f, {"q": normalize_question(question), "version": version,
+                             "hit": hit is not None, "ts": round(time.time(), 3)})
+    return hit
@@ -1,62 +1,266 @@
+import argparse
 import json
-import pickle
+import os
+import time
+from typing import Dict, Iterable, Iterator, List, Tuple
+
 import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-
-with open("./Data/articles_data.json", "r", encoding="utf-8") as f:
-    articles = json.load(f)
 
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
-documents = []
+from rag.config import (EMBEDDER_NAME, ARTICLES_PATH, INDEX_PATH, DOCS_PATH, DEDUP_ENABLED, DEDUP_THRESHOLD,
+                        SNAPSHOTS_DIR, SHARDS_DIR, COMPACT_DIM, COMPACT_QUANT)
+from rag.corpus import existing_path, iter_articles, iter_jsonl, prefetch
+from rag.dedup import NearDuplicateIndex, merge_metadata
+from rag.hierarchy import ArticleIndexWriter, article_vector
+from rag.extractive import SentenceStoreWriter, split_sentences
+from rag.compressed import VectorStoreWriter, build_compact, factory_string, index_bytes
+from rag import snapshots
 
 SIM_THRESHOLD = 0.75
 MIN_CHARS = 200
+MIN_PARAGRAPH_CHARS = 50
+
+# Paragraphs embedded per encoder call (across article boundaries)
+EMBED_BATCH = 256
+
+# ============================================
+# Pipeline Stages
+# ============================================
+#
+# parse (background thread) -> clean/split -> embed paragraphs in fixed-size
+# batches -> semantic merge -> append vectors to the index + docs to JSONL.
+# Only one batch of articles is held in memory at a time.
+
+def split_paragraphs(articles: Iterable[Tuple[str, Dict]]) -> Iterator[Tuple[str, Dict, List[str]]]:
+    """Clean each article and split it into candidate paragraphs"""
+    for title, data in articles:
+        paragraphs = [p.strip() for p in data["text"].split("\n\n") if len(p.strip()) > MIN_PARAGRAPH_CHARS]
+        if paragraphs:
+            yield title, data, paragraphs
 
-for title, data in articles.items():
-    paragraphs = [p.strip() for p in data["text"].split("\n\n") if len(p.strip()) > 50]
-    if not paragraphs:
-        continue
 
-    embeddings = embedder.encode(paragraphs)
+def batch_articles(items: Iterable[Tuple[str, Dict, List[str]]], batch_size: int) -> Iterator[List]:
+    """Group articles until they hold at least `batch_size` paragraphs"""
+    batch, n = [], 0
+    for item in items:
+        batch.append(item)
+        n += len(item[2])
+        if n >= batch_size:
+            yield batch
+            batch, n = [], 0
+    if batch:
+        yield batch
+
+
+def merge_chunks(embedder: SentenceTransformer, paragraphs: List[str],
+                 embeddings: np.ndarray) -> List[Tuple[str, np.ndarray]]:
+    """Merge consecutive similar paragraphs; returns (chunk, chunk embedding)"""
     current_chunk = paragraphs[0]
-    current_emb = embeddings[0].reshape(1, -1)
-    merged_chunks = []
+    current_emb = embeddings[0]
+    merged = []
 
     for i in range(1, len(paragraphs)):
-        sim = cosine_similarity(current_emb, embeddings[i].reshape(1, -1))[0][0]
+        sim = float(np.dot(current_emb, embeddings[i]) /
+                    (np.linalg.norm(current_emb) * np.linalg.norm(embeddings[i]) + 1e-12))
         if sim >= SIM_THRESHOLD:
             current_chunk += " " + paragraphs[i]
-            current_emb = embedder.encode([current_chunk])
+            current_emb = embedder.encode([current_chunk])[0]
         else:
             if len(current_chunk) >= MIN_CHARS:
-                merged_chunks.append(current_chunk)
+                merged.append((current_chunk, current_emb))
             current_chunk = paragraphs[i]
-            current_emb = embeddings[i].reshape(1, -1)
+            current_emb = embeddings[i]
 
     if len(current_chunk) >= MIN_CHARS:
-        merged_chunks.append(current_chunk)
-
-    for chunk in merged_chunks:
-        documents.append({
-            "text": chunk,
-            "metadata": {
-                "title": title,
-                "url": data["url"],
-                "animals": data["animals"],
-                "categories": data["categories"]
-            }
-        })
-
-texts = [d["text"] for d in documents]
-embeddings = embedder.encode(texts)
-
-index = faiss.IndexFlatL2(embeddings.shape[1])
-index.add(np.array(embeddings))
-
-faiss.write_index(index, "./Data/petmd.index")
-with open("./Data/documents_semantic.pkl", "wb") as f:
-    pickle.dump(documents, f)
-
-print("FAISS index built.")
+        merged.append((current_chunk, current_emb))
+
+    # The last embedding of each chunk is the embedding of its final text,
+    # so chunks never need a second encoding pass.
+    return merged
+
+
+def iter_chunk_batches(embedder: SentenceTransformer, articles: Iterable[Tuple[str, Dict]],
+                       batch_size: int = EMBED_BATCH) -> Iterator[Tuple[List[Dict], np.ndarray]]:
+    """Yield (documents, embeddings) per paragraph batch"""
+    for batch in batch_articles(split_paragraphs(articles), batch_size):
+        flat = [p for _, _, paragraphs in batch for p in paragraphs]
+        embeddings = embedder.encode(flat, batch_size=64, convert_to_numpy=True)
+
+        documents, vectors, offset = [], [], 0
+        for title, data, paragraphs in batch:
+            for chunk, emb in merge_chunks(embedder, paragraphs, embeddings[offset:offset + len(paragraphs)]):
+                documents.append({
+                    "text": chunk,
+                    "metadata": {
+                        "title": title,
+                        "url": data["url"],
+                        "animals": data["animals"],
+                        "categories": data["categories"]
+                    }
+                })
+                vectors.append(emb)
+            offset += len(paragraphs)
+
+        if documents:
+            yield documents, np.vstack(vectors).astype("float32")
+
+# ============================================
+# Near-Duplicate Elimination
+# ============================================
+
+def dedup_batch(dedup: NearDuplicateIndex, documents: List[Dict], vectors: np.ndarray,
+                patches: Dict[int, Dict]) -> Tuple[List[Dict], np.ndarray]:
+    """
+    Drop near-duplicates of already kept chunks. Their animals/categories are
+    collected in `patches` (kept id -> extra metadata) and folded into the kept
+    chunk once the document store is complete.
+    """
+    keep = []
+    for i, doc in enumerate(documents):
+        kept_id = dedup.add(doc["text"])
+        if kept_id is None:
+            keep.append(i)
+        else:
+            merge_metadata(patches.setdefault(kept_id, {}), doc["metadata"])
+    return [documents[i] for i in keep], vectors[keep]
+
+
+def apply_patches(docs_path: str, patches: Dict[int, Dict]):
+    """Rewrite the document store, merging duplicate metadata into kept chunks"""
+    tmp = docs_path + ".patch"
+    with open(tmp, "w", encoding="utf-8") as out:
+        for doc_id, doc in enumerate(iter_jsonl(docs_path)):
+            patch = patches.get(doc_id)
+            if patch:
+                duplicates = patch.pop("duplicates", 0)
+                merge_metadata(doc["metadata"], patch)
+                doc["metadata"]["duplicates"] = duplicates
+            out.write(json.dumps(doc, ensure_ascii=False) + "\n")
+    os.replace(tmp, docs_path)
+
+# ============================================
+# Article-Level Index
+# ============================================
+
+def add_articles(writer: ArticleIndexWriter, embedder: SentenceTransformer,
+                 documents: List[Dict], vectors: np.ndarray, first_id: int):
+    """Register the articles of one (deduplicated) batch; their chunks are contiguous"""
+    groups = []                                  # (title, url, start offset, end offset)
+    for i, doc in enumerate(documents):
+        meta = doc["metadata"]
+        # By URL: distinct articles may share a title
+        if groups and groups[-1][1] == meta["url"]:
+            groups[-1][3] = i + 1
+        else:
+            groups.append([meta["title"], meta["url"], i, i + 1])
+
+    title_embs = embedder.encode([g[0] for g in groups], batch_size=64, convert_to_numpy=True)
+    writer.add(
+        [g[0] for g in groups], [g[1] for g in groups],
+        [(first_id + g[2], first_id + g[3]) for g in groups],
+        np.vstack([article_vector(t, vectors[g[2]:g[3]]) for t, g in zip(title_embs, groups)])
+    )
+
+# ============================================
+# Sentence Vectors (extractive answers)
+# ============================================
+
+def add_sentences(writer: SentenceStoreWriter, embedder: SentenceTransformer, documents: List[Dict]):
+    """Encode the sentences of one batch of chunks (one encoder call)"""
+    split = [split_sentences(doc["text"]) for doc in documents]
+    flat = [s for parts in split for s in parts]
+    vectors = (embedder.encode(flat, batch_size=64, convert_to_numpy=True) if flat
+               else np.zeros((0, embedder.get_sentence_embedding_dimension()), dtype="float32"))
+    writer.add([len(parts) for parts in split], vectors)
+
+# ============================================
+# Build
+# ============================================
+
+def build_index(articles_path: str = ARTICLES_PATH, index_path: str = INDEX_PATH,
+                docs_path: str = DOCS_PATH, batch_size: int = EMBED_BATCH,
+                dedup: bool = DEDUP_ENABLED) -> int:
+    """Stream the corpus into a FAISS index + JSONL document store; returns chunk count"""
+    # Fail before loading the embedder, not with an empty index
+    articles_path = existing_path(articles_path, ".json")
+    embedder = SentenceTransformer(EMBEDDER_NAME)
+    index = faiss.IndexFlatL2(embedder.get_sentence_embedding_dimension())
+    articles = ArticleIndexWriter(index_path, index.d)
+    sentences = SentenceStoreWriter(index_path)
+    full_vectors = VectorStoreWriter(index_path, index.d)
+    near_dups = NearDuplicateIndex(threshold=DEDUP_THRESHOLD) if dedup else None
+    patches: Dict[int, Dict] = {}
+    total = 0
+
+    start = time.time()
+    tmp_docs = docs_path + ".tmp"
+    with open(tmp_docs, "w", encoding="utf-8") as out:
+        # Articles are read/parsed on a background thread while batches embed
+        for documents, vectors in iter_chunk_batches(embedder, prefetch(iter_articles(articles_path)), batch_size):
+            total += len(documents)
+            if near_dups is not None:
+                documents, vectors = dedup_batch(near_dups, documents, vectors, patches)
+            if documents:
+                add_articles(articles, embedder, documents, vectors, index.ntotal)
+                add_sentences(sentences, embedder, documents)
+                index.add(vectors)
+                full_vectors.add(vectors)
+                out.writelines(json.dumps(doc, ensure_ascii=False) + "\n" for doc in documents)
+            print(f"   {index.ntotal} chunks ({time.time() - start:.1f}s)")
+
+    if patches:
+        apply_patches(tmp_docs, patches)
+
+    if near_dups is not None and total:
+        removed = total - index.ntotal
+        print(f"🧹 Dedup: {total} -> {index.ntotal} chunks "
+              f"({removed} near-duplicates removed, index {removed / total:.1%} smaller)")
+
+    print(f"📚 Article index: {articles.close()} articles")
+    print(f"✂️  Sentence vectors: {sentences.close()} sentences")
+    full_vectors.close()
+    compact = build_compact(index_path, COMPACT_DIM, COMPACT_QUANT)
+    if compact is not None:
+        print(f"🗜️  Compact index: {factory_string(index.d, COMPACT_DIM, COMPACT_QUANT)}, "
+              f"{index_bytes(compact) / 1e6:.1f} MB vs {index_bytes(index) / 1e6:.1f} MB flat")
+    faiss.write_index(index, index_path)
+    os.replace(tmp_docs, docs_path)
+    return index.ntotal
+
+
+def build_snapshot(articles_path: str = ARTICLES_PATH, root: str = SNAPSHOTS_DIR,
+                   publish: bool = True, **kwargs) -> dict:
+    """Build into a new versioned snapshot and (optionally) make it CURRENT"""
+    version = snapshots.new_version(root)
+    staging = snapshots.staging_dir(version, root)
+    n = build_index(articles_path, os.path.join(staging, snapshots.INDEX_FILE),
+                    os.path.join(staging, snapshots.DOCS_FILE), **kwargs)
+    manifest = snapshots.commit_snapshot(staging, version, root, chunks=n, source=articles_path)
+    if publish:
+        snapshots.publish(version, root)
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the FAISS index + document store")
+    parser.add_argument("--snapshot", action="store_true",
+                        help=f"build a versioned snapshot under {SNAPSHOTS_DIR} and publish it")
+    parser.add_argument("--no-publish", action="store_true", help="with --snapshot: don't switch CURRENT")
+    parser.add_argument("--shards", type=int, default=0,
+                        help=f"also partition the new index into N shards under {SHARDS_DIR}")
+    args = parser.parse_args()
+
+    if args.snapshot:
+        manifest = build_snapshot(publish=not args.no_publish)
+        version = manifest["version"]
+        print(f"FAISS index built. ({manifest['chunks']} chunks, snapshot {version})")
+    else:
+        n = build_index()
+        version = snapshots.LEGACY_VERSION
+        print(f"FAISS index built. ({n} chunks)")
+
+    if args.shards:
+        from rag.shards import partition
+        layout = partition(args.shards, version=version)
+        print(f"🧩 {layout['shards']} shards in {SHARDS_DIR}, chunks per shard: {layout['chunks']}")
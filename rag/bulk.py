@@ -0,0 +1,143 @@
+# rag/bulk.py
+#
+# Offline bulk answering (content audits): questions in, answers + sources out.
+#
+#   python -m rag.bulk questions.jsonl answers.jsonl [--batch 16] [--window 256]
+#   python -m rag.bulk questions.jsonl answers.jsonl --baseline 16   # + per-question loop speed
+#
+# Input lines are {"question": "...", ...} (other fields such as "id" are
+# copied through) or bare JSON strings. Every output line adds "offset" (the
+# input record number), "answer", "sources" and "tier".
+#
+# Questions are read in windows. Inside a window, model-bound prompts are
+# sorted into token-length buckets and generated in batches; the window is
+# then written in input order, so the output is always a prefix of the input
+# and a re-run resumes right after it (or at --offset).
+
+import argparse
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from rag.answer_store import compact_sources
+from rag.corpus import append_jsonl, drop_torn_line, iter_jsonl, last_jsonl
+from rag.warmup import needs_model
+
+
+def iter_questions(path: str, offset: int = 0) -> Iterator[Tuple[int, Dict]]:
+    """(offset, record with a "question") from `offset` on"""
+    for i, record in enumerate(iter_jsonl(path)):
+        if i < offset:
+            continue
+        yield i, (record if isinstance(record, dict) else {"question": str(record)})
+
+
+def resume_offset(out_path: str) -> int:
+    """First input offset not yet in `out_path` (drops a torn last line)"""
+    drop_torn_line(out_path)
+    # The output is written in input order: its last record is the furthest one
+    last = last_jsonl(out_path)
+    return last["offset"] + 1 if last else 0
+
+
+def answer_window(items: List[Tuple[int, Dict]], k: int, batch_size: int, bucket: bool,
+                  stats: Dict) -> List[Dict]:
+    """Answer one window; guard-answered questions skip the batch"""
+    from rag.chatbot import answer_question, answer_batch
+
+    questions = [record.get("question", "").strip() for _, record in items]
+    model_rows = [i for i, q in enumerate(questions) if needs_model(q)]
+    batched = dict(zip(model_rows, answer_batch([questions[i] for i in model_rows], k=k,
+                                                batch_size=batch_size, bucket=bucket, stats=stats)))
+
+    out = []
+    for i, (offset, record) in enumerate(items):
+        if i in batched:
+            (answer, chunks), tier = batched[i], "full"
+        else:
+            (answer, chunks), tier = answer_question(questions[i], k=k), "instant"
+        out.append({**record, "offset": offset, "answer": answer,
+                    "sources": compact_sources(chunks), "tier": tier})
+    return out
+
+
+def padding_report(stats: Dict) -> Dict:
+    """Share of prompt / decode batch slots spent on padding"""
+    prompt = stats.get("prompt_tokens", 0) + stats.get("prompt_padding", 0)
+    decode = stats.get("generated_tokens", 0) + stats.get("decode_padding", 0)
+    return {
+        "prompt_padding_share": round(stats.get("prompt_padding", 0) / prompt, 4) if prompt else None,
+        "decode_padding_share": round(stats.get("decode_padding", 0) / decode, 4) if decode else None,
+        **stats,
+    }
+
+
+def run(in_path: str, out_path: str, k: int = 5, batch_size: int = 16, window: int = 256,
+        offset: Optional[int] = None, limit: Optional[int] = None, bucket: bool = True) -> Dict:
+    """Stream `in_path` through the batched pipeline into `out_path`"""
+    import rag.chatbot  # noqa: F401 -- load the models before the clock starts
+
+    start_offset = resume_offset(out_path) if offset is None else offset
+    print(f"📥 {in_path} -> {out_path} (from offset {start_offset})")
+
+    stats: Dict = {}
+    done, start = 0, time.time()
+    items = iter_questions(in_path, start_offset)
+    with open(out_path, "a", encoding="utf-8") as out:
+        while limit is None or done < limit:
+            block = []
+            for item in items:
+                block.append(item)
+                if len(block) == window or (limit is not None and done + len(block) == limit):
+                    break
+            if not block:
+                break
+            for record in answer_window(block, k, batch_size, bucket, stats):
+                append_jsonl(out, record)
+            done += len(block)
+            rate = done / max(time.time() - start, 1e-9)
+            print(f"   {done} answered, next offset {block[-1][0] + 1} ({rate:.2f} items/s)")
+
+    seconds = time.time() - start
+    return {"items": done, "seconds": round(seconds, 2),
+            "items_per_s": round(done / seconds, 3) if seconds else None, **padding_report(stats)}
+
+
+def baseline(in_path: str, n: int, k: int = 5) -> float:
+    """Items/s of the per-question loop (rag/eval.py style) on the first n questions"""
+    from rag.chatbot import answer_question
+
+    questions = [record.get("question", "") for _, record in iter_questions(in_path)][:n]
+    start = time.time()
+    for q in questions:
+        answer_question(q, k=k)
+    return len(questions) / max(time.time() - start, 1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions in length-bucketed batches")
+    parser.add_argument("input")
+    parser.add_argument("output")
+    parser.add_argument("--k", type=int, default=5, help="retrieval top-k")
+    parser.add_argument("--batch", type=int, default=16, help="generation batch size")
+    parser.add_argument("--window", type=int, default=256, help="questions sorted into buckets together")
+    parser.add_argument("--offset", type=int, default=None, help="start here instead of resuming")
+    parser.add_argument("--limit", type=int, default=None, help="max questions this run")
+    parser.add_argument("--no-bucket", action="store_true", help="batch in input order (for comparison)")
+    parser.add_argument("--baseline", type=int, default=0, help="also time the per-question loop on N questions")
+    args = parser.parse_args()
+
+    r = run(args.input, args.output, k=args.k, batch_size=args.batch, window=args.window,
+            offset=args.offset, limit=args.limit, bucket=not args.no_bucket)
+    print(f"\n✅ {r['items']} answered in {r['seconds']}s ({r['items_per_s']} items/s)")
+    if r["prompt_padding_share"] is not None:
+        print(f"🧮 Padding: {r['prompt_padding_share']:.1%} of prompt slots, "
+              f"{r['decode_padding_share']:.1%} of decode slots")
+
+    if args.baseline:
+        rate = baseline(args.input, args.baseline, k=args.k)
+        print(f"🐢 Per-question loop: {rate:.3f} items/s "
+              f"({r['items_per_s'] / rate:.1f}x with bulk)" if r["items_per_s"] else "")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,89 +1,162 @@
 import torch
+from typing import Callable, Dict, List, Optional, Tuple
 from transformers import AutoTokenizer, AutoModelForCausalLM
-from rag.retriever import retrieve_chunks
-from rag.guards import is_emergency, is_greeting, is_farewell, is_invalid_query, is_english
-
-LLM_NAME = "Qwen/Qwen2.5-3B-Instruct" # "Qwen/Qwen2.5-1.5B-Instruct"
-
-print(f"🔄 Loading {LLM_NAME}...")
-
-tokenizer = AutoTokenizer.from_pretrained(LLM_NAME)
+import numpy as np
+from rag.retriever import retrieve_chunks, retrieve_batch, get_embedding, get_sentence_vectors, embedder
+from rag.guards import classify
+from rag.config import LLM_NAME, SMALL_LLM_NAME, SMALL_LLM_ENABLED
+from rag.tracing import span
+from rag.generation import generate_answer, generate_batch, build_prompt, prompt_lengths
+from rag.extractive import extractive_answer
 
 # Check for GPU
 device = "cuda" if torch.cuda.is_available() else "cpu"
 print(f"   Device: {device}")
 
-# Load model
-if device == "cuda":
-    model = AutoModelForCausalLM.from_pretrained(
-        LLM_NAME, dtype=torch.float16, device_map="auto", trust_remote_code=True
-    )
-else:
-    # CPU - use smaller precision
-    model = AutoModelForCausalLM.from_pretrained(
-        LLM_NAME, dtype=torch.float32, trust_remote_code=True, low_cpu_mem_usage=True
-    ).to(device)
 
-model.eval()
-print("✅ Model loaded!")
+def load_model(name: str):
+    """(tokenizer, model) in eval mode on `device`"""
+    print(f"🔄 Loading {name}...")
+    tok = AutoTokenizer.from_pretrained(name)
+    if device == "cuda":
+        llm = AutoModelForCausalLM.from_pretrained(
+            name, dtype=torch.float16, device_map="auto", trust_remote_code=True
+        )
+    else:
+        # CPU - use smaller precision
+        llm = AutoModelForCausalLM.from_pretrained(
+            name, dtype=torch.float32, trust_remote_code=True, low_cpu_mem_usage=True
+        ).to(device)
+    llm.eval()
+    print("✅ Model loaded!")
+    return tok, llm
 
-def rag_chatbot(question: str, k: int = 5) -> str:
-    """Main RAG chatbot function"""
 
-    question = question.strip()
+tokenizer, model = load_model(LLM_NAME)
 
-    # Guard checks
-    if not is_english(question):
-        return "🌐 Sorry, I only support English at the moment. Please ask your question in English!"
+# Degradation tiers, fastest last: the main model, the small model
+# (RAG_SMALL_LLM=true), and extractive sentences from the retrieved chunks
+TIER_FULL = "full"
+TIER_SMALL = "small"
+TIER_EXTRACTIVE = "extractive"
 
-    if is_greeting(question):
-        return "👋 Hello! I'm your Pet Health Assistant. How can I help you with your furry friend today?"
+small_tokenizer, small_model = load_model(SMALL_LLM_NAME) if SMALL_LLM_ENABLED else (None, None)
 
-    if is_farewell(question):
-        return "😊 You're welcome! Feel free to ask if you have more questions. Take care! 🐾"
+EMERGENCY_PREFIX = "🚨 **EMERGENCY:** Please contact a veterinarian immediately!\n\n"
+FALLBACK_ANSWER = "I don't have specific information about that. Please consult a veterinarian."
 
-    if is_invalid_query(question):
-        return "🤔 Could you please ask a more specific question about your pet's health?"
+def rag_chatbot(question: str, k: int = 5) -> str:
+    """Main RAG chatbot function"""
+    answer, _ = answer_question(question, k=k)
+    return answer
 
-    # Retrieve context
-    chunks = retrieve_chunks(question, k=k)
 
-    if not chunks:
-        return "😕 I couldn't find relevant information. Please try a different question."
+def answer_question(question: str, k: int = 5,
+                    on_token: Optional[Callable[[str], None]] = None,
+                    tier: str = TIER_FULL) -> Tuple[str, List[Dict]]:
+    """
+    RAG pipeline returning the answer and the chunks it retrieved.
+    `on_token` receives the answer text incrementally (canned replies in one piece).
+    `tier` picks the answer generator (TIER_SMALL falls back to extractive if not loaded).
+    """
 
-    context = "\n\n".join(c["text"][:500] for c in chunks[:3])  # Limit context size
+    question = question.strip()
+    emit = on_token or (lambda text: None)
 
-    # Emergency check
-    prefix = ""
-    if is_emergency(question):
-        prefix = "🚨 **EMERGENCY:** Please contact a veterinarian immediately!\n\n"
+    def reply(text: str) -> Tuple[str, List[Dict]]:
+        emit(text)
+        return text, []
 
-    # Build prompt (shorter for speed)
-    prompt = f"""Answer the question using ONLY the context. Be brief and helpful.
+    # Guard checks (all intents in one pass)
+    with span("guard"):
+        flags = classify(question)
 
-Context:
-{context}
+    if not flags["english"]:
+        return reply("🌐 Sorry, I only support English at the moment. Please ask your question in English!")
 
-Question: {question}
+    if flags["greeting"]:
+        return reply("👋 Hello! I'm your Pet Health Assistant. How can I help you with your furry friend today?")
 
-Answer:"""
+    if flags["farewell"]:
+        return reply("😊 You're welcome! Feel free to ask if you have more questions. Take care! 🐾")
 
-    # Generate
-    inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=1024).to(device)
+    if flags["invalid"]:
+        return reply("🤔 Could you please ask a more specific question about your pet's health?")
 
-    with torch.no_grad():
-        outputs = model.generate(
-            **inputs,
-            max_new_tokens=100,  # Shorter for speed
-            do_sample=False,     # Greedy = faster
-            pad_token_id=tokenizer.eos_token_id
-        )
+    # Retrieve context
+    chunks = retrieve_chunks(question, k=k)
 
-    response = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    answer = response.split("Answer:")[-1].strip()
+    if not chunks:
+        return reply("😕 I couldn't find relevant information. Please try a different question.")
+
+    # Emergency check
+    prefix = ""
+    if flags["emergency"]:
+        prefix = EMERGENCY_PREFIX
+        emit(prefix)
+
+    if tier == TIER_EXTRACTIVE or (tier == TIER_SMALL and small_model is None):
+        with span("extractive"):
+            answer, chunks = answer_extractive(question, chunks)
+        if answer:
+            emit(answer)
+    elif tier == TIER_SMALL:
+        answer, _ = generate_answer(small_model, small_tokenizer, question, chunks, flags,
+                                    device=device, on_token=on_token)
+    else:
+        answer, _ = generate_answer(model, tokenizer, question, chunks, flags, device=device, on_token=on_token)
 
     # Clean up
     if not answer or len(answer) < 10:
-        answer = "I don't have specific information about that. Please consult a veterinarian."
-
-    return prefix + answer
+        answer = FALLBACK_ANSWER
+        emit(answer)
+
+    return prefix + answer, chunks
+
+
+def answer_extractive(question: str, chunks: List[Dict]) -> Tuple[Optional[str], List[Dict]]:
+    """Cited sentences from `chunks`, no LLM (stored sentence vectors, else encoded)"""
+    query_emb = np.asarray(get_embedding(question), dtype="float32")
+    return extractive_answer(query_emb, chunks, get_sentence_vectors(chunks),
+                             lambda texts: embedder.encode(texts))
+
+
+def answer_batch(questions: List[str], k: int = 5, batch_size: int = 8, bucket: bool = True,
+                 stats: Optional[Dict] = None) -> List[Tuple[str, List[Dict]]]:
+    """
+    answer_question for many model-bound questions (no guard short-circuits):
+    batched retrieval and batched generation. With `bucket`, prompts are
+    sorted by token length first so each batch pads as little as possible.
+    `stats` accumulates token/padding counts (see generate_batch). Results
+    are in input order.
+    """
+    questions = [q.strip() for q in questions]
+    flags = [classify(q) for q in questions]
+    chunks = retrieve_batch(questions, k=k)
+
+    todo = [i for i, c in enumerate(chunks) if c]
+    with span("context"):
+        prompts = {i: build_prompt(tokenizer, questions[i], chunks[i]) for i in todo}
+    if bucket:
+        lengths = dict(zip(todo, prompt_lengths(tokenizer, [prompts[i] for i in todo])))
+        todo.sort(key=lengths.get)
+
+    generated = {}
+    for start in range(0, len(todo), batch_size):
+        rows = todo[start:start + batch_size]
+        generated.update(zip(rows, generate_batch(
+            model, tokenizer, [questions[i] for i in rows], [chunks[i] for i in rows],
+            [flags[i] for i in rows], device=device, prompts=[prompts[i] for i in rows], stats=stats
+        )))
+
+    results = []
+    for i in range(len(questions)):
+        if i not in generated:
+            results.append(("😕 I couldn't find relevant information. Please try a different question.", []))
+            continue
+        answer, _ = generated[i]
+        if not answer or len(answer) < 10:
+            answer = FALLBACK_ANSWER
+        prefix = EMERGENCY_PREFIX if flags[i]["emergency"] else ""
+        results.append((prefix + answer, chunks[i]))
+    return results
@@ -0,0 +1,176 @@
+# rag/compressed.py
+#
+# Compact vector storage: the first pass searches a PCA-reduced,
+# scalar-quantized FAISS index, then its top candidates are rescored with
+# exact L2 against the full float32 vectors memory-mapped from disk.
+#
+# build_index writes, next to the chunk index (petmd.index):
+#   petmd.vectors.npy     - (n, dim) float32 chunk vectors (np.load mmap_mode="r")
+#   petmd.compact.index   - FAISS PCA(dim -> d) + SQ int8 / fp16 codes
+#
+# With RAG_VECTOR_MODE=compact a worker keeps only the codes resident (d bytes
+# per vector for int8, 2d for fp16, vs 4 * dim for the flat index). The float32
+# rows are read through the page cache, which all processes on a host share,
+# and only for the candidates being rescored.
+#
+#   python -m rag.compressed build [--index Data/petmd.index] [--dim 128] [--quant int8]
+#
+# MiniLM is not trained for Matryoshka truncation, so the reduction is PCA.
+
+import argparse
+import os
+import shutil
+import time
+from typing import List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from rag.config import INDEX_PATH, COMPACT_DIM, COMPACT_QUANT, RESCORE_FETCH
+
+VECTORS_SUFFIX = ".vectors.npy"
+COMPACT_SUFFIX = ".compact.index"
+
+# FAISS scalar quantizer per storage type
+QUANTIZERS = {"int8": "SQ8", "fp16": "SQfp16"}
+# Rows used to fit the PCA / quantizer ranges
+TRAIN_SAMPLE = 100_000
+ADD_BATCH = 65_536
+
+
+def compact_paths(index_path: str) -> Tuple[str, str]:
+    """(full vectors, compact index) paths that belong to a chunk index"""
+    base = os.path.splitext(index_path)[0]
+    return base + VECTORS_SUFFIX, base + COMPACT_SUFFIX
+
+
+def factory_string(dim: int, reduced: int, quant: str) -> str:
+    """index_factory description of the compact index"""
+    if quant not in QUANTIZERS:
+        raise ValueError(f"Unknown quantization {quant!r} (expected one of {', '.join(QUANTIZERS)})")
+    return f"PCA{reduced},{QUANTIZERS[quant]}" if reduced < dim else QUANTIZERS[quant]
+
+
+def index_bytes(index: faiss.Index) -> int:
+    """Serialized size of a FAISS index, ~ its resident memory"""
+    return int(faiss.serialize_index(index).nbytes)
+
+# ============================================
+# Build
+# ============================================
+
+class VectorStoreWriter:
+    """Streams float32 chunk vectors into a .npy file during build_index"""
+
+    def __init__(self, index_path: str, dim: int):
+        self.path = compact_paths(index_path)[0]
+        self.dim = dim
+        self._raw = open(self.path + ".raw", "wb")
+        self.rows = 0
+
+    def add(self, vectors: np.ndarray):
+        self._raw.write(np.ascontiguousarray(vectors, dtype="<f4").tobytes())
+        self.rows += len(vectors)
+
+    def close(self) -> int:
+        """Prepend the .npy header (the row count is only known now)"""
+        self._raw.close()
+        with open(self.path + ".tmp", "wb") as out, open(self.path + ".raw", "rb") as raw:
+            np.lib.format.write_array_header_1_0(
+                out, {"descr": "<f4", "fortran_order": False, "shape": (self.rows, self.dim)})
+            shutil.copyfileobj(raw, out, 1 << 24)
+        os.remove(self.path + ".raw")
+        os.replace(self.path + ".tmp", self.path)
+        return self.rows
+
+
+def export_vectors(index_path: str) -> int:
+    """Write petmd.vectors.npy from an existing flat index (indexes built before it)"""
+    index = faiss.read_index(index_path)
+    writer = VectorStoreWriter(index_path, index.d)
+    for start in range(0, index.ntotal, ADD_BATCH):
+        writer.add(index.reconstruct_n(start, min(ADD_BATCH, index.ntotal - start)))
+    return writer.close()
+
+
+def train_compact(vectors: np.ndarray, dim: int = COMPACT_DIM, quant: str = COMPACT_QUANT,
+                  train_size: int = TRAIN_SAMPLE, seed: int = 0) -> faiss.Index:
+    """Fit PCA + quantizer on a sample of `vectors` and encode all of them"""
+    n, full_dim = vectors.shape
+    sample = np.sort(np.random.default_rng(seed).choice(n, size=min(n, train_size), replace=False))
+    # PCA cannot output more dimensions than it has training rows (tiny shards)
+    index = faiss.index_factory(full_dim, factory_string(full_dim, min(dim, full_dim, len(sample)), quant))
+    index.train(np.ascontiguousarray(vectors[sample], dtype="float32"))
+    for start in range(0, n, ADD_BATCH):
+        index.add(np.ascontiguousarray(vectors[start:start + ADD_BATCH], dtype="float32"))
+    return index
+
+
+def build_compact(index_path: str, dim: int = COMPACT_DIM, quant: str = COMPACT_QUANT) -> Optional[faiss.Index]:
+    """Compact index from petmd.vectors.npy (None for an empty index)"""
+    vectors_path, compact_path = compact_paths(index_path)
+    vectors = np.load(vectors_path, mmap_mode="r")
+    if not len(vectors):
+        return None
+    index = train_compact(vectors, dim, quant)
+    faiss.write_index(index, compact_path + ".tmp")
+    os.replace(compact_path + ".tmp", compact_path)
+    return index
+
+# ============================================
+# Load / Search
+# ============================================
+
+def load_compact(index_path: str) -> Optional[Tuple[faiss.Index, np.ndarray]]:
+    """(compact index, memmapped float32 vectors), or None if they were not built"""
+    vectors_path, compact_path = compact_paths(index_path)
+    if not (os.path.exists(vectors_path) and os.path.exists(compact_path)):
+        return None
+    index = faiss.read_index(compact_path)
+    vectors = np.load(vectors_path, mmap_mode="r")
+    if index.ntotal != len(vectors):
+        return None
+    return index, vectors
+
+
+def rescore(query: np.ndarray, candidates: np.ndarray, vectors: np.ndarray,
+            k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact L2 of the candidate ids against the full vectors; top k, nearest first"""
+    ids = np.sort(candidates[candidates >= 0])          # ascending ids: sequential page reads
+    distances = ((np.asarray(vectors[ids], dtype="float32") - query) ** 2).sum(axis=1)
+    top = np.argsort(distances, kind="stable")[:k]
+    return distances[top], ids[top]
+
+
+def search_compact(index: faiss.Index, vectors: np.ndarray, query_embs: np.ndarray, k: int,
+                   fetch_k: int = RESCORE_FETCH) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """(distances, ids) per query: max(k, fetch_k) compact candidates, exactly rescored"""
+    _, candidates = index.search(query_embs, max(k, fetch_k))
+    return [rescore(q, c, vectors, k) for q, c in zip(query_embs, candidates)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the compact (PCA + quantized) index for a chunk index")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--index", default=INDEX_PATH, help="chunk index (petmd.index) to compress")
+    parser.add_argument("--dim", type=int, default=COMPACT_DIM, help="PCA output dimension")
+    parser.add_argument("--quant", choices=list(QUANTIZERS), default=COMPACT_QUANT)
+    args = parser.parse_args()
+
+    start = time.time()
+    vectors_path = compact_paths(args.index)[0]
+    if not os.path.exists(vectors_path):
+        print(f"📤 Exporting {export_vectors(args.index)} vectors to {vectors_path}")
+    index = build_compact(args.index, args.dim, args.quant)
+    if index is None:
+        print("⚠️  Empty index, nothing to compress")
+        return
+    # The PCA matrix is a fixed ~0.5 MB, so tiny indexes do not shrink
+    full = index.ntotal * index.d * 4
+    print(f"🗜️  Compact index: {index.ntotal} vectors, {factory_string(index.d, args.dim, args.quant)}, "
+          f"{index_bytes(index) / 1e6:.1f} MB vs {full / 1e6:.1f} MB flat "
+          f"({full / index_bytes(index):.1f}x smaller, {time.time() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
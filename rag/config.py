@@ -0,0 +1,108 @@
+# rag/config.py
+
+import os
+
+# ============================================
+# Guards
+# ============================================
+
+# Optional JSON file overriding the built-in guard keyword lists
+GUARDS_CONFIG = os.getenv("RAG_GUARDS_CONFIG", "")
+
+# ============================================
+# Models
+# ============================================
+
+LLM_NAME = os.getenv("RAG_LLM_NAME", "Qwen/Qwen2.5-3B-Instruct")  # "Qwen/Qwen2.5-1.5B-Instruct"
+EMBEDDER_NAME = os.getenv("RAG_EMBEDDER_NAME", "all-MiniLM-L6-v2")
+
+# Smaller model for the degraded "small" tier under load (loaded only if enabled)
+SMALL_LLM_NAME = os.getenv("RAG_SMALL_LLM_NAME", "Qwen/Qwen2.5-1.5B-Instruct")
+SMALL_LLM_ENABLED = os.getenv("RAG_SMALL_LLM", "false").lower() == "true"
+
+# Query encoder backend: "torch" (SentenceTransformer) or "onnx" (see rag/encoders.py)
+ENCODER_BACKEND = os.getenv("RAG_ENCODER_BACKEND", "torch")
+ENCODER_ONNX_PATH = os.getenv("RAG_ENCODER_ONNX_PATH", "./Data/encoder_onnx")
+ENCODER_INT8 = os.getenv("RAG_ENCODER_INT8", "true").lower() == "true"
+# Minimum cosine vs. the reference model for an export to be used
+ENCODER_PARITY_MIN_COSINE = float(os.getenv("RAG_ENCODER_PARITY_MIN_COSINE", "0.99"))
+
+# ============================================
+# Index
+# ============================================
+
+# JSONL corpus written by article_scraper.py (legacy {title: article} .json also accepted)
+ARTICLES_PATH = os.getenv("RAG_ARTICLES_PATH", "./Data/articles_data.jsonl")
+INDEX_PATH = os.getenv("RAG_INDEX_PATH", "./Data/petmd.index")
+# JSONL chunk store (legacy .pkl also accepted)
+DOCS_PATH = os.getenv("RAG_DOCS_PATH", "./Data/documents_semantic.jsonl")
+
+# Versioned index snapshots (see rag/snapshots.py); used instead of
+# INDEX_PATH / DOCS_PATH once one is published
+SNAPSHOTS_DIR = os.getenv("RAG_SNAPSHOTS_DIR", "./Data/snapshots")
+# Poll the CURRENT snapshot pointer every N seconds and hot-reload (0 = off)
+INDEX_WATCH_INTERVAL = float(os.getenv("RAG_INDEX_WATCH", "0"))
+
+# Near-duplicate chunk elimination at index time (MinHash/LSH)
+DEDUP_ENABLED = os.getenv("RAG_DEDUP", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.8"))
+
+# ============================================
+# Vector Storage
+# ============================================
+
+# "flat": full float32 index in memory. "compact": search PCA-reduced,
+# scalar-quantized codes, then rescore the top candidates exactly against
+# float32 vectors memory-mapped from disk (see rag/compressed.py)
+VECTOR_MODE = os.getenv("RAG_VECTOR_MODE", "flat")
+# Shape of the compact index written by build_index / `python -m rag.compressed build`
+COMPACT_DIM = int(os.getenv("RAG_COMPACT_DIM", "128"))
+COMPACT_QUANT = os.getenv("RAG_COMPACT_QUANT", "int8")      # "int8" | "fp16"
+# First-pass candidates per query that are rescored exactly
+RESCORE_FETCH = int(os.getenv("RAG_RESCORE_FETCH", "40"))
+
+# ============================================
+# Sharding
+# ============================================
+
+# Output of `python -m rag.shards partition` (shard-NN/ folders + shards.json)
+SHARDS_DIR = os.getenv("RAG_SHARDS_DIR", "./Data/shards")
+# Comma-separated shard server unix sockets, or a shards directory (its
+# shard-NN.sock files). Empty = search the in-process index.
+SHARDS = os.getenv("RAG_SHARDS", "")
+# Per-shard reply deadline; slower shards are left out of the merged top-k
+SHARD_TIMEOUT = float(os.getenv("RAG_SHARD_TIMEOUT", "0.5"))
+# HMAC key of the shard protocol (pickles). Empty = a random key that the shard
+# servers write to <shards dir>/authkey (0600) and clients read from there
+SHARD_AUTHKEY = os.getenv("RAG_SHARD_AUTHKEY", "")
+
+# ============================================
+# Retrieval
+# ============================================
+
+# "flat": search every chunk; "hierarchical": pick the top articles from the
+# article-level index first, then search only their chunks
+RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "flat")
+TOP_ARTICLES = int(os.getenv("RAG_TOP_ARTICLES", "8"))
+
+# Maximal Marginal Relevance re-ranking for diverse top-k results
+MMR_ENABLED = os.getenv("RAG_MMR", "false").lower() == "true"
+MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", "0.5"))
+MMR_FETCH_K = int(os.getenv("RAG_MMR_FETCH_K", "20"))
+
+# ============================================
+# Precomputed Answers
+# ============================================
+
+# SQLite answer store filled by `python -m rag.warmup` (served if the file exists)
+ANSWER_STORE_PATH = os.getenv("RAG_ANSWER_STORE", "./Data/answers.sqlite")
+ANSWER_STORE_ENABLED = os.getenv("RAG_ANSWER_STORE_ENABLED", "true").lower() == "true"
+# Optional JSONL log of normalized live questions (for warm-up hit-ratio reports)
+TRAFFIC_LOG_PATH = os.getenv("RAG_TRAFFIC_LOG", "")
+
+# ============================================
+# Tracing
+# ============================================
+
+# Stage timing histograms for /api/metrics (spans are no-ops when disabled)
+TRACING_ENABLED = os.getenv("RAG_TRACING", "true").lower() == "true"
@@ -0,0 +1,170 @@
+# rag/corpus.py
+
+import json
+import os
+import pickle
+import queue
+import threading
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+# ============================================
+# JSONL Helpers
+# ============================================
+
+def append_jsonl(f: TextIO, record: Dict):
+    """Append one record and flush, so a crash loses at most the current line"""
+    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    f.flush()
+
+
+def _line_start(f: BinaryIO, end: int, block: int = 1 << 16) -> int:
+    """Offset just past the last newline before `end` (0 if there is none)"""
+    while end > 0:
+        start = max(0, end - block)
+        f.seek(start)
+        newline = f.read(end - start).rfind(b"\n")
+        if newline >= 0:
+            return start + newline + 1
+        end = start
+    return 0
+
+
+def drop_torn_line(path: str):
+    """
+    Truncate a partially written last line (crash mid-append) so the next
+    append starts on a fresh line. Only the tail of the file is read.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        size = f.seek(0, os.SEEK_END)
+        end = _line_start(f, size)
+        if end < size:
+            f.truncate(end)
+
+
+def last_jsonl(path: str) -> Optional[Dict]:
+    """Last complete record of a JSONL file, reading backwards from its end"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        end = _line_start(f, f.seek(0, os.SEEK_END))     # ignore a torn last line
+        while end > 0:
+            start = _line_start(f, end - 1)
+            f.seek(start)
+            try:
+                return json.loads(f.read(end - start))
+            except json.JSONDecodeError:
+                end = start                                 # blank or corrupt line
+    return None
+
+
+def iter_jsonl(path: str) -> Iterator[Dict]:
+    """Stream records from a JSONL file, skipping a truncated last line"""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def existing_path(path: str, legacy_suffix: str) -> str:
+    """
+    `path`, or the same file in its pre-JSONL format (e.g. articles_data.json,
+    documents_semantic.pkl) if only that exists. Raises FileNotFoundError
+    if neither does.
+    """
+    if os.path.exists(path):
+        return path
+    legacy = os.path.splitext(path)[0] + legacy_suffix
+    if os.path.exists(legacy):
+        print(f"⚠️  {path} not found, using legacy {legacy}")
+        return legacy
+    raise FileNotFoundError(f"{path} not found (nor legacy {legacy})")
+
+
+def prefetch(items: Iterable, maxsize: int = 64) -> Iterator:
+    """Produce `items` on a background thread so I/O overlaps with the consumer"""
+    q: queue.Queue = queue.Queue(maxsize=maxsize)
+    done = object()
+    error: List[BaseException] = []
+
+    def produce():
+        try:
+            for item in items:
+                q.put(item)
+        except BaseException as e:
+            error.append(e)
+        finally:
+            q.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = q.get()
+        if item is done:
+            break
+        yield item
+    if error:
+        raise error[0]
+
+# ============================================
+# Article Corpus
+# ============================================
+#
+# articles_data.jsonl is an append-only log written by article_scraper.py:
+#   {"url": ..., "title": ..., "text": ..., "animals": [...], "categories": [...]}
+# A URL that is re-crawled gets a new line; the latest line wins.
+
+def iter_articles(path: str) -> Iterator[Tuple[str, Dict]]:
+    """
+    Stream (title, article) pairs without holding the corpus in memory.
+
+    A first pass keeps only per-article metadata (latest line per URL, merged
+    animals/categories per title); the second pass yields texts one at a time.
+    Legacy {title: article} .json files are still accepted (also when the
+    configured .jsonl path does not exist but its .json sibling does).
+    """
+    path = existing_path(path, ".json")
+    if path.endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f).items()
+        return
+
+    latest: Dict[str, Tuple] = {}               # url -> (line, title, animals, categories)
+    for lineno, record in enumerate(iter_jsonl(path)):
+        latest[record["url"]] = (lineno, record["title"], record["animals"], record["categories"])
+
+    titles: Dict[str, Dict] = {}                # title -> first url + merged metadata
+    for url, (_, title, animals, categories) in sorted(latest.items(), key=lambda kv: kv[1][0]):
+        meta = titles.setdefault(title, {"url": url, "animals": [], "categories": []})
+        meta["animals"].extend(a for a in animals if a not in meta["animals"])
+        meta["categories"].extend(c for c in categories if c not in meta["categories"])
+
+    for lineno, record in enumerate(iter_jsonl(path)):
+        meta = titles.get(record["title"])
+        if meta is None or meta["url"] != record["url"] or latest[record["url"]][0] != lineno:
+            continue
+        yield record["title"], {"text": record["text"], **meta}
+
+# ============================================
+# Document Store
+# ============================================
+
+def iter_documents(path: str) -> Iterator[Dict]:
+    """Chunk documents from the JSONL store (or a legacy pickle, also as a fallback)"""
+    path = existing_path(path, ".pkl")
+    if path.endswith(".pkl"):
+        with open(path, "rb") as f:
+            yield from pickle.load(f)
+        return
+    yield from iter_jsonl(path)
+
+
+def load_documents(path: str) -> List[Dict]:
+    return list(iter_documents(path))
@@ -0,0 +1,90 @@
+# rag/dedup.py
+
+import re
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# ============================================
+# MinHash
+# ============================================
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def shingles(text: str, n: int = 3) -> np.ndarray:
+    """32-bit hashes of the word n-grams of a text"""
+    words = _TOKEN_RE.findall(text.lower())
+    if len(words) < n:
+        grams = {" ".join(words)}
+    else:
+        grams = {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+class MinHasher:
+    """MinHash signatures from `num_perm` universal hash permutations"""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, (1 << 31) - 1, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, (1 << 31) - 1, size=num_perm).astype(np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        h = shingles(text)
+        # (num_perm, n_shingles) permuted hashes, min over shingles
+        with np.errstate(over="ignore"):
+            permuted = (self.a[:, None] * h[None, :] + self.b[:, None]) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=1).astype(np.uint32)
+
+# ============================================
+# LSH Banding
+# ============================================
+
+class NearDuplicateIndex:
+    """
+    Streaming near-duplicate detector: signatures are split into `bands` bands;
+    chunks sharing any band bucket are candidates, confirmed when their
+    estimated Jaccard similarity reaches `threshold`.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, bands: int = 16):
+        assert num_perm % bands == 0, "num_perm must be divisible by bands"
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self.buckets: Dict[tuple, List[int]] = {}
+        self.signatures: List[np.ndarray] = []
+
+    def add(self, text: str) -> Optional[int]:
+        """Register a chunk; returns the id of the kept chunk it duplicates, or None if new"""
+        sig = self.hasher.signature(text)
+        keys = [(b, sig[b * self.rows:(b + 1) * self.rows].tobytes()) for b in range(self.bands)]
+
+        candidates = {cid for key in keys for cid in self.buckets.get(key, ())}
+        best, best_sim = None, self.threshold
+        for cid in candidates:
+            sim = float(np.mean(self.signatures[cid] == sig))
+            if sim >= best_sim:
+                best, best_sim = cid, sim
+        if best is not None:
+            return best
+
+        cid = len(self.signatures)
+        self.signatures.append(sig)
+        for key in keys:
+            self.buckets.setdefault(key, []).append(cid)
+        return None
+
+
+def merge_metadata(kept: Dict, duplicate: Dict):
+    """Fold a duplicate chunk's animals/categories into the kept chunk's metadata"""
+    for key in ("animals", "categories"):
+        values = kept.setdefault(key, [])
+        values.extend(v for v in duplicate.get(key, []) if v not in values)
+    kept["duplicates"] = kept.get("duplicates", 0) + 1
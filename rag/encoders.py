@@ -0,0 +1,260 @@
+# rag/encoders.py
+#
+# Query encoder backends for retrieval.
+#
+#   torch - the reference SentenceTransformer stack (default)
+#   onnx  - the same transformer exported to ONNX (optionally int8-quantized)
+#           with mean pooling in numpy and the Rust `tokenizers` tokenizer
+#
+#   python -m rag.encoders export            # export + quantize + parity check
+#   python -m rag.encoders check             # re-run the parity check
+#
+# An ONNX export only loads if its recorded parity check against the reference
+# model passed, so vectors stay compatible with the existing FAISS index.
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from rag.config import (EMBEDDER_NAME, ENCODER_BACKEND, ENCODER_ONNX_PATH,
+                        ENCODER_INT8, ENCODER_PARITY_MIN_COSINE)
+
+MANIFEST = "encoder.json"
+FP32_MODEL = "model.onnx"
+INT8_MODEL = "model.int8.onnx"
+
+# Probe texts for the parity check (short queries, like real traffic)
+PARITY_TEXTS = [
+    "What should I feed my dog?",
+    "How often should I take my cat to the vet?",
+    "my dog ate chocolate what should i do",
+    "Why is my cat sneezing so much?",
+    "How much exercise does a Border Collie need?",
+    "signs of kidney disease in senior cats",
+    "Is it normal for a puppy to sleep all day?",
+    "How do I get rid of fleas on my dog?",
+    "vaccines for kittens",
+    "Can cats eat tuna?",
+]
+
+# ============================================
+# Backends
+# ============================================
+
+class TorchEncoder:
+    """Reference SentenceTransformer encoder"""
+
+    backend = "torch"
+
+    def __init__(self, name: str = EMBEDDER_NAME):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(name)
+
+    def encode(self, texts: List[str], **kwargs) -> np.ndarray:
+        return self.model.encode(texts, convert_to_numpy=True, **kwargs)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+
+class OnnxEncoder:
+    """ONNX Runtime transformer + numpy mean pooling, tokenized by `tokenizers`"""
+
+    backend = "onnx"
+
+    def __init__(self, path: str = ENCODER_ONNX_PATH, int8: bool = ENCODER_INT8, threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(path, MANIFEST), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+
+        self.model_file = INT8_MODEL if int8 else FP32_MODEL
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(os.path.join(path, self.model_file), options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.manifest["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.manifest["pad_token_id"])
+        self.normalize = self.manifest["normalize"]
+
+    def encode(self, texts: List[str], batch_size: int = 64, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        out = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                     "attention_mask": mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+            hidden = self.session.run(None, feeds)[0]
+            weights = mask[..., None].astype(np.float32)
+            emb = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                emb /= np.clip(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12, None)
+            out.append(emb.astype(np.float32))
+        return np.vstack(out)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.manifest["dim"]
+
+# ============================================
+# Export / Parity
+# ============================================
+
+def export_onnx(name: str = EMBEDDER_NAME, path: str = ENCODER_ONNX_PATH, int8: bool = True) -> Dict:
+    """Export the embedder's transformer to ONNX (+ int8 dynamic quantization); returns the manifest"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(path, exist_ok=True)
+    st = SentenceTransformer(name, device="cpu")
+    modules = {type(m).__name__: m for m in st}
+    transformer = st[0]
+    pooling = modules["Pooling"].get_config_dict()
+    # "pooling_mode" on sentence-transformers >= 5, per-mode flags before that
+    if pooling.get("pooling_mode", "mean" if pooling.get("pooling_mode_mean_tokens") else None) != "mean":
+        raise ValueError(f"Only mean pooling is supported, got {pooling}")
+
+    tokenizer = transformer.tokenizer
+    if not tokenizer.is_fast:
+        raise ValueError("ONNX backend needs a fast (Rust) tokenizer")
+    tokenizer.save_pretrained(path)
+
+    model = transformer.auto_model.eval()
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    inputs = [k for k in ("input_ids", "attention_mask", "token_type_ids") if k in sample]
+    dynamic = {k: {0: "batch", 1: "seq"} for k in inputs}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "seq"}
+
+    class _Wrapper(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, *args):
+            return self.inner(**dict(zip(inputs, args))).last_hidden_state
+
+    with torch.no_grad():
+        torch.onnx.export(_Wrapper(model), tuple(sample[k] for k in inputs), os.path.join(path, FP32_MODEL),
+                          input_names=inputs, output_names=["last_hidden_state"],
+                          dynamic_axes=dynamic, opset_version=17, dynamo=False)
+
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(os.path.join(path, FP32_MODEL), os.path.join(path, INT8_MODEL),
+                         weight_type=QuantType.QInt8)
+
+    manifest = {
+        "source": name,
+        "dim": st.get_sentence_embedding_dimension(),
+        "max_seq_length": st.max_seq_length,
+        "pad_token_id": tokenizer.pad_token_id,
+        "normalize": "Normalize" in modules,
+        "parity": {}
+    }
+    _write_manifest(path, manifest)
+    return manifest
+
+
+def parity_check(reference, candidate, texts: List[str] = PARITY_TEXTS,
+                 min_cosine: float = ENCODER_PARITY_MIN_COSINE) -> Dict:
+    """Cosine agreement between two encoders on probe texts (queries are lower-cased like retrieval)"""
+    texts = [t.lower() for t in texts]
+    a = reference.encode(texts)
+    b = candidate.encode(texts)
+    cos = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1) + 1e-12)
+    return {
+        "min_cosine": round(float(cos.min()), 6),
+        "mean_cosine": round(float(cos.mean()), 6),
+        "max_abs_diff": round(float(np.abs(a - b).max()), 6),
+        "threshold": min_cosine,
+        "passed": bool(cos.min() >= min_cosine)
+    }
+
+
+def check_export(path: str = ENCODER_ONNX_PATH, reference=None) -> Dict:
+    """Run the parity check for every exported variant and record it in the manifest"""
+    manifest = _read_manifest(path)
+    reference = reference or TorchEncoder(manifest["source"])
+    for int8, model_file in ((False, FP32_MODEL), (True, INT8_MODEL)):
+        if os.path.exists(os.path.join(path, model_file)):
+            manifest["parity"][model_file] = parity_check(reference, OnnxEncoder(path, int8=int8))
+    _write_manifest(path, manifest)
+    return manifest
+
+
+def _read_manifest(path: str) -> Dict:
+    with open(os.path.join(path, MANIFEST), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(path: str, manifest: Dict):
+    tmp = os.path.join(path, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(path, MANIFEST))
+
+# ============================================
+# Startup Selection
+# ============================================
+
+def load_encoder(backend: str = ENCODER_BACKEND, name: str = EMBEDDER_NAME,
+                 path: str = ENCODER_ONNX_PATH, int8: bool = ENCODER_INT8):
+    """
+    Encoder for `backend`. The ONNX export is only used if it was exported
+    from `name` and passed its parity check; otherwise fall back to torch.
+    """
+    if backend == "onnx":
+        model_file = INT8_MODEL if int8 else FP32_MODEL
+        try:
+            manifest = _read_manifest(path)
+            parity = manifest["parity"].get(model_file)
+            if manifest["source"] != name:
+                print(f"⚠️  ONNX encoder was exported from {manifest['source']}, not {name}")
+            elif not parity or not parity["passed"]:
+                print(f"⚠️  ONNX encoder {model_file} has no passing parity check (run: python -m rag.encoders check)")
+            else:
+                print(f"⚡ ONNX encoder: {model_file} (min cosine {parity['min_cosine']})")
+                return OnnxEncoder(path, int8=int8)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠️  ONNX encoder unavailable: {type(e).__name__}: {e}")
+        print("   Falling back to the torch encoder")
+    elif backend != "torch":
+        raise ValueError(f"Unknown encoder backend: {backend}")
+    return TorchEncoder(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export / verify the ONNX query encoder")
+    parser.add_argument("command", choices=["export", "check"])
+    parser.add_argument("--model", default=EMBEDDER_NAME)
+    parser.add_argument("--path", default=ENCODER_ONNX_PATH)
+    parser.add_argument("--no-int8", action="store_true", help="skip int8 quantization")
+    args = parser.parse_args()
+
+    start = time.time()
+    if args.command == "export":
+        export_onnx(args.model, args.path, int8=not args.no_int8)
+        print(f"📦 Exported {args.model} to {args.path} ({time.time() - start:.1f}s)")
+
+    manifest = check_export(args.path)
+    for model_file, parity in manifest["parity"].items():
+        status = "✅" if parity["passed"] else "❌"
+        print(f"{status} {model_file}: min cosine {parity['min_cosine']} "
+              f"(mean {parity['mean_cosine']}, threshold {parity['threshold']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,6 @@
+import sys
 import pandas as pd
-from rag.chatbot import rag_chatbot
-from rag.retriever import retrieve_chunks
-import time
+from rag.eval_runner import run_tests
 
 # 1. قائمة بأسئلة اختبارية (يفضل تكون من الداتا اللي عندك)
 test_dataset = [
@@ -16,36 +15,25 @@ test_dataset = [
     # ضيف هنا 10-20 سؤال من المقالات اللي عملت لها Scraping
 ]
 
-def evaluate_rag():
+def evaluate_rag(workers: int = 1, checkpoint: str = None):
     results = []
     print(f"Starting Evaluation on {len(test_dataset)} questions...\n")
 
-    for entry in test_dataset:
-        q = entry["question"]
-        expected = entry["expected_answer"]
+    # تشغيل الـ Pipeline (Retriever + Chatbot) بالتوازي مع checkpoint للاستكمال
+    records = run_tests(test_dataset, k=5, workers=workers, checkpoint=checkpoint)
 
-        start_time = time.time()
-
-        # تشغيل الـ Pipeline
-        # 1. اختبار الـ Retriever
-        retrieved_docs = retrieve_chunks(q, k=3)
-        context = " ".join([d["text"] for d in retrieved_docs])
-
-        # 2. اختبار الـ Chatbot
-        actual_answer = rag_chatbot(q)
-
-        duration = time.time() - start_time
+    for entry, record in zip(test_dataset, records):
+        context = " ".join([c["text"] for c in record["chunks"][:3]])
 
         # تقييم بسيط (هل الإجابة المتوقعة موجودة في الـ Context؟)
         # ملاحظة: التقييم الاحترافي بيستخدم LLM تاني للتقييم (LLM-as-a-judge)
         results.append({
-            "Question": q,
-            "Expected": expected,
-            "Actual": actual_answer,
-            "Latency (s)": round(duration, 2),
+            "Question": entry["question"],
+            "Expected": entry["expected_answer"],
+            "Actual": record["response"],
+            "Latency (s)": round(record["time"], 2),
             "Context_Length": len(context)
         })
-        print(f"Finished: {q[:30]}... ({round(duration, 2)}s)")
 
     # تحويل النتائج لجدول DataFrame
     df = pd.DataFrame(results)
@@ -59,4 +47,7 @@ def evaluate_rag():
     print("Results saved to 'evaluation_results.csv'")
 
 if __name__ == "__main__":
-    evaluate_rag()
+    # python -m rag.eval [workers] [checkpoint.jsonl]
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    checkpoint = sys.argv[2] if len(sys.argv) > 2 else None
+    evaluate_rag(workers=workers, checkpoint=checkpoint)
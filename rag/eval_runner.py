@@ -0,0 +1,125 @@
+# rag/eval_runner.py
+
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from rag.corpus import drop_torn_line
+
+# Seed used for test generation/sampling so runs are comparable
+DEFAULT_SEED = 42
+
+# ============================================
+# Worker (one model load per process)
+# ============================================
+
+_answer_question = None
+_retrieve_chunks = None
+
+
+def _init_worker():
+    """Load the RAG stack once per process"""
+    global _answer_question, _retrieve_chunks
+    from rag.chatbot import answer_question
+    from rag.retriever import retrieve_chunks
+    _answer_question = answer_question
+    _retrieve_chunks = retrieve_chunks
+
+
+def _run_one(idx: int, question: str, k: int) -> Dict:
+    """Answer a single test question and time it"""
+    start = time.time()
+    response, chunks = _answer_question(question, k=k)
+    elapsed = time.time() - start
+
+    # Guard short-circuits skip retrieval; record what would have been retrieved
+    if not chunks:
+        chunks = _retrieve_chunks(question, k=k)
+
+    return {
+        "idx": idx,
+        "question": question,
+        "response": response,
+        "chunks": [
+            {"id": c["id"], "text": c["text"], "metadata": {"title": c["metadata"]["title"]}}
+            for c in chunks
+        ],
+        "time": elapsed
+    }
+
+# ============================================
+# Checkpoint
+# ============================================
+
+def load_checkpoint(path: str, tests: List[Dict]) -> Dict[int, Dict]:
+    """Completed records from a JSONL checkpoint that still match the test list"""
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+
+    drop_torn_line(path)         # interrupted run: appends must start on a fresh line
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            idx = record.get("idx")
+            if isinstance(idx, int) and idx < len(tests) and tests[idx]["question"] == record.get("question"):
+                done[idx] = record
+    return done
+
+# ============================================
+# Runner
+# ============================================
+
+def run_tests(tests: List[Dict], k: int = 5, workers: int = 1,
+              checkpoint: Optional[str] = None, verbose: bool = True) -> List[Dict]:
+    """
+    Answer every test question, sharded across `workers` processes.
+
+    Each finished record is appended to `checkpoint` (JSONL) as soon as it
+    completes; re-running with the same checkpoint skips finished tests.
+
+    Returns:
+        Records in test order: idx, question, response, chunks, time
+    """
+    done = load_checkpoint(checkpoint, tests)
+    pending = [i for i in range(len(tests)) if i not in done]
+
+    if done:
+        print(f"♻️  Resuming: {len(done)} done, {len(pending)} remaining")
+
+    out = open(checkpoint, "a", encoding="utf-8") if checkpoint else None
+
+    def record_done(record: Dict):
+        done[record["idx"]] = record
+        if out:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+        if verbose:
+            test = tests[record["idx"]]
+            print(f"[{len(done):03d}/{len(tests)}] {test.get('category', '')}: "
+                  f"{record['question'][:45]}... ({record['time']:.1f}s)")
+
+    try:
+        if workers <= 1:
+            _init_worker()
+            for i in pending:
+                record_done(_run_one(i, tests[i]["question"], k))
+        elif pending:
+            # spawn: CUDA cannot be re-initialised in forked children
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                     initializer=_init_worker) as pool:
+                futures = [pool.submit(_run_one, i, tests[i]["question"], k) for i in pending]
+                for future in as_completed(futures):
+                    record_done(future.result())
+    finally:
+        if out:
+            out.close()
+
+    return [done[i] for i in range(len(tests))]
@@ -0,0 +1,131 @@
+# rag/extractive.py
+#
+# Extractive (no-LLM) answers: rank the sentences of the retrieved chunks
+# against the query embedding and return the best few with [n] citations.
+# Used as the fastest degradation tier when the inference queue is saturated.
+#
+# build_index stores one unit-length float16 vector per sentence next to the
+# chunk index, so answering needs no encoder call:
+#   petmd.sentences.f16          - raw (n_sentences, dim) float16 rows
+#   petmd.sentences.offsets.npy  - int64 (n_chunks + 1): chunk i owns rows
+#                                  offsets[i]..offsets[i+1]-1
+# Sentences are re-split from the chunk text with `split_sentences`, which
+# must stay in sync with the build; chunks without stored vectors (older
+# indexes, shards, a mismatch) are encoded on the fly.
+
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+SENTENCES_SUFFIX = ".sentences.f16"
+OFFSETS_SUFFIX = ".sentences.offsets.npy"
+
+MIN_SENTENCE_CHARS = 25
+MAX_SENTENCES = 3
+# Below this cosine similarity no sentence is considered an answer
+MIN_SCORE = 0.25
+# Sentences this similar to an already picked one are skipped
+REDUNDANCY = 0.9
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences of a chunk long enough to stand alone"""
+    return [s.strip() for s in _SENTENCE_RE.split(text) if len(s.strip()) >= MIN_SENTENCE_CHARS]
+
+
+def sentence_paths(index_path: str) -> Tuple[str, str]:
+    """(sentence vectors, chunk offsets) paths that belong to a chunk index"""
+    base = os.path.splitext(index_path)[0]
+    return base + SENTENCES_SUFFIX, base + OFFSETS_SUFFIX
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    return x / (np.linalg.norm(x, axis=-1, keepdims=True) + 1e-12)
+
+# ============================================
+# Build
+# ============================================
+
+class SentenceStoreWriter:
+    """Appends sentence vectors chunk by chunk during build_index"""
+
+    def __init__(self, index_path: str):
+        self.vectors_path, self.offsets_path = sentence_paths(index_path)
+        self._out = open(self.vectors_path + ".tmp", "wb")
+        self._offsets = [0]
+
+    def add(self, counts: List[int], vectors: np.ndarray):
+        """`counts[i]` sentences of the i-th chunk, their vectors stacked in order"""
+        self._out.write(_unit(np.asarray(vectors, dtype="float32")).astype(np.float16).tobytes())
+        for n in counts:
+            self._offsets.append(self._offsets[-1] + n)
+
+    def close(self) -> int:
+        self._out.close()
+        np.save(self.offsets_path, np.asarray(self._offsets, dtype=np.int64))
+        os.replace(self.vectors_path + ".tmp", self.vectors_path)
+        return self._offsets[-1]
+
+
+def load_sentence_store(index_path: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """(memmapped (n, dim) float16 vectors, offsets), or None if it was not built"""
+    vectors_path, offsets_path = sentence_paths(index_path)
+    if not (os.path.exists(vectors_path) and os.path.exists(offsets_path)):
+        return None
+    offsets = np.load(offsets_path)
+    if not offsets[-1]:
+        return np.zeros((0, 0), dtype=np.float16), offsets
+    flat = np.memmap(vectors_path, dtype=np.float16, mode="r")
+    return flat.reshape(int(offsets[-1]), -1), offsets
+
+# ============================================
+# Answer
+# ============================================
+
+def extractive_answer(query_emb: np.ndarray, chunks: List[Dict],
+                      stored: List[Optional[np.ndarray]],
+                      encode: Callable[[List[str]], np.ndarray],
+                      max_sentences: int = MAX_SENTENCES) -> Tuple[Optional[str], List[Dict]]:
+    """
+    Best `max_sentences` sentences of `chunks` for the query, each followed by
+    the [n] of its chunk. `stored[i]` are chunk i's precomputed sentence
+    vectors (None to encode). Returns (answer or None, chunks with the cited
+    ones first, so [n] matches the n-th returned source).
+    """
+    sentences, owners, vectors, missing = [], [], [], []
+    for i, chunk in enumerate(chunks):
+        parts = split_sentences(chunk.get("text", ""))
+        if stored[i] is not None and len(stored[i]) == len(parts):
+            vectors.append(np.asarray(stored[i], dtype="float32"))
+        else:
+            missing += range(len(sentences), len(sentences) + len(parts))
+            vectors.append(np.zeros((len(parts), len(query_emb)), dtype="float32"))
+        sentences += parts
+        owners += [i] * len(parts)
+    if not sentences:
+        return None, chunks
+
+    vectors = np.vstack(vectors)
+    if missing:
+        vectors[missing] = _unit(np.asarray(encode([sentences[j] for j in missing]), dtype="float32"))
+
+    scores = _unit(vectors) @ _unit(np.asarray(query_emb, dtype="float32"))
+    picked = []
+    for j in np.argsort(-scores):
+        if scores[j] < MIN_SCORE or len(picked) == max_sentences:
+            break
+        if any(float(vectors[j] @ vectors[p]) > REDUNDANCY for p in picked):
+            continue
+        picked.append(int(j))
+    if not picked:
+        return None, chunks
+
+    # Cited chunks first, in order of their best sentence
+    cited = list(dict.fromkeys(owners[j] for j in picked))
+    order = cited + [i for i in range(len(chunks)) if i not in cited]
+    answer = " ".join(f"{sentences[j]} [{cited.index(owners[j]) + 1}]" for j in picked)
+    return answer, [chunks[i] for i in order]
@@ -0,0 +1,259 @@
+# rag/generation.py
+#
+# Generation controller: chat-template prompts, per-intent token budgets,
+# early stopping, and decoding of the generated tokens only.
+
+import re
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList, TextStreamer
+
+from rag.tracing import span, inc, describe
+
+SYSTEM_PROMPT = (
+    "You are a pet health assistant. Answer the question using ONLY the context. "
+    "Be brief and helpful. If the context does not contain the answer, say so."
+)
+
+# Prompts are truncated to this many tokens
+MAX_PROMPT_TOKENS = 1024
+
+# Strings that mean the model has started a new turn / section
+STOP_SEQUENCES = ["\nQuestion:", "\nContext:", "<|im_start|>", "<|endoftext|>"]
+
+# ============================================
+# Token Budgets (per intent)
+# ============================================
+
+MAX_NEW_TOKENS = {
+    "emergency": 60,     # the emergency banner carries the message; keep advice short
+    "yes_no": 60,
+    "overview": 160,
+    "default": 100,
+}
+
+# Once this share of the budget is used, stop at the next sentence end
+SOFT_LIMIT = 0.6
+
+YES_NO_RE = re.compile(r"^(is|are|can|could|should|does|do|did|will|would|may|has|have)\b", re.IGNORECASE)
+OVERVIEW_RE = re.compile(
+    r"^(what (is|are)|tell me (about|more)|explain|describe|overview|how (do|does|to|can)|"
+    r"what (causes|should)|why)\b|\b(symptoms|signs|causes|treatment|guide)\b",
+    re.IGNORECASE
+)
+
+
+def answer_intent(question: str, flags: Optional[Dict] = None) -> str:
+    """Length class of the expected answer"""
+    if flags and flags.get("emergency"):
+        return "emergency"
+    q = question.strip()
+    if YES_NO_RE.match(q):
+        return "yes_no"
+    if OVERVIEW_RE.search(q):
+        return "overview"
+    return "default"
+
+# ============================================
+# Prompt
+# ============================================
+
+def build_context(chunks: List[Dict]) -> str:
+    return "\n\n".join(c["text"][:500] for c in chunks[:3])  # Limit context size
+
+
+def build_prompt(tokenizer, question: str, chunks: List[Dict]) -> str:
+    """Chat-template prompt (plain "Answer:" prompt for tokenizers without one)"""
+    context = build_context(chunks)
+    if not getattr(tokenizer, "chat_template", None):
+        return f"{SYSTEM_PROMPT}\n\nContext:\n{context}\n\nQuestion: {question}\n\nAnswer:"
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {question}"},
+    ]
+    return tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+
+# ============================================
+# Stopping Criteria
+# ============================================
+
+class StopController(StoppingCriteria):
+    """
+    Per-row early stop for a (batched) generate call:
+      - a stop sequence appears in the generated text,
+      - `soft_limit` new tokens were generated and the text ends a sentence, or
+      - the row's `budget` of new tokens is spent.
+    `soft_limit` / `budget` are one int for every row or a list per row.
+    Only the last `window` generated tokens are decoded per step.
+    """
+
+    def __init__(self, tokenizer, prompt_len: int, soft_limit: Union[int, List[int]],
+                 budget: Optional[Union[int, List[int]]] = None,
+                 stop_sequences: List[str] = STOP_SEQUENCES, window: int = 12):
+        self.tokenizer = tokenizer
+        self.prompt_len = prompt_len
+        self.soft_limit = soft_limit
+        self.budget = budget
+        self.stop_sequences = stop_sequences
+        self.window = window
+
+    @staticmethod
+    def _row(limit: Union[int, List[int]], row: int) -> int:
+        return limit[row] if isinstance(limit, list) else limit
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        n_new = input_ids.shape[1] - self.prompt_len
+        done = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        if n_new <= 0:
+            return done
+
+        tails = self.tokenizer.batch_decode(input_ids[:, -min(n_new, self.window):], skip_special_tokens=False)
+        for row, tail in enumerate(tails):
+            if self.budget is not None and n_new >= self._row(self.budget, row):
+                done[row] = True
+            elif any(s in tail for s in self.stop_sequences):
+                done[row] = True
+            elif n_new >= self._row(self.soft_limit, row) and tail.rstrip().endswith((".", "!", "?")):
+                done[row] = True
+        return done
+
+
+class CallbackStreamer(TextStreamer):
+    """Push decoded text pieces (generated tokens only) to `callback` as they finalize"""
+
+    def __init__(self, tokenizer, callback: Callable[[str], None]):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.callback = callback
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.callback(text)
+
+
+def clean_answer(text: str) -> str:
+    """Cut at the first stop sequence and drop a trailing unfinished sentence"""
+    for s in STOP_SEQUENCES:
+        text = text.split(s)[0]
+    text = text.strip()
+    if text and not text.endswith((".", "!", "?")):
+        end = max(text.rfind(". "), text.rfind("! "), text.rfind("? "))
+        if end > len(text) // 2:
+            text = text[:end + 1]
+    return text
+
+# ============================================
+# Generate
+# ============================================
+
+describe("rag_generated_tokens_total", "New tokens decoded, by answer intent")
+describe("rag_generations_total", "Generate calls, by answer intent")
+
+
+def generate_answer(model, tokenizer, question: str, chunks: List[Dict], flags: Optional[Dict] = None,
+                    device: str = "cpu", max_new_tokens: Optional[int] = None,
+                    on_token: Optional[Callable[[str], None]] = None) -> Tuple[str, int]:
+    """
+    Generate an answer from retrieved chunks; returns (answer, new token count).
+    `on_token` receives the raw text as it is generated (before clean_answer).
+    """
+    intent = answer_intent(question, flags)
+    budget = max_new_tokens or MAX_NEW_TOKENS[intent]
+
+    with span("context"):
+        prompt = build_prompt(tokenizer, question, chunks)
+
+    with span("tokenize"):
+        inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=MAX_PROMPT_TOKENS).to(device)
+    prompt_len = inputs["input_ids"].shape[1]
+
+    with span("generate"), torch.no_grad():
+        outputs = model.generate(
+            **inputs,
+            max_new_tokens=budget,
+            do_sample=False,     # Greedy = faster
+            eos_token_id=tokenizer.eos_token_id,
+            pad_token_id=tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id,
+            stopping_criteria=StoppingCriteriaList([StopController(tokenizer, prompt_len, int(budget * SOFT_LIMIT))]),
+            streamer=CallbackStreamer(tokenizer, on_token) if on_token else None
+        )
+
+    # Decode only the generated tokens - never the prompt
+    new_tokens = outputs[0][prompt_len:]
+    with span("decode"):
+        answer = clean_answer(tokenizer.decode(new_tokens, skip_special_tokens=True))
+
+    inc("rag_generations_total", intent=intent)
+    inc("rag_generated_tokens_total", len(new_tokens), intent=intent)
+    return answer, len(new_tokens)
+
+
+def prompt_lengths(tokenizer, prompts: List[str]) -> List[int]:
+    """Token count of each prompt as generate_batch will see it (truncated)"""
+    if not prompts:
+        return []
+    return [len(ids) for ids in tokenizer(prompts, truncation=True, max_length=MAX_PROMPT_TOKENS)["input_ids"]]
+
+
+def generate_batch(model, tokenizer, questions: List[str], chunks_list: List[List[Dict]],
+                   flags_list: Optional[List[Dict]] = None, device: str = "cpu",
+                   prompts: Optional[List[str]] = None, stats: Optional[Dict] = None) -> List[Tuple[str, int]]:
+    """
+    Batched generate_answer: one left-padded generate call for all questions.
+    Every row keeps its own per-intent budget and soft limit (StopController),
+    so each answer matches what generate_answer returns for that question.
+    `prompts` skips rebuilding them; `stats` accumulates real vs padded tokens.
+    """
+    flags_list = flags_list or [None] * len(questions)
+    intents = [answer_intent(q, f) for q, f in zip(questions, flags_list)]
+    budgets = [MAX_NEW_TOKENS[i] for i in intents]
+
+    if prompts is None:
+        with span("context"):
+            prompts = [build_prompt(tokenizer, q, c) for q, c in zip(questions, chunks_list)]
+
+    padding_side = tokenizer.padding_side
+    tokenizer.padding_side = "left"          # generated tokens start at the same column for every row
+    try:
+        with span("tokenize"):
+            inputs = tokenizer(prompts, return_tensors="pt", padding=True,
+                               truncation=True, max_length=MAX_PROMPT_TOKENS).to(device)
+    finally:
+        tokenizer.padding_side = padding_side
+    prompt_len = inputs["input_ids"].shape[1]
+
+    with span("generate"), torch.no_grad():
+        outputs = model.generate(
+            **inputs,
+            max_new_tokens=max(budgets),
+            do_sample=False,
+            eos_token_id=tokenizer.eos_token_id,
+            pad_token_id=tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id,
+            stopping_criteria=StoppingCriteriaList([StopController(
+                tokenizer, prompt_len, [int(b * SOFT_LIMIT) for b in budgets], budgets)])
+        )
+
+    results = []
+    with span("decode"):
+        for intent, budget, row in zip(intents, budgets, outputs[:, prompt_len:]):
+            # Count up to the first EOS/pad (finished rows are padded to the batch length)
+            n = min(len(row), budget)
+            for stop_id in {tokenizer.eos_token_id, tokenizer.pad_token_id} - {None}:
+                hits = (row == stop_id).nonzero()
+                if len(hits):
+                    n = min(n, int(hits[0]) + 1)
+            results.append((clean_answer(tokenizer.decode(row[:n], skip_special_tokens=True)), n))
+            inc("rag_generations_total", intent=intent)
+            inc("rag_generated_tokens_total", n, intent=intent)
+
+    if stats is not None:
+        real = int(inputs["attention_mask"].sum())
+        generated = sum(n for _, n in results)
+        stats["prompt_tokens"] = stats.get("prompt_tokens", 0) + real
+        stats["prompt_padding"] = stats.get("prompt_padding", 0) + inputs["attention_mask"].numel() - real
+        stats["generated_tokens"] = stats.get("generated_tokens", 0) + generated
+        # Finished rows keep occupying the batch until its longest row is done
+        stats["decode_padding"] = stats.get("decode_padding", 0) + \
+            (outputs.shape[1] - prompt_len) * len(results) - generated
+    return results
@@ -1,6 +1,10 @@
 # rag/guards.py
 
+import json
 import re
+from typing import Dict, List, Optional
+
+from rag.config import GUARDS_CONFIG
 
 # ============================================
 # Keywords
@@ -18,6 +22,93 @@ FAREWELLS = ["ok", "okay", "thanks", "thank you", "bye", "goodbye", "got it"]
 
 INVALID_QUERIES = ["continue", "go on", "tell me more", "yes", "no"]
 
+# A greeting followed by more than this many words is a real question
+# ("hi, my dog ate chocolate") and must not be short-circuited.
+MAX_GREETING_TAIL_WORDS = 2
+
+# ============================================
+# Compiled Guard Engine
+# ============================================
+
+_LETTER_RE = re.compile(r'[^\s\d\W]')
+_WORD_RE = re.compile(r"[a-z']+")
+
+
+def _alternation(phrases: List[str]) -> str:
+    # Longest first so "good morning" wins over a shorter prefix
+    ordered = sorted({p.lower().strip() for p in phrases if p.strip()}, key=len, reverse=True)
+    return "|".join(r"\s+".join(map(re.escape, p.split())) for p in ordered)
+
+
+class GuardEngine:
+    """All guard intents compiled into a single regex, evaluated in one pass"""
+
+    def __init__(self, emergency: List[str], greetings: List[str],
+                 farewells: List[str], invalid: List[str]):
+        self.emergency = list(emergency)
+        self.greetings = list(greetings)
+        self.farewells = list(farewells)
+        self.invalid = list(invalid)
+
+        # Whole-query intents are anchored and tried first; emergency stems only
+        # need a leading word boundary so "poison" still matches "poisoning".
+        # An empty list leaves its group out: "(?:)" would match everywhere.
+        groups = [
+            ("farewell", self.farewells, "^(?:{})$"),
+            ("invalid", self.invalid, "^(?:{})$"),
+            ("greeting", self.greetings, r"^(?:{})\b"),
+            ("emergency", self.emergency, r"\b(?:{})"),
+        ]
+        self.pattern = re.compile("|".join(
+            f"(?P<{name}>{template.format(_alternation(phrases))})"
+            for name, phrases, template in groups if _alternation(phrases)
+        ) or "(?!)")
+
+    @classmethod
+    def from_file(cls, path: str) -> "GuardEngine":
+        """Build an engine from a JSON file; missing keys keep the defaults"""
+        with open(path, "r", encoding="utf-8") as f:
+            cfg = json.load(f)
+        return cls(
+            emergency=cfg.get("emergency", EMERGENCY_KEYWORDS),
+            greetings=cfg.get("greetings", GREETINGS),
+            farewells=cfg.get("farewells", FAREWELLS),
+            invalid=cfg.get("invalid", INVALID_QUERIES),
+        )
+
+    def classify(self, query: str) -> Dict[str, bool]:
+        """Return every intent flag for a query"""
+        q = " ".join(query.lower().split()).strip('!.,? ')
+
+        flags = {
+            "english": is_english(query),
+            "emergency": False,
+            "greeting": False,
+            "farewell": False,
+            "invalid": len(q) < 3,
+        }
+
+        for m in self.pattern.finditer(q):
+            intent = m.lastgroup
+            if intent == "greeting":
+                tail = _WORD_RE.findall(q[m.end():])
+                flags["greeting"] = len(tail) <= MAX_GREETING_TAIL_WORDS
+            else:
+                flags[intent] = True
+
+        return flags
+
+
+def load_guard_engine(path: Optional[str] = None) -> GuardEngine:
+    """Load the guard engine from a config file, or from the built-in lists"""
+    path = path or GUARDS_CONFIG
+    if path:
+        return GuardEngine.from_file(path)
+    return GuardEngine(EMERGENCY_KEYWORDS, GREETINGS, FAREWELLS, INVALID_QUERIES)
+
+
+engine = load_guard_engine()
+
 # ============================================
 # Functions
 # ============================================
@@ -27,11 +118,13 @@ def is_english(text: str) -> bool:
     if not text or len(text.strip()) < 2:
         return False
 
-    text = text.strip()
-
-    # Count English letters vs non-English
-    english_chars = len(re.findall(r'[a-zA-Z]', text))
-    total_alpha = len(re.findall(r'[^\s\d\W]', text)) or 1
+    # Count English letters vs non-English in a single regex pass
+    letters = "".join(_LETTER_RE.findall(text))
+    if letters.isascii():
+        english_chars = len(letters) - letters.count("_")
+    else:
+        english_chars = sum(1 for c in letters if c.isascii() and c.isalpha())
+    total_alpha = len(letters) or 1
 
     # If mostly English letters, accept it
     ratio = english_chars / max(total_alpha, 1)
@@ -40,21 +133,22 @@ def is_english(text: str) -> bool:
     return ratio > 0.7
 
 
+def classify(query: str) -> Dict[str, bool]:
+    """All guard flags for a query in one pass"""
+    return engine.classify(query)
+
+
 def is_emergency(query: str) -> bool:
-    q = query.lower()
-    return any(kw in q for kw in EMERGENCY_KEYWORDS)
+    return engine.classify(query)["emergency"]
 
 
 def is_greeting(query: str) -> bool:
-    q = query.lower().strip().rstrip('!.,?')
-    return q in GREETINGS or any(q.startswith(g) for g in GREETINGS)
+    return engine.classify(query)["greeting"]
 
 
 def is_farewell(query: str) -> bool:
-    q = query.lower().strip().rstrip('!.,?')
-    return q in FAREWELLS
+    return engine.classify(query)["farewell"]
 
 
 def is_invalid_query(query: str) -> bool:
-    q = query.lower().strip()
-    return len(q) < 3 or q in INVALID_QUERIES
+    return engine.classify(query)["invalid"]
@@ -0,0 +1,102 @@
+# rag/hierarchy.py
+#
+# Article-level coarse index for two-stage retrieval.
+#
+# build_index writes, next to the chunk index (petmd.index):
+#   petmd.articles.index   - FAISS index of one vector per article
+#                            (normalized blend of title embedding + chunk centroid)
+#   petmd.articles.jsonl   - {"title", "url", "start", "end"} per article, in
+#                            article-index order; chunks start..end-1 belong to it
+#
+# Chunks of an article are contiguous in the chunk index, so stage two only
+# scores the chunk id ranges of the top-M articles.
+
+import json
+import os
+from typing import Callable, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from rag.corpus import iter_jsonl
+
+ARTICLE_INDEX_SUFFIX = ".articles.index"
+ARTICLE_META_SUFFIX = ".articles.jsonl"
+
+# Weight of the title embedding against the chunk centroid
+TITLE_WEIGHT = 0.5
+
+
+def article_paths(index_path: str) -> Tuple[str, str]:
+    """(article index, article metadata) paths that belong to a chunk index"""
+    base = os.path.splitext(index_path)[0]
+    return base + ARTICLE_INDEX_SUFFIX, base + ARTICLE_META_SUFFIX
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    return x / (np.linalg.norm(x, axis=-1, keepdims=True) + 1e-12)
+
+
+def article_vector(title_emb: np.ndarray, chunk_vectors: np.ndarray,
+                   title_weight: float = TITLE_WEIGHT) -> np.ndarray:
+    """Unit-length blend of the title embedding and the chunk centroid"""
+    centroid = _unit(chunk_vectors.mean(axis=0))
+    return _unit((1 - title_weight) * centroid + title_weight * _unit(title_emb)).astype("float32")
+
+# ============================================
+# Build
+# ============================================
+
+class ArticleIndexWriter:
+    """Collects one vector + chunk id range per article during build_index"""
+
+    def __init__(self, index_path: str, dim: int):
+        self.index_path, self.meta_path = article_paths(index_path)
+        self.index = faiss.IndexFlatL2(dim)
+        self._meta = open(self.meta_path + ".tmp", "w", encoding="utf-8")
+
+    def add(self, titles: List[str], urls: List[str], ranges: List[Tuple[int, int]], vectors: np.ndarray):
+        self.index.add(np.asarray(vectors, dtype="float32"))
+        for title, url, (start, end) in zip(titles, urls, ranges):
+            self._meta.write(json.dumps({"title": title, "url": url, "start": start, "end": end},
+                                        ensure_ascii=False) + "\n")
+
+    def close(self) -> int:
+        self._meta.close()
+        faiss.write_index(self.index, self.index_path)
+        os.replace(self.meta_path + ".tmp", self.meta_path)
+        return self.index.ntotal
+
+# ============================================
+# Load / Search
+# ============================================
+
+def load_article_index(index_path: str) -> Optional[Tuple[faiss.Index, np.ndarray]]:
+    """(article index, (n_articles, 2) chunk id ranges), or None if it was not built"""
+    article_index_path, meta_path = article_paths(index_path)
+    if not (os.path.exists(article_index_path) and os.path.exists(meta_path)):
+        return None
+    ranges = np.array([(m["start"], m["end"]) for m in iter_jsonl(meta_path)], dtype=np.int64).reshape(-1, 2)
+    return faiss.read_index(article_index_path), ranges
+
+
+def search_hierarchical(query: np.ndarray, article_index: faiss.Index, ranges: np.ndarray,
+                        fetch: Callable[[int, int], np.ndarray], k: int,
+                        top_articles: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stage 1: top-M articles from the coarse index. Stage 2: exact L2 over the
+    chunk vectors of those articles only (`fetch(start, n)` returns them).
+    Returns (distances, ids) like a FAISS search for one query, nearest first.
+    """
+    _, articles = article_index.search(query.reshape(1, -1), top_articles)
+    spans = [ranges[a] for a in articles[0] if a >= 0]
+    if not spans:
+        return np.zeros(0, dtype="float32"), np.zeros(0, dtype=np.int64)
+
+    ids = np.concatenate([np.arange(s, e) for s, e in spans])
+    vectors = np.vstack([fetch(int(s), int(e - s)) for s, e in spans])
+    distances = ((vectors - query.reshape(1, -1)) ** 2).sum(axis=1)
+
+    top = np.argpartition(distances, k - 1)[:k] if len(distances) > k else np.arange(len(distances))
+    top = top[np.argsort(distances[top])]
+    return distances[top].astype("float32"), ids[top]
@@ -0,0 +1,107 @@
+# rag/index_state.py
+#
+# One loaded index snapshot (FAISS index + document store + optional article
+# index). Used by the in-process retriever and by each shard server.
+#
+# In "compact" vector mode `index` is the PCA + quantized index and exact
+# vectors come from the memmapped `full` array instead of the FAISS index.
+
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from rag.config import RETRIEVAL_MODE, TOP_ARTICLES, VECTOR_MODE
+from rag.compressed import load_compact, search_compact
+from rag.corpus import load_documents
+from rag.extractive import load_sentence_store
+from rag.hierarchy import load_article_index, search_hierarchical
+from rag import snapshots
+
+# (chunk id, L2 distance, document) per result, nearest first
+Hit = Tuple[int, float, Dict]
+
+
+class IndexState:
+    """One loaded snapshot: FAISS index + document store"""
+
+    def __init__(self, manifest: Dict, id_offset: int = 0, vector_mode: str = VECTOR_MODE):
+        self.version = manifest["version"]
+        self.manifest = manifest
+        # Compact first pass + memmapped float32 vectors (flat if they were not built)
+        compact = load_compact(manifest["index_path"]) if vector_mode == "compact" else None
+        if compact is not None:
+            self.index, self.full = compact
+        else:
+            self.index, self.full = faiss.read_index(manifest["index_path"]), None
+        self.vector_mode = "flat" if self.full is None else "compact"
+        self.documents = load_documents(manifest["docs_path"])
+        if self.index.ntotal != len(self.documents):
+            raise ValueError(f"Snapshot {self.version}: {self.index.ntotal} vectors but {len(self.documents)} documents")
+        # Article-level index for hierarchical retrieval (None for indexes built before it)
+        self.articles = load_article_index(manifest["index_path"])
+        # Sentence vectors for extractive answers (memmapped; None if not built)
+        self.sentences = load_sentence_store(manifest["index_path"])
+        if self.sentences is not None and len(self.sentences[1]) - 1 != len(self.documents):
+            self.sentences = None
+        # Chunk ids are reported as id_offset + local id (non-zero for shards)
+        self.id_offset = id_offset
+
+    @property
+    def dim(self) -> int:
+        return self.index.d
+
+    @property
+    def chunks(self) -> int:
+        return len(self.documents)
+
+    def _fetch(self, start: int, n: int) -> np.ndarray:
+        """Exact vectors of local chunk ids start..start+n-1"""
+        if self.full is not None:
+            return self.full[start:start + n]
+        return self.index.reconstruct_n(start, n)
+
+    def search(self, query_emb: np.ndarray, k: int, mode: str = RETRIEVAL_MODE):
+        """(distances, ids) for one query, flat or two-stage"""
+        if mode == "hierarchical" and self.articles is not None:
+            article_index, ranges = self.articles
+            return search_hierarchical(query_emb[0], article_index, ranges, self._fetch, k, TOP_ARTICLES)
+        if self.full is not None:
+            return search_compact(self.index, self.full, query_emb, k)[0]
+        distances, indices = self.index.search(query_emb, k)
+        return distances[0], indices[0]
+
+    def hits(self, query_embs: np.ndarray, k: int, mode: str = RETRIEVAL_MODE) -> List[List[Hit]]:
+        """Top-k (id, distance, document) per query; flat mode searches all queries at once"""
+        if mode == "hierarchical" and self.articles is not None:
+            rows = [self.search(q.reshape(1, -1), k, mode) for q in query_embs]
+        elif self.full is not None:
+            rows = search_compact(self.index, self.full, query_embs, k)
+        else:
+            distances, indices = self.index.search(query_embs, k)
+            rows = list(zip(distances, indices))
+        return [[(self.id_offset + int(i), float(d), self.documents[i])
+                 for d, i in zip(row_d, row_i) if 0 <= i < len(self.documents)]
+                for row_d, row_i in rows]
+
+    def vectors(self, ids: List[int]) -> np.ndarray:
+        """Stored index vectors for chunk ids (no re-encoding)"""
+        if not len(ids):
+            return np.zeros((0, self.index.d), dtype="float32")
+        if self.full is not None:
+            return np.asarray(self.full[np.asarray(ids, dtype=np.int64) - self.id_offset], dtype="float32")
+        return np.vstack([self.index.reconstruct(int(i) - self.id_offset) for i in ids])
+
+    def sentence_vectors(self, chunk_id: int) -> Optional[np.ndarray]:
+        """Stored sentence vectors of one chunk, or None"""
+        if self.sentences is None:
+            return None
+        vectors, offsets = self.sentences
+        local = chunk_id - self.id_offset
+        if not 0 <= local < len(offsets) - 1:
+            return None
+        return vectors[offsets[local]:offsets[local + 1]]
+
+
+def load_state(version: Optional[str] = None) -> IndexState:
+    return IndexState(snapshots.resolve(version))
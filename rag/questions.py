@@ -0,0 +1,36 @@
+# rag/questions.py
+#
+# Question templates ({title} = article title, category) shared by the
+# evaluation test generator and the answer warm-up.
+
+QUESTION_TEMPLATES = [
+    # Health
+    ("What health issues do {title} have?", "health"),
+    ("What diseases are common in {title}?", "health"),
+    ("Are {title} prone to any health problems?", "health"),
+
+    # Grooming
+    ("How do I groom a {title}?", "grooming"),
+    ("What grooming does a {title} need?", "grooming"),
+
+    # Feeding
+    ("What should I feed my {title}?", "feeding"),
+    ("How often should I feed a {title}?", "feeding"),
+
+    # Size
+    ("How big do {title} get?", "size"),
+    ("What is the size of a {title}?", "size"),
+
+    # Temperament
+    ("What is the temperament of a {title}?", "temperament"),
+    ("Are {title} good family pets?", "temperament"),
+    ("Are {title} friendly?", "temperament"),
+
+    # Exercise
+    ("How much exercise does a {title} need?", "exercise"),
+    ("Are {title} active dogs?", "exercise"),
+
+    # General
+    ("Tell me about {title}", "general"),
+    ("What should I know about {title}?", "general"),
+]
@@ -1,10 +1,16 @@
 # rag/retriever.py
 
-import pickle
-import faiss
+import threading
+import time
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+from rag.config import (EMBEDDER_NAME, MMR_ENABLED, MMR_LAMBDA, MMR_FETCH_K, SNAPSHOTS_DIR,
+                        RETRIEVAL_MODE, SHARDS)
+from rag.tracing import span, inc, describe
+from rag.encoders import load_encoder
+from rag.index_state import IndexState, load_state
+from rag import snapshots
 
 # ============================================
 # Load Resources (once at startup)
@@ -12,18 +18,137 @@ from functools import lru_cache
 
 print("🔄 Loading retriever...")
 
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
-index = faiss.read_index("./Data/petmd.index")
+embedder = load_encoder(name=EMBEDDER_NAME)
 
-with open("./Data/documents_semantic.pkl", "rb") as f:
-    documents = pickle.load(f)
+# Requests read `_state` once and keep using that object, so a swap never
+# mixes two versions inside one retrieval; the old state is freed when the
+# last in-flight request drops its reference.
+if SHARDS:
+    # Scatter-gather over shard servers (rag/shards.py); nothing is loaded here
+    from rag.shards import ShardedIndex, resolve_addresses
+    _state = ShardedIndex(resolve_addresses(SHARDS))
+    index = documents = None
+else:
+    _state = load_state()
+    index = _state.index
+    documents = _state.documents
 
-print(f"✅ Retriever ready! ({len(documents)} documents)")
+print(f"✅ Retriever ready! ({_state.chunks} documents, index {_state.version}"
+      f"{f', {_state.shards} shards' if SHARDS else ''}"
+      f"{', compact vectors' if getattr(_state, 'vector_mode', 'flat') == 'compact' else ''})")
+
+describe("rag_index_reloads_total", "Index snapshot reloads by result")
+
+# ============================================
+# Hot Reload
+# ============================================
+
+_reload_lock = threading.Lock()
+_swap_listeners: List[Callable[[str, str], None]] = []
+_last_reload: Dict = {}
+
+
+def current_version() -> str:
+    return _state.version
+
+
+def on_swap(listener: Callable[[str, str], None]):
+    """Register `listener(old_version, new_version)`, called after every swap (cache invalidation)"""
+    _swap_listeners.append(listener)
+    return listener
+
+
+def swap_state(state: IndexState):
+    """Atomically make `state` the live index and notify listeners"""
+    global _state, index, documents
+    old = _state
+    if state.dim != old.dim:
+        raise ValueError(f"Snapshot {state.version} has dim {state.dim}, encoder expects {old.dim}")
+    _state = state
+    index, documents = state.index, state.documents
+
+    for listener in list(_swap_listeners):
+        try:
+            listener(old.version, state.version)
+        except Exception as e:
+            print(f"⚠️  Swap listener {getattr(listener, '__name__', listener)} failed: {e}")
+    print(f"🔁 Index swapped: {old.version} -> {state.version} ({state.chunks} documents)")
+
+
+def _reload(version: Optional[str]):
+    start = time.time()
+    try:
+        manifest = snapshots.resolve(version)
+        if manifest.get("embedder", EMBEDDER_NAME) != EMBEDDER_NAME:
+            raise ValueError(f"Snapshot {manifest['version']} was embedded with {manifest['embedder']}")
+        if manifest["version"] == _state.version:
+            result = {"status": "unchanged", "version": _state.version}
+        else:
+            previous = _state.version
+            swap_state(IndexState(manifest))
+            result = {"status": "swapped", "version": _state.version, "previous": previous}
+    except Exception as e:
+        result = {"status": "failed", "version": _state.version, "error": f"{type(e).__name__}: {e}"}
+        print(f"❌ Index reload failed: {result['error']}")
+    finally:
+        _reload_lock.release()
+
+    result["requested"] = version
+    result["seconds"] = round(time.time() - start, 3)
+    inc("rag_index_reloads_total", result=result["status"])
+    _last_reload.clear()
+    _last_reload.update(result)
+    return result
+
+
+def reload_index(version: Optional[str] = None, wait: bool = False) -> Dict:
+    """
+    Load snapshot `version` (default: CURRENT) and swap it in. The load runs
+    in a background thread unless `wait`; requests keep using the old index
+    until the swap. Only one reload runs at a time.
+    """
+    if SHARDS:
+        return {"status": "unsupported", "version": _state.version,
+                "error": "sharded retrieval: re-partition and restart the shard servers"}
+    if not _reload_lock.acquire(blocking=False):
+        return {"status": "busy", "version": _state.version}
+    if wait:
+        return _reload(version)
+    threading.Thread(target=_reload, args=(version,), daemon=True, name="index-reload").start()
+    return {"status": "started", "version": _state.version}
+
+
+def reload_status() -> Dict:
+    status = {"version": _state.version, "reloading": _reload_lock.locked(),
+              "chunks": _state.chunks, "last_reload": dict(_last_reload),
+              "vector_mode": getattr(_state, "vector_mode", None)}
+    if SHARDS:
+        status["shards"] = _state.status()
+    return status
+
+
+def start_watcher(interval: float, root: str = SNAPSHOTS_DIR) -> threading.Thread:
+    """Poll the CURRENT snapshot pointer and reload when it changes"""
+    def watch():
+        if SHARDS:
+            return
+        while True:
+            time.sleep(interval)
+            live = snapshots.current_version(root)
+            failed = _last_reload.get("status") == "failed" and _last_reload.get("requested") == live
+            if live and live != _state.version and not failed and not _reload_lock.locked():
+                reload_index(live)
+
+    thread = threading.Thread(target=watch, daemon=True, name="index-watcher")
+    thread.start()
+    return thread
 
 # ============================================
 # Cached Embedding
 # ============================================
 
+# Query embeddings depend only on the encoder, not on the index, so this cache
+# survives swaps (snapshots embedded with a different model are rejected).
 @lru_cache(maxsize=200)
 def get_embedding(text: str) -> tuple:
     """Cache embeddings for repeated queries"""
@@ -33,21 +158,101 @@ def get_embedding(text: str) -> tuple:
 # Main Retrieval Function
 # ============================================
 
-def retrieve_chunks(query: str, k: int = 5) -> list:
-    """Retrieve top-k relevant chunks"""
+def retrieve_chunks(query: str, k: int = 5, mmr: bool = None, mode: str = RETRIEVAL_MODE) -> list:
+    """Retrieve top-k relevant chunks (MMR-diversified if enabled)"""
+    if mmr is None:
+        mmr = MMR_ENABLED
+    state = _state
 
     # Get query embedding (cached)
-    query_emb = np.array([get_embedding(query)])
+    with span("embed"):
+        query_emb = np.array([get_embedding(query)], dtype="float32")
+
+    # Search FAISS index (over-fetch candidates for MMR)
+    fetch_k = max(k, MMR_FETCH_K, 4 * k) if mmr else k
+    with span("search"):
+        hits = state.hits(query_emb, fetch_k, mode)[0]
 
-    # Search FAISS index
-    distances, indices = index.search(query_emb, k)
+    candidates = [(idx, dist) for idx, dist, _ in hits]
+    docs = {idx: doc for idx, _, doc in hits}
+    if mmr and len(candidates) > k:
+        with span("mmr"):
+            vectors = get_chunk_vectors([idx for idx, _ in candidates], state)
+            candidates = mmr_select(query_emb[0], candidates, vectors, k)
 
     # Get documents
     results = []
-    for i, idx in enumerate(indices[0]):
-        if 0 <= idx < len(documents):
-            doc = documents[idx].copy()
-            doc["score"] = float(distances[0][i])
-            results.append(doc)
+    for idx, dist in candidates[:k]:
+        doc = docs[idx].copy()
+        doc["id"] = idx
+        doc["score"] = dist
+        doc["version"] = state.version
+        results.append(doc)
+
+    return results
+
+def retrieve_batch(queries: List[str], k: int = 5, mmr: bool = None, mode: str = RETRIEVAL_MODE) -> List[list]:
+    """Top-k chunks for many queries: one encoder batch and one index search"""
+    if mmr if mmr is not None else MMR_ENABLED:
+        return [retrieve_chunks(q, k, mmr=mmr, mode=mode) for q in queries]
+    state = _state
+    with span("embed"):
+        query_embs = np.asarray(embedder.encode([q.lower() for q in queries]), dtype="float32")
+    with span("search"):
+        rows = state.hits(query_embs, k, mode)
 
+    results = []
+    for hits in rows:
+        docs = []
+        for idx, dist, stored in hits:
+            doc = stored.copy()
+            doc["id"] = idx
+            doc["score"] = dist
+            doc["version"] = state.version
+            docs.append(doc)
+        results.append(docs)
     return results
+
+# ============================================
+# MMR Diversification
+# ============================================
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return x / (np.linalg.norm(x, axis=-1, keepdims=True) + 1e-12)
+
+
+def mmr_select(query_emb: np.ndarray, candidates: list, vectors: np.ndarray, k: int,
+               lambda_mult: float = MMR_LAMBDA) -> list:
+    """
+    Greedy Maximal Marginal Relevance over (id, distance) candidates and their
+    vectors: each pick maximises lambda * sim(query) - (1 - lambda) * max sim(picked).
+    """
+    vectors = _normalize(vectors)
+    relevance = vectors @ _normalize(query_emb)
+    redundancy = np.zeros(len(candidates), dtype="float32")
+
+    picked, remaining = [], list(range(len(candidates)))
+    while remaining and len(picked) < k:
+        scores = lambda_mult * relevance[remaining] - (1 - lambda_mult) * redundancy[remaining]
+        best = remaining.pop(int(np.argmax(scores)))
+        picked.append(best)
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+
+    return [candidates[i] for i in picked]
+
+
+# ============================================
+# Stored Vectors
+# ============================================
+
+def get_chunk_vectors(ids: list, state: Optional[IndexState] = None) -> np.ndarray:
+    """Stored index vectors for chunk ids (no re-encoding)"""
+    return (state or _state).vectors(ids)
+
+
+def get_sentence_vectors(chunks: List[Dict]) -> List[Optional[np.ndarray]]:
+    """Stored sentence vectors of retrieved chunks (None where unavailable, e.g. shards)"""
+    state = _state
+    lookup = getattr(state, "sentence_vectors", None)
+    return [lookup(c["id"]) if lookup is not None and c.get("version") == state.version else None
+            for c in chunks]
@@ -0,0 +1,133 @@
+# rag/shard_server.py
+#
+# Serves one index shard over a local unix socket (multiprocessing.connection:
+# pickled dicts, HMAC-authenticated with RAG_SHARD_AUTHKEY or the random key
+# the servers write to <root>/authkey; the socket is created 0600). One thread
+# per client connection.
+#
+#   python -m rag.shard_server --shard 0            # one shard of RAG_SHARDS_DIR
+#   python -m rag.shard_server --all                # every shard, one process each
+#
+# Requests:
+#   {"op": "info"}
+#   {"op": "search", "queries": (n, d) float32, "k": int, "mode": "flat" | "hierarchical"}
+#   {"op": "vectors", "ids": [global chunk ids]}
+
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.connection import Listener, Connection
+from typing import Dict, Optional
+
+import faiss
+
+from rag.config import SHARDS_DIR
+from rag.index_state import IndexState
+from rag.shards import read_manifest, shard_manifest, shard_authkey, socket_path
+
+
+def handle_request(state: IndexState, request: Dict) -> Dict:
+    op = request.get("op")
+    if op == "search":
+        return {"hits": state.hits(request["queries"], request["k"], request.get("mode", "flat"))}
+    if op == "vectors":
+        return {"vectors": state.vectors(request["ids"])}
+    raise ValueError(f"Unknown op {op!r}")
+
+
+def _serve_connection(conn: Connection, state: IndexState, info: Dict, delay: float):
+    with conn:
+        while True:
+            try:
+                request = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                if delay:
+                    time.sleep(delay)
+                reply = info if request.get("op") == "info" else handle_request(state, request)
+            except Exception as e:
+                reply = {"error": f"{type(e).__name__}: {e}"}
+            try:
+                conn.send(reply)
+            except OSError:
+                return
+
+
+def serve(shard: int, root: str = SHARDS_DIR, address: Optional[str] = None,
+          authkey: Optional[bytes] = None, threads: Optional[int] = None, delay: float = 0.0):
+    """Load shard `shard` of `root` and answer requests until killed"""
+    if threads:
+        faiss.omp_set_num_threads(threads)
+    layout = read_manifest(root)
+    state = IndexState(shard_manifest(root, shard), id_offset=layout["offsets"][shard])
+    address = address or socket_path(root, shard)
+    info = {"shard": shard, "address": address, "version": state.version, "dim": state.dim,
+            "chunks": state.chunks, "hierarchical": state.articles is not None, "index": layout}
+
+    authkey = authkey or shard_authkey(root, create=True)
+    if os.path.exists(address):
+        os.unlink(address)
+    # The socket file must never exist with looser permissions, not even briefly
+    umask = os.umask(0o077)
+    try:
+        listener = Listener(address, family="AF_UNIX", authkey=authkey)
+    finally:
+        os.umask(umask)
+    os.chmod(address, 0o600)
+    print(f"🧩 Shard {shard}/{layout['shards']} ready on {address} ({state.chunks} chunks, index {state.version})")
+
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except (multiprocessing.AuthenticationError, OSError) as e:
+                print(f"⚠️  Shard {shard}: rejected connection ({e})")
+                continue
+            threading.Thread(target=_serve_connection, args=(conn, state, info, delay),
+                             daemon=True, name=f"shard-{shard}-conn").start()
+    finally:
+        listener.close()
+
+
+def serve_all(root: str = SHARDS_DIR, threads: Optional[int] = None, delay: float = 0.0):
+    """One server process per shard on this machine"""
+    n = read_manifest(root)["shards"]
+    shard_authkey(root, create=True)
+    threads = threads or max(1, (os.cpu_count() or 1) // n)
+    procs = [multiprocessing.Process(target=serve, args=(i, root), kwargs={"threads": threads, "delay": delay},
+                                     name=f"shard-{i}") for i in range(n)]
+    for p in procs:
+        p.start()
+    print(f"   Point the API at them with: export RAG_SHARDS={root}")
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            p.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve index shards over local unix sockets")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--shard", type=int, help="shard number to serve")
+    group.add_argument("--all", action="store_true", help="serve every shard (one process each)")
+    parser.add_argument("--root", default=SHARDS_DIR)
+    parser.add_argument("--socket", default=None, help="socket path (default: <root>/shard-NN.sock)")
+    parser.add_argument("--threads", type=int, default=None, help="FAISS threads per shard")
+    parser.add_argument("--delay", type=float, default=0.0, help="artificial seconds per request (timeout testing)")
+    args = parser.parse_args()
+
+    if args.all:
+        serve_all(args.root, args.threads, args.delay)
+    else:
+        serve(args.shard, args.root, args.socket, threads=args.threads, delay=args.delay)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+# rag/shards.py
+#
+# Sharded retrieval: partition an index into N shards and scatter-gather
+# top-k over shard server processes (rag/shard_server.py).
+#
+#   Data/shards/
+#     shards.json                <- version, shard count, chunk counts, id offsets
+#     shard-00/                  <- petmd.index, documents_semantic.jsonl,
+#     shard-01/                     petmd.articles.index/.jsonl
+#     shard-00.sock              <- unix socket of the running shard server
+#
+# Articles are routed whole (crc32 of the URL), so each shard can also answer
+# hierarchical queries on its own. Chunk ids are global: shard offset + local id.
+#
+#   python -m rag.shards partition --shards 4     # from the CURRENT snapshot
+#   python -m rag.shards status                   # ping the running shards
+
+import argparse
+import bisect
+import heapq
+import json
+import os
+import secrets
+import threading
+import socket
+import struct
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from itertools import chain, islice
+from multiprocessing.connection import Connection, answer_challenge, deliver_challenge
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from rag.config import SHARDS_DIR, SHARD_TIMEOUT, SHARD_AUTHKEY, RETRIEVAL_MODE
+from rag.compressed import VectorStoreWriter, build_compact
+from rag.corpus import iter_jsonl, iter_documents
+from rag.hierarchy import ArticleIndexWriter, article_paths, load_article_index
+from rag.index_state import Hit
+from rag.tracing import inc, observe, describe
+from rag import snapshots
+
+SHARDS_MANIFEST = "shards.json"
+AUTHKEY_FILE = "authkey"
+
+# A shard that timed out is skipped for this long before it is tried again
+DOWN_COOLDOWN = 5.0
+
+describe("rag_shard_requests_total", "Shard server calls by shard and result (ok/timeout/error/down)")
+describe("rag_shard_latency_seconds", "Shard server round-trip time by shard")
+describe("rag_shard_partial_total", "Searches answered without every shard")
+
+
+def shard_dir(root: str, shard: int) -> str:
+    return os.path.join(root, f"shard-{shard:02d}")
+
+
+def socket_path(root: str, shard: int) -> str:
+    return os.path.join(root, f"shard-{shard:02d}.sock")
+
+
+def shard_authkey(root: str = SHARDS_DIR, create: bool = False) -> bytes:
+    """RAG_SHARD_AUTHKEY, else the random key in <root>/authkey (written 0600 if `create`)"""
+    if SHARD_AUTHKEY:
+        return SHARD_AUTHKEY.encode("utf-8")
+    path = os.path.join(root, AUTHKEY_FILE)
+    if create:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            key = f.read().strip()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"No shard key: set RAG_SHARD_AUTHKEY or start the shard servers "
+                                f"(they create {path})") from None
+    if not key:
+        raise ValueError(f"Empty shard key file {path}")
+    return key.encode("utf-8")
+
+
+def shard_of(url: str, n_shards: int) -> int:
+    """Stable shard of an article"""
+    return zlib.crc32(url.encode("utf-8")) % n_shards
+
+
+def read_manifest(root: str = SHARDS_DIR) -> Dict:
+    with open(os.path.join(root, SHARDS_MANIFEST), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def shard_manifest(root: str, shard: int) -> Dict:
+    """IndexState manifest of one shard"""
+    info = read_manifest(root)
+    folder = shard_dir(root, shard)
+    return {"version": info["version"], "index_path": os.path.join(folder, snapshots.INDEX_FILE),
+            "docs_path": os.path.join(folder, snapshots.DOCS_FILE), "embedder": info.get("embedder")}
+
+
+def resolve_addresses(spec: str) -> List[str]:
+    """RAG_SHARDS value -> shard socket paths"""
+    entries = [s.strip() for s in spec.split(",") if s.strip()]
+    if len(entries) == 1 and os.path.isdir(entries[0]):
+        root = entries[0]
+        return [socket_path(root, i) for i in range(read_manifest(root)["shards"])]
+    return entries
+
+# ============================================
+# Partition
+# ============================================
+
+def iter_article_spans(index_path: str, docs_path: str) -> Iterator[Tuple[str, int, int, Optional[np.ndarray]]]:
+    """(url, first chunk, end chunk, article vector or None) in chunk order"""
+    articles = load_article_index(index_path)
+    if articles is not None:
+        article_index, _ = articles
+        for a, meta in enumerate(iter_jsonl(article_paths(index_path)[1])):
+            yield meta["url"], meta["start"], meta["end"], article_index.reconstruct(a)
+        return
+
+    # Index built before the article index: consecutive chunks of one article
+    url, start = None, 0
+    for i, doc in enumerate(iter_documents(docs_path)):
+        if doc["metadata"]["url"] != url:
+            if url is not None:
+                yield url, start, i, None
+            url, start = doc["metadata"]["url"], i
+    if url is not None:
+        yield url, start, i + 1, None
+
+
+class _ShardWriter:
+    """Index + document store (+ article index) of one shard being written"""
+
+    def __init__(self, folder: str, dim: int, with_articles: bool):
+        os.makedirs(folder, exist_ok=True)
+        self.index_path = os.path.join(folder, snapshots.INDEX_FILE)
+        self.docs_path = os.path.join(folder, snapshots.DOCS_FILE)
+        self.index = faiss.IndexFlatL2(dim)
+        self.docs = open(self.docs_path + ".tmp", "w", encoding="utf-8")
+        self.articles = ArticleIndexWriter(self.index_path, dim) if with_articles else None
+        self.vectors = VectorStoreWriter(self.index_path, dim)
+
+    def add(self, docs: List[Dict], vectors: np.ndarray, article_vec: Optional[np.ndarray]):
+        start = self.index.ntotal
+        if self.articles is not None:
+            meta = docs[0]["metadata"]
+            self.articles.add([meta["title"]], [meta["url"]], [(start, start + len(docs))],
+                              article_vec.reshape(1, -1))
+        self.index.add(vectors)
+        self.vectors.add(vectors)
+        self.docs.writelines(json.dumps(doc, ensure_ascii=False) + "\n" for doc in docs)
+
+    def close(self) -> int:
+        self.docs.close()
+        if self.articles is not None:
+            self.articles.close()
+        self.vectors.close()
+        build_compact(self.index_path)
+        faiss.write_index(self.index, self.index_path + ".tmp")
+        os.replace(self.index_path + ".tmp", self.index_path)
+        os.replace(self.docs_path + ".tmp", self.docs_path)
+        return self.index.ntotal
+
+
+def partition(n_shards: int, root: str = SHARDS_DIR, version: Optional[str] = None) -> Dict:
+    """Split snapshot `version` (default: CURRENT) into `n_shards` shards under `root`"""
+    source = snapshots.resolve(version)
+    index = faiss.read_index(source["index_path"])
+    spans = iter_article_spans(source["index_path"], source["docs_path"])
+    first = next(spans, None)
+    with_articles = first is not None and first[3] is not None
+
+    writers = [_ShardWriter(shard_dir(root, i), index.d, with_articles) for i in range(n_shards)]
+    docs = iter_documents(source["docs_path"])
+    for url, start, end, article_vec in chain([first] if first else [], spans):
+        writers[shard_of(url, n_shards)].add(list(islice(docs, end - start)),
+                                             index.reconstruct_n(start, end - start), article_vec)
+
+    chunks = [w.close() for w in writers]
+    manifest = {
+        "version": source["version"],
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "shards": n_shards,
+        "dim": index.d,
+        "chunks": chunks,
+        "offsets": [int(x) for x in np.cumsum([0] + chunks[:-1])],
+        "embedder": source.get("embedder"),
+        "source": source["index_path"],
+    }
+    tmp = os.path.join(root, SHARDS_MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(root, SHARDS_MANIFEST))
+    return manifest
+
+# ============================================
+# Client
+# ============================================
+
+def connect(address: str, authkey: bytes, timeout: float) -> Connection:
+    """
+    multiprocessing.connection.Client with a deadline: the socket connect
+    and the HMAC handshake give up after `timeout` instead of blocking forever
+    on a server that accepted nothing or stopped answering.
+    """
+    sock = socket.socket(socket.AF_UNIX)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        # Connection reads the raw fd: bound its blocking reads/writes in the kernel
+        sock.setblocking(True)
+        limit = struct.pack("ll", int(timeout), max(int(timeout % 1 * 1e6), 1000))
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, limit)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, limit)
+        conn = Connection(sock.detach())
+    except BaseException:
+        sock.close()
+        raise
+    try:
+        answer_challenge(conn, authkey)
+        deliver_challenge(conn, authkey)
+    except BlockingIOError as e:
+        conn.close()
+        raise TimeoutError(f"shard {address} did not complete the handshake within {timeout}s") from e
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+
+class ShardClient:
+    """Pooled connections to one shard server (one per concurrent call)"""
+
+    def __init__(self, address: str, authkey: Optional[bytes] = None):
+        self.address = address
+        self.authkey = authkey      # None: read from the socket's directory on first connect
+        self._idle = []
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+
+    def mark_down(self):
+        """Skip this shard for DOWN_COOLDOWN seconds"""
+        self._down_until = time.monotonic() + DOWN_COOLDOWN
+
+    def call(self, request: Dict, timeout: float) -> Dict:
+        if time.monotonic() < self._down_until:
+            raise ConnectionError(f"shard {self.address} is cooling down after a timeout")
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+
+        try:
+            if conn is None:
+                if self.authkey is None:
+                    # Raises FileNotFoundError (-> "down") until the servers have written it
+                    self.authkey = shard_authkey(os.path.dirname(self.address))
+                conn = connect(self.address, self.authkey, timeout)
+            conn.send(request)
+            if not conn.poll(max(deadline - time.monotonic(), 0)):
+                # A late reply would be read by the next call: drop the connection
+                raise TimeoutError(f"shard {self.address} did not answer within {timeout}s")
+            reply = conn.recv()
+        except BaseException as e:
+            if conn is not None:
+                conn.close()
+            if isinstance(e, (TimeoutError, BlockingIOError)):
+                self.mark_down()
+                if isinstance(e, BlockingIOError):
+                    raise TimeoutError(f"shard {self.address} stalled mid-message") from e
+            raise
+
+        with self._lock:
+            self._idle.append(conn)
+        if "error" in reply:
+            raise RuntimeError(f"shard {self.address}: {reply['error']}")
+        return reply
+
+
+class ShardedIndex:
+    """
+    Scatter-gather over shard servers with the IndexState search interface
+    (`hits`, `vectors`). Every shard gets `timeout` seconds; results of the
+    shards that answered are merged, missing shards are counted as partial.
+    """
+
+    def __init__(self, addresses: List[str], timeout: float = SHARD_TIMEOUT, authkey: Optional[bytes] = None):
+        if not addresses:
+            raise ValueError("No shard addresses configured")
+        self.clients = [ShardClient(a, authkey) for a in addresses]
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=4 * len(addresses), thread_name_prefix="shard")
+        # Calls still running past the gather deadline: no new call to that shard until they end
+        self._stuck: Dict[int, Future] = {}
+        self._stuck_lock = threading.Lock()
+
+        infos = [i for i in self._broadcast({"op": "info"}) if i is not None]
+        if infos:
+            versions = {i["version"] for i in infos}
+            if len(versions) > 1:
+                raise ValueError(f"Shards serve different index versions: {sorted(versions)}")
+            layout = infos[0]["index"]
+            self.version = versions.pop()
+        else:
+            # Servers not up yet: take the layout from the shards manifest and treat them as down
+            root = os.path.dirname(addresses[0])
+            try:
+                layout = read_manifest(root)
+            except FileNotFoundError:
+                raise RuntimeError(f"No shard server reachable ({', '.join(addresses)})") from None
+            self.version = layout["version"]
+            print(f"⚠️  No shard server reachable yet, using the layout in {root}")
+        self.dim = layout["dim"]
+        self.shards = layout["shards"]
+        self.offsets = layout["offsets"]
+        self.chunks = sum(layout["chunks"])
+        if self.shards != len(addresses):
+            print(f"⚠️  {len(addresses)} shard addresses for a {self.shards}-shard index")
+
+    def _call(self, shard: int, request: Dict) -> Dict:
+        start = time.perf_counter()
+        try:
+            reply = self.clients[shard].call(request, self.timeout)
+        except TimeoutError:
+            inc("rag_shard_requests_total", shard=str(shard), result="timeout")
+            raise
+        except (ConnectionError, FileNotFoundError):
+            inc("rag_shard_requests_total", shard=str(shard), result="down")
+            raise
+        except Exception:
+            inc("rag_shard_requests_total", shard=str(shard), result="error")
+            raise
+        observe("rag_shard_latency_seconds", time.perf_counter() - start, shard=str(shard))
+        inc("rag_shard_requests_total", shard=str(shard), result="ok")
+        return reply
+
+    def _gather(self, requests: Dict[int, Dict]) -> List[Optional[Dict]]:
+        """Send {shard: request} in parallel; None for every shard that failed or timed out"""
+        futures = {}
+        with self._stuck_lock:
+            for shard, request in requests.items():
+                stuck = self._stuck.get(shard)
+                if stuck is not None and not stuck.done():
+                    inc("rag_shard_requests_total", shard=str(shard), result="down")
+                    continue
+                self._stuck.pop(shard, None)
+                futures[shard] = self._pool.submit(self._call, shard, request)
+        wait(futures.values(), timeout=self.timeout + 0.1)
+
+        replies = [None] * len(self.clients)
+        for shard, future in futures.items():
+            if future.done() and future.exception() is None:
+                replies[shard] = future.result()
+            elif not future.done():
+                self.clients[shard].mark_down()
+                with self._stuck_lock:
+                    self._stuck[shard] = future
+                inc("rag_shard_requests_total", shard=str(shard), result="timeout")
+        return replies
+
+    def _broadcast(self, request: Dict) -> List[Optional[Dict]]:
+        return self._gather({s: request for s in range(len(self.clients))})
+
+    def hits(self, query_embs: np.ndarray, k: int, mode: str = RETRIEVAL_MODE) -> List[List[Hit]]:
+        """Merged top-k (id, distance, document) per query across the shards that answered"""
+        replies = [r for r in self._broadcast({"op": "search", "queries": np.asarray(query_embs, dtype="float32"),
+                                                "k": k, "mode": mode}) if r is not None]
+        if not replies:
+            raise RuntimeError("No shard answered the search")
+        if len(replies) < len(self.clients):
+            inc("rag_shard_partial_total")
+        # Each shard's list is sorted by distance: k-way heap merge
+        return [list(islice(heapq.merge(*(r["hits"][q] for r in replies), key=lambda h: h[1]), k))
+                for q in range(len(query_embs))]
+
+    def shard_of_id(self, chunk_id: int) -> int:
+        return bisect.bisect_right(self.offsets, chunk_id) - 1
+
+    def vectors(self, ids: List[int]) -> np.ndarray:
+        """Stored vectors for chunk ids; rows of unreachable shards are zero"""
+        out = np.zeros((len(ids), self.dim), dtype="float32")
+        by_shard: Dict[int, List[int]] = {}
+        for row, chunk_id in enumerate(ids):
+            by_shard.setdefault(self.shard_of_id(int(chunk_id)), []).append(row)
+
+        requests = {s: {"op": "vectors", "ids": [int(ids[r]) for r in rows]} for s, rows in by_shard.items()}
+        replies = self._gather(requests)
+        for shard, rows in by_shard.items():
+            if replies[shard] is not None:
+                out[rows] = replies[shard]["vectors"]
+        return out
+
+    def status(self) -> List[Dict]:
+        """Per-shard info, or a "down" entry for shards that did not answer"""
+        return [reply or {"shard": s, "address": self.clients[s].address, "status": "down"}
+                for s, reply in enumerate(self._broadcast({"op": "info"}))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition the index into shards / check shard servers")
+    parser.add_argument("command", choices=["partition", "status"])
+    parser.add_argument("--shards", type=int, default=4, help="number of shards (partition)")
+    parser.add_argument("--version", default=None, help="snapshot to partition (default: CURRENT)")
+    parser.add_argument("--root", default=SHARDS_DIR)
+    args = parser.parse_args()
+
+    if args.command == "partition":
+        start = time.time()
+        manifest = partition(args.shards, args.root, args.version)
+        print(f"🧩 Index {manifest['version']} -> {manifest['shards']} shards in {args.root} "
+              f"({time.time() - start:.1f}s), chunks per shard: {manifest['chunks']}")
+        print(f"   Serve them with: python -m rag.shard_server --root {args.root} --all")
+    else:
+        sharded = ShardedIndex(resolve_addresses(args.root))
+        for s in sharded.status():
+            print(f"   shard {s['shard']}: {s.get('status', 'up')}  {s.get('chunks', '-')} chunks  "
+                  f"{s.get('address', '')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# rag/snapshots.py
+#
+# Versioned index snapshots:
+#
+#   Data/snapshots/
+#     CURRENT                      <- name of the live version (replaced atomically)
+#     20250101-120000/
+#       manifest.json              <- version, files, chunk count, embedder, ...
+#       petmd.index
+#       documents_semantic.jsonl
+#
+# A snapshot directory is complete before CURRENT points at it, so a reader
+# never sees a half-written index. Without snapshots the legacy INDEX_PATH /
+# DOCS_PATH files are served as version "legacy".
+#
+#   python -m rag.snapshots list
+#   python -m rag.snapshots import            # snapshot INDEX_PATH / DOCS_PATH
+#   python -m rag.snapshots publish <version> # switch (or roll back)
+#   python -m rag.snapshots prune [keep]
+
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from rag.config import SNAPSHOTS_DIR, INDEX_PATH, DOCS_PATH, EMBEDDER_NAME
+from rag.compressed import compact_paths
+from rag.corpus import existing_path, iter_documents
+from rag.extractive import sentence_paths
+from rag.hierarchy import article_paths
+
+MANIFEST = "manifest.json"
+CURRENT = "CURRENT"
+INDEX_FILE = "petmd.index"
+DOCS_FILE = "documents_semantic.jsonl"
+LEGACY_VERSION = "legacy"
+
+# ============================================
+# Reading
+# ============================================
+
+def current_version(root: str = SNAPSHOTS_DIR) -> Optional[str]:
+    """Version CURRENT points at, or None if there are no snapshots"""
+    try:
+        with open(os.path.join(root, CURRENT), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def read_manifest(version: str, root: str = SNAPSHOTS_DIR) -> Dict:
+    with open(os.path.join(root, version, MANIFEST), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def resolve(version: Optional[str] = None, root: str = SNAPSHOTS_DIR) -> Dict:
+    """
+    Manifest of `version` (default: CURRENT) with absolute file paths, or a
+    manifest for the legacy INDEX_PATH / DOCS_PATH files if none is published.
+    """
+    version = version or current_version(root)
+    if version in (None, LEGACY_VERSION):
+        return {"version": LEGACY_VERSION, "index_path": INDEX_PATH, "docs_path": DOCS_PATH,
+                "embedder": EMBEDDER_NAME}
+
+    manifest = read_manifest(version, root)
+    folder = os.path.join(root, version)
+    manifest["index_path"] = os.path.join(folder, manifest["index_file"])
+    manifest["docs_path"] = os.path.join(folder, manifest["docs_file"])
+    return manifest
+
+
+def list_snapshots(root: str = SNAPSHOTS_DIR) -> List[Dict]:
+    """Manifests of all complete snapshots, oldest first"""
+    if not os.path.isdir(root):
+        return []
+    live = current_version(root)
+    out = []
+    for name in sorted(os.listdir(root)):
+        if os.path.exists(os.path.join(root, name, MANIFEST)):
+            manifest = read_manifest(name, root)
+            manifest["current"] = name == live
+            out.append(manifest)
+    return out
+
+# ============================================
+# Writing
+# ============================================
+
+def new_version(root: str = SNAPSHOTS_DIR) -> str:
+    """Timestamp version name, unique within `root`"""
+    base = version = datetime.now().strftime("%Y%m%d-%H%M%S")
+    n = 1
+    while os.path.exists(os.path.join(root, version)) or os.path.exists(os.path.join(root, f".staging-{version}")):
+        n += 1
+        version = f"{base}-{n}"
+    return version
+
+
+def staging_dir(version: str, root: str = SNAPSHOTS_DIR) -> str:
+    """Scratch directory a snapshot is built in before `commit_snapshot`"""
+    path = os.path.join(root, f".staging-{version}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def commit_snapshot(staging: str, version: str, root: str = SNAPSHOTS_DIR, **info) -> Dict:
+    """Write the manifest and move a fully built staging directory into place"""
+    manifest = {
+        "version": version,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "index_file": INDEX_FILE,
+        "docs_file": DOCS_FILE,
+        "embedder": EMBEDDER_NAME,
+        **info
+    }
+    for key in ("index_file", "docs_file"):
+        manifest[key.replace("_file", "_bytes")] = os.path.getsize(os.path.join(staging, manifest[key]))
+
+    with open(os.path.join(staging, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(staging, os.path.join(root, version))
+    return manifest
+
+
+def publish(version: str, root: str = SNAPSHOTS_DIR):
+    """Atomically point CURRENT at `version`"""
+    if not os.path.exists(os.path.join(root, version, MANIFEST)):
+        raise FileNotFoundError(f"No complete snapshot {version} in {root}")
+    tmp = os.path.join(root, CURRENT + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(root, CURRENT))
+
+
+def import_files(index_path: str = INDEX_PATH, docs_path: str = DOCS_PATH,
+                 root: str = SNAPSHOTS_DIR) -> Dict:
+    """Copy an existing index + document store into a new snapshot (a legacy .pkl store is converted)"""
+    import faiss
+
+    docs_path = existing_path(docs_path, ".pkl")
+    version = new_version(root)
+    staging = staging_dir(version, root)
+    shutil.copy2(index_path, os.path.join(staging, INDEX_FILE))
+    if docs_path.endswith(".pkl"):
+        with open(os.path.join(staging, DOCS_FILE), "w", encoding="utf-8") as out:
+            out.writelines(json.dumps(doc, ensure_ascii=False) + "\n" for doc in iter_documents(docs_path))
+    else:
+        shutil.copy2(docs_path, os.path.join(staging, DOCS_FILE))
+    target = os.path.join(staging, INDEX_FILE)
+    for src, dst in zip(article_paths(index_path) + sentence_paths(index_path) + compact_paths(index_path),
+                        article_paths(target) + sentence_paths(target) + compact_paths(target)):
+        if os.path.exists(src):
+            shutil.copy2(src, dst)
+    index = faiss.read_index(os.path.join(staging, INDEX_FILE))
+    return commit_snapshot(staging, version, root, chunks=index.ntotal, dim=index.d, source=index_path)
+
+
+def prune(keep: int = 3, root: str = SNAPSHOTS_DIR) -> List[str]:
+    """Delete all but the newest `keep` snapshots (never the current one)"""
+    live = current_version(root)
+    old = [s["version"] for s in list_snapshots(root)][:-keep or None]
+    removed = [v for v in old if v != live]
+    for version in removed:
+        shutil.rmtree(os.path.join(root, version), ignore_errors=True)
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage versioned index snapshots")
+    parser.add_argument("command", choices=["list", "import", "publish", "prune"])
+    parser.add_argument("arg", nargs="?", help="version (publish) or number to keep (prune)")
+    parser.add_argument("--root", default=SNAPSHOTS_DIR)
+    args = parser.parse_args()
+    os.makedirs(args.root, exist_ok=True)
+
+    if args.command == "list":
+        for s in list_snapshots(args.root):
+            print(f"{'*' if s['current'] else ' '} {s['version']}  {s.get('chunks', '?')} chunks  {s['created']}")
+    elif args.command == "import":
+        start = time.time()
+        manifest = import_files(root=args.root)
+        publish(manifest["version"], args.root)
+        print(f"📦 Snapshot {manifest['version']} published ({manifest['chunks']} chunks, {time.time() - start:.1f}s)")
+    elif args.command == "publish":
+        publish(args.arg, args.root)
+        print(f"✅ CURRENT -> {args.arg}")
+    elif args.command == "prune":
+        removed = prune(int(args.arg or 3), args.root)
+        print(f"🧹 Removed {len(removed)} snapshots: {', '.join(removed) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
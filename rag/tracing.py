@@ -0,0 +1,157 @@
+# rag/tracing.py
+
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from rag.config import TRACING_ENABLED
+
+# ============================================
+# Metric Registry
+# ============================================
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_HELP = {
+    "rag_stage_seconds": "Time spent in each RAG pipeline stage",
+}
+
+_lock = threading.Lock()
+_histograms: Dict[Tuple[str, Tuple], list] = {}   # (metric, labels) -> [bucket counts..., sum, count]
+_counters: Dict[Tuple[str, Tuple], float] = {}
+_gauges: Dict[Tuple[str, Tuple], float] = {}
+
+
+def describe(metric: str, help_text: str):
+    """Register the HELP line for a metric"""
+    _HELP[metric] = help_text
+
+
+def observe(metric: str, seconds: float, **labels):
+    """Record a duration in a histogram"""
+    key = (metric, tuple(sorted(labels.items())))
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h[i] += 1
+                break
+        h[-2] += seconds
+        h[-1] += 1
+
+
+def inc(metric: str, value: float = 1, **labels):
+    """Increment a counter"""
+    key = (metric, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(metric: str, value: float, **labels):
+    """Set a gauge"""
+    with _lock:
+        _gauges[(metric, tuple(sorted(labels.items())))] = value
+
+# ============================================
+# Spans
+# ============================================
+
+# Per-request stage timings (seconds), only set while a trace is active
+_current: ContextVar[Optional[Dict[str, float]]] = ContextVar("rag_trace", default=None)
+_NOOP = nullcontext()
+
+
+@contextmanager
+def _timed(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if TRACING_ENABLED:
+            observe("rag_stage_seconds", elapsed, stage=stage)
+        trace = _current.get()
+        if trace is not None:
+            trace[stage] = trace.get(stage, 0.0) + elapsed
+
+
+def span(stage: str):
+    """
+    Time a pipeline stage into the histograms (if tracing is on) and the
+    active trace (if any); a shared no-op when neither applies
+    """
+    if TRACING_ENABLED or _current.get() is not None:
+        return _timed(stage)
+    return _NOOP
+
+
+def add_timing(stage: str, seconds: float):
+    """Add a duration measured elsewhere to the active trace (if any)"""
+    trace = _current.get()
+    if trace is not None:
+        trace[stage] = trace.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def trace():
+    """Collect this request's stage timings into the yielded dict"""
+    timings: Dict[str, float] = {}
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+# ============================================
+# Prometheus Exposition
+# ============================================
+
+def _fmt_labels(labels: Tuple, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    lines = []
+    seen = set()
+
+    def header(metric: str, kind: str):
+        if metric not in seen:
+            seen.add(metric)
+            lines.append(f"# HELP {metric} {_HELP.get(metric, metric)}")
+            lines.append(f"# TYPE {metric} {kind}")
+
+    for (metric, labels), h in sorted(histograms.items()):
+        header(metric, "histogram")
+        cumulative = 0
+        for bound, count in zip(BUCKETS, h):
+            cumulative += count
+            le = 'le="%s"' % bound
+            lines.append(f"{metric}_bucket{_fmt_labels(labels, le)} {cumulative}")
+        le = 'le="+Inf"'
+        lines.append(f"{metric}_bucket{_fmt_labels(labels, le)} {h[-1]}")
+        lines.append(f"{metric}_sum{_fmt_labels(labels)} {h[-2]:.6f}")
+        lines.append(f"{metric}_count{_fmt_labels(labels)} {h[-1]}")
+
+    for (metric, labels), value in sorted(counters.items()):
+        header(metric, "counter")
+        lines.append(f"{metric}{_fmt_labels(labels)} {value:g}")
+
+    for (metric, labels), value in sorted(gauges.items()):
+        header(metric, "gauge")
+        lines.append(f"{metric}{_fmt_labels(labels)} {value:g}")
+
+    return "\n".join(lines) + "\n"
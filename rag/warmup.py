@@ -0,0 +1,140 @@
+# rag/warmup.py
+#
+# Offline answer warm-up: generate answers for the expected question space
+# (rag.questions.QUESTION_TEMPLATES x article titles) with the batched model path
+# and store them in the answer store for the live index version.
+#
+#   python -m rag.warmup run [--limit N] [--batch 8]
+#   python -m rag.warmup report [--traffic Data/traffic.jsonl]
+#
+# Runs are resumable: questions already stored for the current version are
+# skipped. Answers are generated with top-k = --k, which should match the
+# API's RAG_TOP_K.
+
+import argparse
+import os
+import time
+from collections import Counter
+from typing import Iterator, List, Optional
+
+from rag.answer_store import AnswerStore, normalize_question
+from rag.config import ARTICLES_PATH, ANSWER_STORE_PATH, TRAFFIC_LOG_PATH
+from rag.corpus import iter_articles, iter_jsonl
+from rag.guards import classify
+from rag.questions import QUESTION_TEMPLATES
+
+
+def candidate_questions(articles_path: str = ARTICLES_PATH) -> Iterator[str]:
+    """Every template x article title question, once per normalized form"""
+    seen = set()
+    for title, _ in iter_articles(articles_path):
+        for template, _ in QUESTION_TEMPLATES:
+            question = template.format(title=title)
+            key = normalize_question(question)
+            if key not in seen:
+                seen.add(key)
+                yield question
+
+
+def needs_model(question: str) -> bool:
+    """Guard-answered questions are instant anyway; only store model answers"""
+    flags = classify(question)
+    return flags["english"] and not (flags["greeting"] or flags["farewell"] or flags["invalid"])
+
+# ============================================
+# Warm-up
+# ============================================
+
+def warmup(store: AnswerStore, questions: List[str], k: int = 5, batch_size: int = 8,
+           commit_every: int = 64) -> int:
+    """Generate and store answers for `questions`; returns the number stored"""
+    from rag.chatbot import answer_batch
+    from rag.retriever import current_version
+
+    version = current_version()
+    done = store.questions(version)
+    todo = [q for q in questions if normalize_question(q) not in done and needs_model(q)]
+    print(f"🔥 Warm-up for index {version}: {len(todo)} to generate ({len(done)} already stored)")
+
+    stored, start = 0, time.time()
+    for offset in range(0, len(todo), commit_every):
+        block = todo[offset:offset + commit_every]
+        answers = answer_batch(block, k=k, batch_size=batch_size)
+        store.put_many(version, [(q, a, c) for q, (a, c) in zip(block, answers)])
+        stored += len(block)
+        rate = stored / max(time.time() - start, 1e-9)
+        print(f"   {stored}/{len(todo)} ({rate:.2f} answers/s)")
+    return stored
+
+# ============================================
+# Report
+# ============================================
+
+def report(store: AnswerStore, articles_path: str = ARTICLES_PATH,
+           traffic_path: Optional[str] = TRAFFIC_LOG_PATH, version: Optional[str] = None) -> dict:
+    """Store size, template coverage and hit ratio against logged traffic"""
+    if version is None:
+        from rag.retriever import current_version
+        version = current_version()
+
+    stored = store.questions(version)
+    candidates = {normalize_question(q) for q in candidate_questions(articles_path)}
+    result = {
+        "version": version,
+        "answers": len(stored),
+        "answers_by_version": store.stats(),
+        "size_bytes": store.size_bytes(),
+        "template_questions": len(candidates),
+        "coverage": round(len(candidates & stored) / len(candidates), 4) if candidates else None,
+    }
+
+    if traffic_path and os.path.exists(traffic_path):
+        logged = list(iter_jsonl(traffic_path))
+        misses = Counter(r["q"] for r in logged if r["q"] not in stored)
+        result.update({
+            "traffic_requests": len(logged),
+            "traffic_hit_ratio": round(sum(r["hit"] for r in logged) / len(logged), 4) if logged else None,
+            # What the store as it is now would have served
+            "traffic_hit_ratio_now": round(sum(r["q"] in stored for r in logged) / len(logged), 4) if logged else None,
+            "top_misses": misses.most_common(10),
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute answers for frequent question templates")
+    parser.add_argument("command", choices=["run", "report"])
+    parser.add_argument("--store", default=ANSWER_STORE_PATH)
+    parser.add_argument("--articles", default=ARTICLES_PATH)
+    parser.add_argument("--limit", type=int, default=None, help="max questions to generate")
+    parser.add_argument("--batch", type=int, default=8, help="generation batch size")
+    parser.add_argument("--k", type=int, default=5, help="retrieval top-k (match RAG_TOP_K)")
+    parser.add_argument("--traffic", default=TRAFFIC_LOG_PATH, help="JSONL traffic log (RAG_TRAFFIC_LOG)")
+    parser.add_argument("--prune", action="store_true", help="drop answers of other index versions")
+    args = parser.parse_args()
+
+    store = AnswerStore(args.store)
+    if args.command == "run":
+        questions = list(candidate_questions(args.articles))[:args.limit]
+        start = time.time()
+        n = warmup(store, questions, k=args.k, batch_size=args.batch)
+        print(f"✅ Stored {n} answers in {time.time() - start:.1f}s")
+        if args.prune:
+            from rag.retriever import current_version
+            print(f"🧹 Dropped {store.drop_versions(current_version())} answers of old index versions")
+
+    r = report(store, args.articles, args.traffic)
+    print(f"\n📦 {args.store}: {r['answers']} answers for index {r['version']} "
+          f"({r['size_bytes'] / 1024:.1f} KB, all versions: {r['answers_by_version']})")
+    print(f"📋 Template coverage: {r['coverage']:.1%} of {r['template_questions']} questions"
+          if r["coverage"] is not None else "📋 No template questions (corpus missing?)")
+    if r.get("traffic_requests"):
+        print(f"🎯 Traffic: {r['traffic_requests']} requests, hit ratio {r['traffic_hit_ratio']:.1%} "
+              f"(with the current store: {r['traffic_hit_ratio_now']:.1%})")
+        for q, n in r["top_misses"]:
+            print(f"   miss x{n}: {q}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,63 +1,187 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-import time
+import argparse
+import asyncio
 import json
+import re
+import zlib
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from xml.etree.ElementTree import XMLPullParser
 
-options = webdriver.ChromeOptions()
-options.add_argument("--disable-blink-features=AutomationControlled")
-driver = webdriver.Chrome(options=options)
-
-categories = {
-    "Dogs": [
-        "Breeds", "Puppies", "Adult Dogs", "Senior Dogs", "Allergies",
-        "Care & Healthy Living", "Disease, Illness & Injury", "Procedures",
-        "Food & Diet", "Poisoning", "Symptoms & What They Mean",
-        "Training & Behavior", "All Medications", "Flea & Tick",
-        "Heartworm", "Pet Anxiety", "Health Tools", "Symptom Checker",
-        "Healthy Weight", "Veterinary Terms Guide", "Alerts & Recalls"
-    ],
-    "Cats": [
-        "Breeds", "Kittens", "Adult Cats", "Senior Cats", "Allergies",
-        "Care & Healthy Living", "Disease, Illness & Injury", "Procedures",
-        "Food & Diet", "Symptoms & What They Mean",
-        "Training & Behavior", "All Medications", "Flea & Tick",
-        "Heartworm", "Pet Anxiety", "Health Tools", "Symptom Checker",
-        "Chocolate Toxicity", "Healthy Weight", "Veterinary Terms Guide",
-        "Alerts & Recalls"
+import httpx
+
+SITEMAP_URL = "https://www.petmd.com/sitemap.xml"
+USER_AGENT = "Mozilla/5.0 (compatible; PetHealthRAG/1.0)"
+GZIP_MAGIC = b"\x1f\x8b"
+
+# ============================================
+# Classification Rules (compiled once)
+# ============================================
+
+ANIMAL_RULE = re.compile(r"^https?://[^/]+/(dog|cat)s?/", re.IGNORECASE)
+ANIMALS = {"dog": "Dogs", "cat": "Cats"}
+
+
+def _words(alternatives: str) -> str:
+    """Whole slug words only: "tick" must not match "sticky", nor "aging" "managing" """
+    return rf"(?<![a-z])(?:{alternatives})(?![a-z])"
+
+
+# (category, animal or None for both, pattern on the URL path)
+CATEGORY_RULES: List[Tuple[str, Optional[str], re.Pattern]] = [
+    (name, animal, re.compile(pattern, re.IGNORECASE))
+    for name, animal, pattern in [
+        ("Breeds", None, r"/breeds?/"),
+        ("Puppies", "Dogs", _words(r"pupp(?:y|ies)")),
+        ("Kittens", "Cats", _words(r"kittens?")),
+        ("Senior Dogs", "Dogs", _words(r"seniors?|older|aging")),
+        ("Senior Cats", "Cats", _words(r"seniors?|older|aging")),
+        ("Allergies", None, _words(r"allerg(?:y|ies|ic|ens?)")),
+        ("Food & Diet", None, r"/nutrition/|" + _words(r"foods?|diets?|dietary|feed(?:ing)?")),
+        ("Poisoning", None, _words(r"poison(?:s|ing|ous)?|toxic(?:ity|ities)?|toxins?")),
+        ("Symptoms & What They Mean", None, r"/symptoms?/"),
+        ("Training & Behavior", None, r"/behavior/|/training/"),
+        ("Disease, Illness & Injury", None, r"/conditions/|/emergency/"),
+        ("Flea & Tick", None, _words(r"fleas?|ticks?")),
+        ("Heartworm", None, _words(r"heartworms?")),
+        ("Pet Anxiety", None, _words(r"anxiety|anxious|calming")),
+        ("Care & Healthy Living", None, r"/general-health/|/care/|/wellness/|/grooming/"),
     ]
-}
-
-skip_categories = {
-    "Dogs": {"Symptom Checker", "Chocolate Toxicity", "Healthy Weight",
-             "Veterinary Terms Guide", "Alerts & Recalls"},
-    "Cats": {"Symptom Checker", "Healthy Weight", "Veterinary Terms Guide",
-             "Alerts & Recalls"}
-}
-
-driver.get("https://www.petmd.com/sitemap")
-time.sleep(5)
-
-all_links = driver.find_elements(By.XPATH, "//a[@href]")
-animal_category_links = {}
-
-for animal, cats in categories.items():
-    animal_category_links[animal] = {}
-
-    if animal == "Dogs":
-        animal_links = [l for l in all_links if "/dog/" in l.get_attribute("href")]
-    else:
-        animal_links = [l for l in all_links if "/cat/" in l.get_attribute("href")]
-
-    for cat_name in cats:
-        if cat_name in skip_categories.get(animal, set()):
-            continue
-        for l in animal_links:
-            if l.text.strip() == cat_name:
-                animal_category_links[animal][cat_name] = l.get_attribute("href")
-                break
-
-with open("./Data/article_links.json", "w", encoding="utf-8") as f:
-    json.dump(animal_category_links, f, ensure_ascii=False, indent=2)
-
-driver.quit()
-print("Sitemap scraping done.")
+]
+
+# Fallback bucket for animal pages that match no rule
+GENERAL_CATEGORY = "General"
+
+
+def classify_url(url: str) -> Optional[Tuple[str, List[str]]]:
+    """(animal, categories) for an article URL, or None if it is not a dog/cat page"""
+    m = ANIMAL_RULE.match(url)
+    if not m:
+        return None
+    animal = ANIMALS[m.group(1).lower()]
+    path = url[m.end() - 1:]
+
+    categories = [
+        name for name, only, pattern in CATEGORY_RULES
+        if (only is None or only == animal) and pattern.search(path)
+    ]
+    return animal, categories or [GENERAL_CATEGORY]
+
+# ============================================
+# Streaming Sitemap Parser
+# ============================================
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+async def iter_sitemap(client: httpx.AsyncClient, url: str) -> AsyncIterator[Tuple[str, str]]:
+    """
+    Stream one sitemap file and yield ("sitemap", loc) for index entries and
+    ("url", loc) for pages. Elements are parsed as bytes arrive and dropped
+    from the tree once handled, so memory stays flat for large (or gzipped)
+    sitemaps.
+    """
+    parser = XMLPullParser(events=("start", "end"))
+    # Gzip is detected from the body, not the ".gz" suffix: with Content-Encoding
+    # gzip httpx has already decompressed it
+    gunzip = None
+    head = b""
+    root = None
+
+    async with client.stream("GET", url) as resp:
+        resp.raise_for_status()
+        async for chunk in resp.aiter_bytes():
+            if head is not None:
+                head += chunk
+                if len(head) < len(GZIP_MAGIC):
+                    continue
+                chunk, head = head, None
+                if chunk.startswith(GZIP_MAGIC):
+                    gunzip = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            parser.feed(gunzip.decompress(chunk) if gunzip else chunk)
+            for event, elem in parser.read_events():
+                if event == "start":
+                    if root is None:
+                        root = elem
+                    continue
+                tag = _local(elem.tag)
+                if tag in ("sitemap", "url"):
+                    loc = next((c.text for c in elem if _local(c.tag) == "loc"), None)
+                    if loc:
+                        yield ("sitemap" if tag == "sitemap" else "url"), loc.strip()
+                    # clear() alone leaves an empty element per entry attached to the root
+                    elem.clear()
+                    if elem in root:
+                        root.remove(elem)
+    if head:
+        parser.feed(head)
+    parser.close()
+
+
+async def iter_sitemap_urls(client: httpx.AsyncClient, root: str) -> AsyncIterator[str]:
+    """Every page URL reachable from a sitemap or sitemap index"""
+    pending, seen = [root], {root}
+    while pending:
+        sitemap = pending.pop(0)
+        try:
+            async for kind, loc in iter_sitemap(client, sitemap):
+                if kind == "url":
+                    yield loc
+                elif loc not in seen:
+                    seen.add(loc)
+                    pending.append(loc)
+        except (httpx.HTTPError, SyntaxError, zlib.error) as e:
+            print(f"⚠️  {sitemap}: {type(e).__name__}: {e}")
+
+
+async def discover(root: str = SITEMAP_URL, timeout: float = 30.0) -> Dict[str, Dict]:
+    """
+    url -> {"animals": [...], "categories": [...]} for every article in the
+    sitemap - the same shape article_scraper.load_link_map() returns, so it
+    can feed the crawler directly.
+    """
+    targets: Dict[str, Dict] = {}
+    async with httpx.AsyncClient(timeout=timeout, follow_redirects=True,
+                                 headers={"User-Agent": USER_AGENT}) as client:
+        async for url in iter_sitemap_urls(client, root):
+            hit = classify_url(url)
+            if hit is None:
+                continue
+            animal, categories = hit
+            meta = targets.setdefault(url, {"animals": [], "categories": []})
+            if animal not in meta["animals"]:
+                meta["animals"].append(animal)
+            for cat in categories:
+                if cat not in meta["categories"]:
+                    meta["categories"].append(cat)
+    return targets
+
+
+def to_link_map(targets: Dict[str, Dict]) -> Dict[str, Dict[str, List[str]]]:
+    """Group discovered URLs into the article_links.json layout"""
+    animal_category_links: Dict[str, Dict[str, List[str]]] = {}
+    for url, meta in targets.items():
+        for animal in meta["animals"]:
+            for cat in meta["categories"]:
+                animal_category_links.setdefault(animal, {}).setdefault(cat, []).append(url)
+    return animal_category_links
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Discover PetMD articles from the XML sitemap")
+    parser.add_argument("--sitemap", default=SITEMAP_URL)
+    parser.add_argument("--out", default="./Data/article_links.json")
+    args = parser.parse_args()
+
+    targets = asyncio.run(discover(args.sitemap))
+    animal_category_links = to_link_map(targets)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(animal_category_links, f, ensure_ascii=False, indent=2)
+
+    for animal, cats in animal_category_links.items():
+        print(f"   {animal}: " + ", ".join(f"{c} ({len(u)})" for c, u in sorted(cats.items())))
+    print(f"Sitemap scraping done. {len(targets)} articles.")
+
+
+if __name__ == "__main__":
+    main()